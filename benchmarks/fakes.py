@@ -0,0 +1,533 @@
+# paper_harvester/benchmarks/fakes.py
+"""ベンチマーク用のローカルスタブサーバー（arXiv API / OpenAI / Slack Web API）と、記録したレスポンスを返すスタブ"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+_FILLER_WORDS = (
+    "we propose method model results training data evaluation benchmark performance "
+    "approach network learning task experiments show improves baseline framework analysis "
+    "representation inference efficient robust scalable novel state art dataset"
+).split()
+
+class _StubServer:
+    """スレッドで動作するHTTPスタブの基底クラス"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+
+    def _handler(self):
+        raise NotImplementedError
+
+    def start(self) -> str:
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+class FakeArxivServer(_StubServer):
+    """arXiv APIを模したAtomフィードを返すサーバー
+
+    キーワードごとに papers_per_keyword 件の論文を、直近 window_hours 時間に
+    均等に分散した公開日時で決定的に生成する。
+    """
+
+    def __init__(self, papers_per_keyword: int = 10, window_hours: float = 24, abstract_words: int = 150):
+        super().__init__()
+        self.papers_per_keyword = papers_per_keyword
+        self.window_hours = window_hours
+        self.abstract_words = abstract_words
+        self._now = datetime.now(timezone.utc)
+
+    @staticmethod
+    def _query_terms(search_query: str) -> str:
+        match = re.search(r'all:"([^"]*)"', search_query)
+        return match.group(1) if match else search_query.split(':', 1)[-1].strip('"')
+
+    @staticmethod
+    def _submitted_range(search_query: str):
+        """検索式の submittedDate:[YYYYMMDDHHMM TO YYYYMMDDHHMM] を取り出す（指定がなければ None）"""
+        match = re.search(r'submittedDate:\[(\d{12}) TO (\d{12})\]', search_query)
+        if not match:
+            return None
+        return tuple(datetime.strptime(v, '%Y%m%d%H%M').replace(tzinfo=timezone.utc) for v in match.groups())
+
+    def entries(self, keyword: str) -> List[Dict[str, str]]:
+        """キーワードに対応する合成論文を生成"""
+        seed = zlib.crc32(keyword.encode('utf-8'))
+        rng = random.Random(seed)
+        prefix = 2000 + seed % 700
+        entries = []
+        step = timedelta(hours=self.window_hours) / max(self.papers_per_keyword, 1)
+        for i in range(self.papers_per_keyword):
+            words = [rng.choice(_FILLER_WORDS) for _ in range(self.abstract_words)]
+            for _ in range(3):
+                words.insert(rng.randrange(len(words)), keyword)
+            published = self._now - step * (i + 0.5)
+            entries.append({
+                'id': f"{prefix}.{(seed // 700 % 90 + 10) * 1000 + i:05d}",
+                'title': f"{keyword.title()} {rng.choice(_FILLER_WORDS)} study {i}",
+                'summary': ' '.join(words),
+                'published': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'authors': [f"Author {rng.randint(1, 500)}" for _ in range(rng.randint(1, 6))]
+            })
+        return entries
+
+    def _feed(self, keyword: str, start: int, max_results: int, submitted_range=None) -> bytes:
+        all_entries = self.entries(keyword)
+        if submitted_range:
+            low, high = submitted_range
+            all_entries = [
+                e for e in all_entries
+                if low <= datetime.strptime(e['published'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+                < high + timedelta(minutes=1)
+            ]
+        page = all_entries[start:start + max_results]
+        items = []
+        for e in page:
+            authors = ''.join(f"<author><name>{escape(a)}</name></author>" for a in e['authors'])
+            items.append(
+                f"<entry><id>http://arxiv.org/abs/{e['id']}v1</id>"
+                f"<updated>{e['published']}</updated><published>{e['published']}</published>"
+                f"<title>{escape(e['title'])}</title><summary>{escape(e['summary'])}</summary>{authors}"
+                f"<link href=\"http://arxiv.org/abs/{e['id']}v1\" rel=\"alternate\" type=\"text/html\"/>"
+                f"<link title=\"pdf\" href=\"http://arxiv.org/pdf/{e['id']}v1\" rel=\"related\" type=\"application/pdf\"/>"
+                f"<arxiv:primary_category term=\"cs.CL\" scheme=\"http://arxiv.org/schemas/atom\"/>"
+                f"<category term=\"cs.CL\" scheme=\"http://arxiv.org/schemas/atom\"/></entry>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" '
+            'xmlns:arxiv="http://arxiv.org/schemas/atom">'
+            f'<title>ArXiv Query</title><id>http://arxiv.org/api/bench</id><updated>{self._now.strftime("%Y-%m-%dT%H:%M:%SZ")}</updated>'
+            f'<opensearch:totalResults>{len(all_entries)}</opensearch:totalResults>'
+            f'<opensearch:startIndex>{start}</opensearch:startIndex>'
+            f'<opensearch:itemsPerPage>{max_results}</opensearch:itemsPerPage>'
+            + ''.join(items) + '</feed>'
+        ).encode('utf-8')
+
+    def _handler(self):
+        stub = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                stub._count('query')
+                search_query = params.get('search_query', [''])[0]
+                keyword = stub._query_terms(search_query)
+                start = int(params.get('start', ['0'])[0])
+                max_results = int(params.get('max_results', ['100'])[0])
+                feed = stub._feed(keyword, start, max_results, stub._submitted_range(search_query))
+                self._send(200, feed, 'application/atom+xml')
+
+        return Handler
+
+class FakeOAIServer(_StubServer):
+    """arXivのOAI-PMH（ListRecords, metadataPrefix=arXiv）を模したサーバー
+
+    FakeArxivServer と同じ合成論文に、キーワードを含まない論文（noise_papers 件）を加えて
+    page_size 件ずつレジュメーショントークンで返す。retry_first=True なら最初の要求に 503 を返す。
+    """
+
+    def __init__(self, arxiv_stub: FakeArxivServer, keywords: List[str], noise_papers: int = 0,
+                 page_size: int = 100, retry_first: bool = False):
+        super().__init__()
+        self.page_size = page_size
+        self.retry_first = retry_first
+        self.records = [e for keyword in keywords for e in arxiv_stub.entries(keyword)]
+        rng = random.Random(len(keywords))
+        for i in range(noise_papers):
+            published = arxiv_stub._now - timedelta(hours=arxiv_stub.window_hours) * rng.random()
+            self.records.append({
+                'id': f"2999.{i:05d}",
+                'title': f"Unrelated {rng.choice(_FILLER_WORDS)} study {i}",
+                'summary': ' '.join(rng.choice(_FILLER_WORDS) for _ in range(arxiv_stub.abstract_words)),
+                'published': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'authors': [f"Author {rng.randint(1, 500)}"]
+            })
+
+    def _page(self, set_spec: str, from_date: str, offset: int) -> bytes:
+        matching = [r for r in self.records if set_spec == 'cs' and r['published'][:10] >= from_date]
+        page = matching[offset:offset + self.page_size]
+        items = []
+        for r in page:
+            authors = ''.join(
+                f"<author><keyname>{escape(a.split()[-1])}</keyname><forenames>{escape(a.split()[0])}</forenames></author>"
+                for a in r['authors']
+            )
+            items.append(
+                f"<record><header><identifier>oai:arXiv.org:{r['id']}</identifier>"
+                f"<datestamp>{r['published'][:10]}</datestamp><setSpec>cs</setSpec></header>"
+                f"<metadata><arXiv xmlns=\"http://arxiv.org/OAI/arXiv/\"><id>{r['id']}</id>"
+                f"<created>{r['published'][:10]}</created><authors>{authors}</authors>"
+                f"<title>{escape(r['title'])}</title><categories>cs.CL cs.LG</categories>"
+                f"<abstract>{escape(r['summary'])}</abstract></arXiv></metadata></record>"
+            )
+        if not matching:
+            body = '<error code="noRecordsMatch">No records</error>'
+        else:
+            next_offset = offset + self.page_size
+            token = f"{set_spec}|{from_date}|{next_offset}" if next_offset < len(matching) else ''
+            body = (
+                '<ListRecords>' + ''.join(items) +
+                f'<resumptionToken completeListSize="{len(matching)}" cursor="{offset}">{token}</resumptionToken>'
+                '</ListRecords>'
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+            f'<responseDate>{self.now()}</responseDate><request verb="ListRecords">bench</request>'
+            + body + '</OAI-PMH>'
+        ).encode('utf-8')
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def _handler(self):
+        stub = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                stub._count('ListRecords')
+                with stub._lock:
+                    retry, stub.retry_first = stub.retry_first, False
+                if retry:
+                    self._send(503, b'Retry later', 'text/plain', {'Retry-After': '1'})
+                    return
+                if 'resumptionToken' in params:
+                    set_spec, from_date, offset = params['resumptionToken'].split('|')
+                    body = stub._page(set_spec, from_date, int(offset))
+                else:
+                    body = stub._page(params.get('set', ''), params.get('from', '0000-00-00'), 0)
+                self._send(200, body, 'text/xml')
+
+        return Handler
+
+class FakeOpenAIServer(_StubServer):
+    """OpenAI互換の chat/completions エンドポイント（アカウントのレート制限つき）
+
+    直近60秒に受け付けたリクエスト数が rpm、トークン数（入力と出力の合計）が tpm を超える場合は
+    429 と Retry-After を返す（0 で無制限）。受け付けた時刻とトークン数は accepted に記録する。
+    """
+
+    def __init__(self, latency: float = 0.5, completion_tokens: int = 600, rpm: int = 0, tpm: int = 0):
+        super().__init__()
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.rpm = rpm
+        self.tpm = tpm
+        self.prompt_tokens = 0
+        self.total_completion_tokens = 0
+        self.rate_limited = 0
+        self.accepted: List[Tuple[float, int]] = []  # (受け付けた時刻, トークン数)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _admit(self, tokens: int) -> float:
+        """受け付けるなら0、そうでなければ待機すべき秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            window = [(at, t) for at, t in self.accepted if now - at < 60]
+            used = sum(t for _, t in window)
+            over_requests = self.rpm > 0 and len(window) >= self.rpm
+            over_tokens = self.tpm > 0 and used + tokens > self.tpm
+            if over_requests or over_tokens:
+                self.rate_limited += 1
+                return 60 - (now - window[0][0]) if window else 1.0
+            self.accepted.append((now, tokens))
+            return 0.0
+
+    def peak_window(self, since: int = 0) -> Tuple[int, int]:
+        """accepted[since:] のうち任意の60秒間に受け付けた（リクエスト数, トークン数）の最大値"""
+        accepted = self.accepted[since:]
+        peak_requests = peak_tokens = 0
+        for i, (start, _) in enumerate(accepted):
+            window = [t for at, t in accepted[i:] if at - start < 60]
+            peak_requests = max(peak_requests, len(window))
+            peak_tokens = max(peak_tokens, sum(window))
+        return peak_requests, peak_tokens
+
+    def _handler(self):
+        stub = self
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                request = json.loads(self._read_body() or b'{}')
+                stub._count('chat.completions')
+                prompt_chars = sum(len(m.get('content') or '') for m in request.get('messages', []))
+                prompt_tokens = max(1, prompt_chars // 4)
+                wait = stub._admit(prompt_tokens + stub.completion_tokens)
+                if wait > 0:
+                    body = {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}}
+                    self._send(429, json.dumps(body).encode('utf-8'), 'application/json',
+                               {'Retry-After': str(max(1, math.ceil(wait)))})
+                    return
+                with stub._lock:
+                    stub.prompt_tokens += prompt_tokens
+                    stub.total_completion_tokens += stub.completion_tokens
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    self._respond(request, prompt_tokens)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _respond(self, request, prompt_tokens):
+                if request.get('stream'):
+                    self._stream(request, prompt_tokens)
+                    return
+                time.sleep(stub.latency)
+                body = {
+                    'id': f"chatcmpl-bench-{stub.calls['chat.completions']}",
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'bench'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': '要約 ' * stub.completion_tokens},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': stub.completion_tokens,
+                        'total_tokens': prompt_tokens + stub.completion_tokens
+                    }
+                }
+                self._send(200, json.dumps(body).encode('utf-8'), 'application/json')
+
+            def _stream(self, request, prompt_tokens):
+                """Server-Sent Events で10行に分けて返す（latency をかけて少しずつ送る）"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                chunk_id = f"chatcmpl-bench-{stub.calls['chat.completions']}"
+                lines = 10
+                per_line = max(1, stub.completion_tokens // lines)
+
+                def event(choices, usage=None):
+                    payload = {
+                        'id': chunk_id,
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': request.get('model', 'bench'),
+                        'choices': choices,
+                        'usage': usage
+                    }
+                    self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+
+                for i in range(lines):
+                    time.sleep(stub.latency / lines)
+                    event([{'index': 0, 'delta': {'content': '要約 ' * per_line + '\n'}, 'finish_reason': None}])
+                event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+                event([], {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': stub.completion_tokens,
+                    'total_tokens': prompt_tokens + stub.completion_tokens
+                })
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+class FakeSlackServer(_StubServer):
+    """Slack Web APIのスタブ（チャンネルごとの投稿レート制限つき）
+
+    chat.postMessage / chat.update はチャンネルごとに messages_per_second を
+    超えると 429 と Retry-After を返す。conversations.history は投稿済みのメッセージを新しい順に返す。
+    """
+
+    def __init__(self, messages_per_second: float = 1.0):
+        super().__init__()
+        self.messages_per_second = messages_per_second
+        self.rate_limited = 0
+        self.messages: List[Dict[str, str]] = []
+        self._last_post: Dict[str, float] = {}
+        self._ts = 0
+
+    def _admit(self, channel: str) -> float:
+        """投稿可能なら0、そうでなければ待機すべき秒数を返す"""
+        interval = 1.0 / self.messages_per_second if self.messages_per_second > 0 else 0
+        with self._lock:
+            now = time.monotonic()
+            last = self._last_post.get(channel)
+            if last is not None and now - last < interval:
+                self.rate_limited += 1
+                return interval - (now - last)
+            self._last_post[channel] = now
+            return 0.0
+
+    def _handler(self):
+        stub = self
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                method = self.path.rstrip('/').rsplit('/', 1)[-1]
+                raw = self._read_body()
+                if 'application/json' in (self.headers.get('Content-Type') or ''):
+                    args = json.loads(raw or b'{}')
+                else:
+                    args = {k: v[0] for k, v in parse_qs(raw.decode('utf-8')).items()}
+                stub._count(method)
+
+                if method == 'auth.test':
+                    body = {'ok': True, 'user_id': 'UBENCH', 'bot_id': 'BBENCH', 'team_id': 'TBENCH', 'url': 'https://bench.slack.com/'}
+                elif method in ('chat.postMessage', 'chat.update'):
+                    channel = args.get('channel', '')
+                    wait = stub._admit(channel)
+                    if wait > 0:
+                        body = json.dumps({'ok': False, 'error': 'ratelimited'}).encode('utf-8')
+                        self._send(429, body, 'application/json', {'Retry-After': str(max(1, math.ceil(wait)))})
+                        return
+                    with stub._lock:
+                        stub._ts += 1
+                        ts = args.get('ts') or f"{int(time.time())}.{stub._ts:06d}"
+                        stub.messages.append({
+                            'method': method,
+                            'channel': channel,
+                            'thread_ts': args.get('thread_ts'),
+                            'text': args.get('text'),
+                            'blocks': args.get('blocks'),
+                            'ts': ts
+                        })
+                    body = {'ok': True, 'channel': channel, 'ts': ts, 'message': {'ts': ts}}
+                elif method == 'conversations.history':
+                    oldest = float(args.get('oldest') or 0)
+                    with stub._lock:
+                        messages = [
+                            {'ts': m['ts'], 'text': m['text'] or '', 'blocks': m['blocks'] or []}
+                            for m in reversed(stub.messages)
+                            if m['method'] == 'chat.postMessage' and not m['thread_ts']
+                            and m['channel'] == args.get('channel') and float(m['ts']) >= oldest
+                        ]
+                    body = {'ok': True, 'messages': messages[:int(args.get('limit') or 100)], 'has_more': False}
+                else:
+                    body = {'ok': True}
+                self._send(200, json.dumps(body).encode('utf-8'), 'application/json')
+
+        return Handler
+
+    def top_level_posts(self) -> int:
+        """スレッド外に投稿されたメッセージ数"""
+        return sum(1 for m in self.messages if m['method'] == 'chat.postMessage' and not m['thread_ts'])
+
+    def distinct_top_level_posts(self) -> int:
+        """スレッド外に投稿されたメッセージの（チャンネル・本文の）種類数"""
+        return len({
+            (m['channel'], m['text']) for m in self.messages
+            if m['method'] == 'chat.postMessage' and not m['thread_ts']
+        })
+
+class RecordedServer(_StubServer):
+    """記録したレスポンスを返すスタブ（論文ソースのアダプターをローカルで確認する）
+
+    GETリクエストのパスと（並べ替えた）クエリ文字列ごとに、fixtures_dir のJSONファイルに
+    保存したステータス・Content-Type・本文を返す。upstream を指定すると、記録のないリクエストを
+    upstream に転送してレスポンスを記録する。記録がなく upstream もない場合は 404 を返す。
+    """
+
+    def __init__(self, fixtures_dir: str, upstream: str = None):
+        super().__init__()
+        self.fixtures_dir = fixtures_dir
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.misses: List[str] = []
+
+    def fixture_path(self, path: str) -> str:
+        parsed = urlparse(path)
+        query = '&'.join(sorted(parsed.query.split('&'))) if parsed.query else ''
+        key = f"{parsed.path}?{query}"
+        name = re.sub(r'[^A-Za-z0-9]+', '_', parsed.path).strip('_') or 'root'
+        return os.path.join(self.fixtures_dir, f"{name}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}.json")
+
+    def _record(self, path: str, fixture: str) -> Dict:
+        request = urllib.request.Request(self.upstream + path, headers={'User-Agent': 'paper-harvester-fixtures'})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, content_type, body = response.status, response.headers.get('Content-Type', ''), response.read()
+        except urllib.error.HTTPError as e:
+            status, content_type, body = e.code, e.headers.get('Content-Type', ''), e.read()
+        entry = {'path': path, 'status': status, 'content_type': content_type, 'body': base64.b64encode(body).decode('ascii')}
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        with open(fixture, 'w') as f:
+            json.dump(entry, f, indent=1)
+        return entry
+
+    def _handler(self):
+        stub = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                stub._count('GET')
+                fixture = stub.fixture_path(self.path)
+                if os.path.exists(fixture):
+                    with open(fixture) as f:
+                        entry = json.load(f)
+                elif stub.upstream:
+                    entry = stub._record(self.path, fixture)
+                else:
+                    with stub._lock:
+                        stub.misses.append(self.path)
+                    self._send(404, b'no recorded response', 'text/plain')
+                    return
+                self._send(entry['status'], base64.b64decode(entry['body']), entry['content_type'] or 'application/octet-stream')
+
+            def do_HEAD(self):
+                fixture = stub.fixture_path(self.path)
+                self.send_response(200 if os.path.exists(fixture) else 404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
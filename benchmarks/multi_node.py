@@ -0,0 +1,149 @@
+# paper_harvester/benchmarks/multi_node.py
+"""複数ノードでの分担の検証とベンチマーク
+
+ワーカープロセスを複数起動し、1つのデータベース（既定ではWALモードのSQLite、
+--database-url でPostgreSQLも指定可能）を共有して直近の実行時刻の定期チェックをシャードに分けて処理する。
+--kill-after を指定すると最初のワーカーを途中で強制終了し、そのシャードが期限切れ後に
+他のワーカーへ引き継がれて、重複投稿なしに全チャンネルが処理されることを確認する。
+
+    python benchmarks/multi_node.py --nodes 3 --channels 12 --keywords 2 --papers 5
+    python benchmarks/multi_node.py --nodes 3 --channels 12 --kill-after 3 --lease-ttl 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from fakes import FakeArxivServer, FakeOAIServer, FakeOpenAIServer, FakeSlackServer
+from run_benchmark import _configure_environment, _reset_database, _keyword_words
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Paper Harvester multi-node benchmark")
+    parser.add_argument('--nodes', type=int, default=3, help='ワーカープロセス数')
+    parser.add_argument('--channels', type=int, default=12, help='チャンネル数 (N)')
+    parser.add_argument('--keywords', type=int, default=2, help='チャンネルあたりのキーワード数 (K)')
+    parser.add_argument('--papers', type=int, default=5, help='キーワードあたりの論文数 (P)')
+    parser.add_argument('--shared-keywords', action='store_true', help='全チャンネルで同じキーワードを購読する')
+    parser.add_argument('--max-results', type=int, default=3, help='チャンネルごとの最大結果件数')
+    parser.add_argument('--days-back', type=int, default=2, help='検索対象期間（日数）')
+    parser.add_argument('--openai-latency', type=float, default=0.1, help='OpenAIスタブの応答遅延（秒）')
+    parser.add_argument('--openai-rpm', type=int, default=0, help='OpenAIスタブの1分あたりのリクエスト数の上限（0 で無制限）')
+    parser.add_argument('--openai-tpm', type=int, default=0, help='OpenAIスタブの1分あたりのトークン数の上限（0 で無制限）')
+    parser.add_argument('--openai-concurrency', type=int, default=4, help='同時に生成する要約の数（OPENAI_MAX_CONCURRENCY）')
+    parser.add_argument('--slack-rate', type=float, default=10000.0, help='Slackスタブのチャンネルあたり投稿レート（件/秒）')
+    parser.add_argument('--source', choices=['search', 'oai'], default='search')
+    parser.add_argument('--noise-papers', type=int, default=0, help='OAI-PMHで返すキーワードを含まない論文の数')
+    parser.add_argument('--shards', type=int, default=16, help='COORDINATION_SHARDS')
+    parser.add_argument('--lease-ttl', type=float, default=3.0, help='LEASE_TTL_SECONDS')
+    parser.add_argument('--slot-grace', type=float, default=120.0, help='SLOT_GRACE_SECONDS')
+    parser.add_argument('--kill-after', type=float, help='最初のワーカーを強制終了するまでの秒数')
+    parser.add_argument('--database-url', help='共有するデータベース（既定は一時ディレクトリのSQLite）')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--log-file', default=os.devnull, help='ワーカーのログの出力先（既定では破棄）')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def _worker(args):
+    """1ノード分の定期チェックを実行（全ノードの登録を待ってから開始）"""
+    sys.path.insert(0, str(REPO_ROOT))
+    from utils.logging_config import setup_logging, stop_logging
+    from services.slack_service import SlackService
+    from services.scheduler import SchedulerService
+
+    log_stream = open(args.log_file, 'a')
+    setup_logging(args.log_level, stream=log_stream)
+    scheduler = SchedulerService(SlackService())
+    scheduler._running = True
+    scheduler.leases.start()
+    try:
+        # 常駐しているノードと同じく、実行時刻の前に全ノードが登録済みの状態から始める
+        deadline = time.monotonic() + args.lease_ttl * 3
+        while scheduler.leases.live_nodes() < args.nodes and time.monotonic() < deadline:
+            time.sleep(0.1)
+        scheduler.check_new_papers()
+    finally:
+        scheduler.leases.stop()
+        stop_logging()
+        log_stream.close()
+
+def _report(args, elapsed, procs, slack_stub, stubs, channel_ids):
+    from config import SessionLocal
+    from models.database import HarvestCheckpoint
+
+    posts = [m for m in slack_stub.messages if m['method'] == 'chat.postMessage' and not m['thread_ts']]
+    distinct = {(m['channel'], m['text']) for m in posts}
+    channels_posted = {m['channel'] for m in posts}
+
+    db = SessionLocal()
+    try:
+        completed = db.query(HarvestCheckpoint).filter(HarvestCheckpoint.name.like('schedule:channel:%')).all()
+        slots = {c.cursor for c in completed}
+    finally:
+        db.close()
+
+    print(f"nodes                    {args.nodes}")
+    print(f"exit_codes               {[p.returncode for p in procs]}")
+    print(f"elapsed_seconds          {elapsed:.3f}")
+    print(f"papers_posted            {len(distinct)}")
+    print(f"duplicate_posts          {len(posts) - len(distinct)}")
+    print(f"channels_posted          {len(channels_posted)}/{len(channel_ids)}")
+    print(f"channels_completed       {len(completed)}/{len(channel_ids)} (slots: {', '.join(sorted(slots))})")
+    for name, stub in stubs.items():
+        print(f"{'calls.' + name:24s} {dict(stub.calls)}")
+
+def main():
+    args = parse_args()
+    if args.worker:
+        _worker(args)
+        return
+
+    arxiv_stub = FakeArxivServer(papers_per_keyword=args.papers, window_hours=min(args.days_back * 24, 24))
+    openai_stub = FakeOpenAIServer(latency=args.openai_latency, rpm=args.openai_rpm, tpm=args.openai_tpm)
+    slack_stub = FakeSlackServer(messages_per_second=args.slack_rate)
+    all_keywords = sorted({word for words in _keyword_words(args) for word in words})
+    oai_stub = FakeOAIServer(arxiv_stub, all_keywords, noise_papers=args.noise_papers)
+    stubs = {'arxiv': arxiv_stub, 'openai': openai_stub, 'slack': slack_stub, 'oai': oai_stub}
+    urls = [stub.start() for stub in stubs.values()]
+
+    workdir = tempfile.mkdtemp(prefix='paper_harvester_multi_node_')
+    _configure_environment(args, *urls, workdir)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    os.environ.update({
+        'COORDINATION_SHARDS': str(args.shards),
+        'LEASE_TTL_SECONDS': str(args.lease_ttl),
+        'SLOT_GRACE_SECONDS': str(args.slot_grace),
+    })
+    channel_ids = _reset_database(args)
+
+    procs = []
+    try:
+        started = time.perf_counter()
+        for i in range(args.nodes):
+            env = dict(os.environ, NODE_ID=f"node-{i}")
+            procs.append(subprocess.Popen([sys.executable, __file__, '--worker', *sys.argv[1:]], env=env))
+        if args.kill_after is not None:
+            time.sleep(args.kill_after)
+            procs[0].kill()
+            print(f"killed node-0 after {args.kill_after}s")
+        for proc in procs:
+            proc.wait()
+        elapsed = time.perf_counter() - started
+        _report(args, elapsed, procs, slack_stub, stubs, channel_ids)
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+        for stub in stubs.values():
+            stub.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+# paper_harvester/benchmarks/run_benchmark.py
+"""オフラインのエンドツーエンドベンチマーク
+
+arXiv・OpenAI・Slackをローカルのスタブに置き換え、N チャンネル × K キーワード ×
+P 論文 の合成データで定期チェックと /paper_check_now を実行して、
+処理速度・API呼び出し回数・ピークメモリを計測する。
+
+    python benchmarks/run_benchmark.py --channels 4 --keywords 3 --papers 20 --save baseline.json
+    python benchmarks/run_benchmark.py --channels 4 --keywords 3 --papers 20 --baseline baseline.json
+    python benchmarks/run_benchmark.py --channels 4 --keywords 3 --papers 20 --source oai --noise-papers 2000
+    python benchmarks/run_benchmark.py --mode queued   # 候補キューを更新してから /paper_check_now を計測
+    python benchmarks/run_benchmark.py --mode scheduler --channels 8 --openai-rpm 60 --openai-tpm 40000   # レート制限下の要約
+    python benchmarks/run_benchmark.py --mode upgrade   # 配信記録のないデータベースをアップグレードしても投稿し直さないか
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from fakes import FakeArxivServer, FakeOAIServer, FakeOpenAIServer, FakeSlackServer
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Paper Harvester offline benchmark")
+    parser.add_argument('--channels', type=int, default=2, help='チャンネル数 (N)')
+    parser.add_argument('--keywords', type=int, default=2, help='チャンネルあたりのキーワード数 (K)')
+    parser.add_argument('--papers', type=int, default=10, help='キーワードあたりの論文数 (P)')
+    parser.add_argument('--shared-keywords', action='store_true', help='全チャンネルで同じキーワードを購読する')
+    parser.add_argument('--max-results', type=int, default=3, help='チャンネルごとの最大結果件数')
+    parser.add_argument('--days-back', type=int, default=2, help='検索対象期間（日数）')
+    parser.add_argument('--openai-latency', type=float, default=0.5, help='OpenAIスタブの応答遅延（秒）')
+    parser.add_argument('--openai-tokens', type=int, default=600, help='OpenAIスタブが返す completion_tokens')
+    parser.add_argument('--openai-rpm', type=int, default=0, help='OpenAIスタブの1分あたりのリクエスト数の上限（0 で無制限）')
+    parser.add_argument('--openai-tpm', type=int, default=0, help='OpenAIスタブの1分あたりのトークン数の上限（0 で無制限）')
+    parser.add_argument('--openai-concurrency', type=int, default=4, help='同時に生成する要約の数（OPENAI_MAX_CONCURRENCY）')
+    parser.add_argument('--slack-rate', type=float, default=1.0, help='Slackスタブのチャンネルあたり投稿レート（件/秒）')
+    parser.add_argument('--mode', choices=['scheduler', 'check_now', 'queued', 'both', 'upgrade'], default='both',
+                        help='queued: 候補キューを更新してから /paper_check_now を計測 / '
+                             'upgrade: 配信記録を消してアップグレードし、定期チェック・/paper_check_now・バックフィルを再実行')
+    parser.add_argument('--source', choices=['search', 'oai'], default='search',
+                        help='search: キーワードごとのarXiv検索 / oai: OAI-PMHの一括取得とローカル照合')
+    parser.add_argument('--noise-papers', type=int, default=0, help='OAI-PMHで返すキーワードを含まない論文の数')
+    parser.add_argument('--log-level', default='WARNING', help='ログレベル（INFO/DEBUG でログ出力の負荷を計測）')
+    parser.add_argument('--log-file', default=os.devnull, help='ログの出力先（既定では破棄）')
+    parser.add_argument('--save', help='結果をJSONで保存するパス')
+    parser.add_argument('--baseline', help='比較対象とする以前の結果（JSON）')
+    return parser.parse_args()
+
+def _keyword_words(args):
+    """チャンネルごとの購読キーワード"""
+    return [
+        [f"topic {k}" if args.shared_keywords else f"topic {c}x{k}" for k in range(args.keywords)]
+        for c in range(args.channels)
+    ]
+
+def _configure_environment(args, arxiv_url: str, openai_url: str, slack_url: str, oai_url: str, workdir: str):
+    """config の読み込み前にスタブを向くよう環境変数を設定"""
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'ARXIV_API_URL': f"{arxiv_url}/api/query",
+        'ARXIV_DELAY_SECONDS': '0',
+        'OPENAI_BASE_URL': f"{openai_url}/v1",
+        'OPENAI_API_KEY': 'sk-benchmark',
+        'SLACK_API_URL': f"{slack_url}/api/",
+        'SLACK_BOT_TOKEN': 'xoxb-benchmark',
+        'METRICS_PORT': '0',
+        'LOG_LEVEL': args.log_level,
+        'HARVEST_MODE': args.source,
+        'OAI_PMH_URL': f"{oai_url}/oai",
+        'OAI_PMH_DELAY_SECONDS': '0',
+        'HARVEST_CATEGORIES': 'cs.CL',
+        # クライアント側のレート制限はスタブと同じ上限にする
+        'OPENAI_RPM_LIMIT': str(args.openai_rpm),
+        'OPENAI_TPM_LIMIT': str(args.openai_tpm),
+        'OPENAI_MAX_CONCURRENCY': str(args.openai_concurrency),
+        # 候補キューは計測のたびに更新し、直後の /paper_check_now から使う
+        'CANDIDATE_REFRESH_MINUTES': '60',
+        'CHECK_NOW_MAX_QUEUE_AGE_MINUTES': '120',
+    })
+    sys.path.insert(0, str(REPO_ROOT))
+
+def _reset_database(args):
+    """データベースを作り直して合成チャンネルとキーワードを登録"""
+    from config import engine, SessionLocal
+    from models.database import Base, Channel, Keyword, ChannelConfig, upgrade_schema
+
+    # 前の計測で要約のワーカーが使った接続を閉じてから作り直す（接続に残った古いスキーマの情報を使わない）
+    engine.dispose()
+    Base.metadata.drop_all(engine)
+    upgrade_schema(engine)
+
+    db = SessionLocal()
+    try:
+        keywords = {}
+        channel_ids = []
+        for c, words in enumerate(_keyword_words(args)):
+            channel = Channel(slack_channel_id=f"CBENCH{c:03d}", name=f"bench-{c}")
+            channel.config = ChannelConfig(days_back=args.days_back, max_results=args.max_results)
+            for word in words:
+                if word not in keywords:
+                    keywords[word] = Keyword(word=word)
+                channel.keywords.append(keywords[word])
+            db.add(channel)
+            channel_ids.append(channel.slack_channel_id)
+        db.commit()
+        return channel_ids
+    finally:
+        db.close()
+
+def _downgrade_database():
+    """配信・作業項目・チェックポイントの記録がなかった以前のデータベースを再現してからアップグレード
+
+    保存済みの論文は通知済みとして残る。
+    """
+    from config import engine
+    from models.database import Base, upgrade_schema
+
+    engine.dispose()
+    for table in ('paper_deliveries', 'run_items', 'harvest_checkpoints'):
+        Base.metadata.tables[table].drop(engine)
+    upgrade_schema(engine)
+
+def _run_after_upgrade(args, channel_ids):
+    """アップグレード後の定期チェック・/paper_check_now・購読直後のバックフィル"""
+    from handlers.command_handlers import run_subscription_backfill
+
+    _run_scheduler()
+    _run_check_now(channel_ids)
+    for channel_id, words in zip(channel_ids, _keyword_words(args)):
+        for word in words:
+            run_subscription_backfill(lambda *a, **k: None, channel_id, word)
+
+def _run_scheduler():
+    from services.slack_service import SlackService
+    from services.scheduler import SchedulerService
+
+    scheduler = SchedulerService(SlackService())
+    scheduler._running = True
+    # レート制限で長引く実行でも担当のリースが切れないように延長する
+    scheduler.leases.start()
+    try:
+        scheduler.check_new_papers()
+    finally:
+        scheduler.leases.stop()
+
+def _refresh_candidates():
+    from services.slack_service import SlackService
+    from services.scheduler import SchedulerService
+
+    scheduler = SchedulerService(SlackService())
+    scheduler._running = True
+    # レート制限で長引く実行でも担当のリースが切れないように延長する
+    scheduler.leases.start()
+    try:
+        scheduler.refresh_candidates()
+    finally:
+        scheduler.leases.stop()
+
+def _run_check_now(channel_ids):
+    from handlers.command_handlers import run_paper_check_now
+
+    for channel_id in channel_ids:
+        run_paper_check_now(lambda *a, **k: None, {'channel_id': channel_id, 'channel_name': channel_id})
+
+def _measure(name, func, stubs):
+    """処理を実行して所要時間・API呼び出し・メモリを計測"""
+    arxiv_stub, openai_stub, slack_stub, oai_stub = stubs
+    before = {
+        'arxiv': dict(arxiv_stub.calls),
+        'openai': dict(openai_stub.calls),
+        'slack': dict(slack_stub.calls),
+        'oai': dict(oai_stub.calls),
+        'posts': slack_stub.top_level_posts(),
+        'distinct_posts': slack_stub.distinct_top_level_posts(),
+        'rate_limited': slack_stub.rate_limited,
+        'openai_rate_limited': openai_stub.rate_limited,
+        'openai_accepted': len(openai_stub.accepted),
+    }
+    openai_stub.max_in_flight = 0
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def diff(after, key):
+        return {k: v - before[key].get(k, 0) for k, v in after.items() if v - before[key].get(k, 0)}
+
+    # 同じ論文の重複投稿は papers_posted に含めない
+    posts = slack_stub.distinct_top_level_posts() - before['distinct_posts']
+    peak_requests, peak_tokens = openai_stub.peak_window(before['openai_accepted'])
+    return {
+        'mode': name,
+        'elapsed_seconds': round(elapsed, 3),
+        'papers_posted': posts,
+        'duplicate_posts': slack_stub.top_level_posts() - before['posts'] - posts,
+        'papers_per_second': round(posts / elapsed, 3) if elapsed > 0 else 0.0,
+        'api_calls': {
+            'arxiv': diff(arxiv_stub.calls, 'arxiv'),
+            'openai': diff(openai_stub.calls, 'openai'),
+            'slack': diff(slack_stub.calls, 'slack'),
+            'oai': diff(oai_stub.calls, 'oai'),
+        },
+        'slack_rate_limited': slack_stub.rate_limited - before['rate_limited'],
+        'openai_rate_limited': openai_stub.rate_limited - before['openai_rate_limited'],
+        'openai_max_in_flight': openai_stub.max_in_flight,
+        # 任意の60秒間にOpenAIスタブが受け付けた最大値（--openai-rpm / --openai-tpm に近く、超えないのが目標）
+        'openai_peak_rpm': peak_requests,
+        'openai_peak_tpm': peak_tokens,
+        'peak_python_memory_mb': round(peak / 1024 / 1024, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def _print_report(results, baseline):
+    baseline_by_mode = {r['mode']: r for r in (baseline or {}).get('results', [])}
+    for result in results:
+        print(f"\n=== {result['mode']} ===")
+        base = baseline_by_mode.get(result['mode'])
+        for key in ('elapsed_seconds', 'papers_posted', 'duplicate_posts', 'papers_per_second', 'slack_rate_limited',
+                    'openai_rate_limited', 'openai_max_in_flight', 'openai_peak_rpm', 'openai_peak_tpm',
+                    'peak_python_memory_mb', 'max_rss_mb'):
+            line = f"{key:24s} {result[key]}"
+            if base and base.get(key):
+                change = (result[key] - base[key]) / base[key] * 100
+                line += f"  (baseline {base[key]}, {change:+.1f}%)"
+            print(line)
+        for service, calls in result['api_calls'].items():
+            print(f"{'calls.' + service:24s} {calls}")
+
+def main():
+    args = parse_args()
+
+    arxiv_stub = FakeArxivServer(papers_per_keyword=args.papers, window_hours=min(args.days_back * 24, 24))
+    openai_stub = FakeOpenAIServer(latency=args.openai_latency, completion_tokens=args.openai_tokens,
+                                   rpm=args.openai_rpm, tpm=args.openai_tpm)
+    slack_stub = FakeSlackServer(messages_per_second=args.slack_rate)
+    all_keywords = sorted({word for words in _keyword_words(args) for word in words})
+    oai_stub = FakeOAIServer(arxiv_stub, all_keywords, noise_papers=args.noise_papers)
+    stubs = (arxiv_stub, openai_stub, slack_stub, oai_stub)
+    urls = [stub.start() for stub in stubs]
+
+    workdir = tempfile.mkdtemp(prefix='paper_harvester_bench_')
+    _configure_environment(args, *urls, workdir)
+    
+    # モジュールの読み込みをメモリ計測の対象外にする
+    import services.scheduler, services.slack_service, handlers.command_handlers  # noqa: F401
+    from utils.logging_config import setup_logging, stop_logging
+    
+    log_stream = open(args.log_file, 'a')
+    setup_logging(args.log_level, stream=log_stream)
+
+    results = []
+    try:
+        if args.mode in ('scheduler', 'both'):
+            _reset_database(args)
+            results.append(_measure('scheduler', _run_scheduler, stubs))
+        if args.mode in ('check_now', 'both'):
+            channel_ids = _reset_database(args)
+            results.append(_measure('check_now', lambda: _run_check_now(channel_ids), stubs))
+        if args.mode == 'queued':
+            channel_ids = _reset_database(args)
+            results.append(_measure('refresh_candidates', _refresh_candidates, stubs))
+            results.append(_measure('check_now_queued', lambda: _run_check_now(channel_ids), stubs))
+        if args.mode == 'upgrade':
+            # 再実行の duplicate_posts が 0 なら、通知済みの論文を投稿し直していない（papers_posted は新しく見つかった論文）
+            channel_ids = _reset_database(args)
+            results.append(_measure('scheduler', _run_scheduler, stubs))
+            _downgrade_database()
+            results.append(_measure('after_upgrade', lambda: _run_after_upgrade(args, channel_ids), stubs))
+    finally:
+        for stub in stubs:
+            stub.stop()
+        stop_logging()
+        log_stream.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(f"log_level                {args.log_level}")
+    _print_report(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\nSaved results to {args.save}")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 import os
+import logging
+import socket
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 import pytz
 
@@ -13,19 +15,30 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # データベースファイルのパスを設定
 DB_PATH = os.path.join(BASE_DIR, "paperbot.db")
 
-# データベース設定
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+# データベース設定（DATABASE_URL で別のデータベースを指定可能）
+DATABASE_URL = os.getenv('DATABASE_URL', f"sqlite:///{DB_PATH}")
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-print(f"Database path: {DB_PATH}")  # デバッグ用
+if engine.dialect.name == 'sqlite':
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        # 複数プロセスから同じファイルを使うため、読み込みが書き込みを待たないWALモードにする
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA busy_timeout=30000')
+        cursor.close()
+
+logging.getLogger(__name__).debug("Database configured", extra={'database_url': DATABASE_URL})
 
 # Slack設定
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
 SLACK_APP_TOKEN = os.getenv('SLACK_APP_TOKEN')
+SLACK_API_URL = os.getenv('SLACK_API_URL', 'https://slack.com/api/')  # ベンチマーク用のスタブに差し替え可能
 
 # OpenAI設定
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # 未設定の場合は公式エンドポイント
 OPENAI_MODEL = "gpt-4o-mini-2024-07-18"  # 使用するモデルを指定
 OPENAI_PARAMS = {
     "temperature": 0.7,     # 出力の多様性（0.0-2.0）
@@ -35,6 +48,47 @@ OPENAI_PARAMS = {
     "presence_penalty": 0   # 新しいトピックの導入（-2.0-2.0）
 }
 
+# 要約のトークン予算（0 で無制限）。日付は TIMEZONE で区切る
+OPENAI_DAILY_TOKEN_BUDGET = int(os.getenv('OPENAI_DAILY_TOKEN_BUDGET', '2000000'))          # 全チャンネル合計
+OPENAI_CHANNEL_DAILY_TOKEN_BUDGET = int(os.getenv('OPENAI_CHANNEL_DAILY_TOKEN_BUDGET', '0'))  # チャンネルごと
+SUMMARY_SHORT_PROMPT_RATIO = float(os.getenv('SUMMARY_SHORT_PROMPT_RATIO', '0.2'))  # 残りがこの割合を切ったら短い要約にする
+SUMMARY_COMPLETION_TOKENS = {  # 出力トークン数の見込み（short はこれを上限として指定する）
+    'full': 1500,
+    'short': 300,
+}
+# OpenAIのレート制限（アカウントの上限。複数ノードで動かす場合はノード数で割った値を指定する。0 で無制限）
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', '500'))        # 1分あたりのリクエスト数
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', '200000'))     # 1分あたりのトークン数（入力と出力の合計）
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '4'))  # 同時に生成する要約の数
+OPENAI_PRICE_PER_1M_TOKENS = {  # USD（使用量の表示に使用）
+    'prompt': 0.15,
+    'completion': 0.60,
+}
+
+# 要約のストリーミング表示（/paper_check_now などで、生成中の要約でスレッドのメッセージを更新する）
+SUMMARY_STREAMING = os.getenv('SUMMARY_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+SLACK_STREAM_UPDATE_SECONDS = float(os.getenv('SLACK_STREAM_UPDATE_SECONDS', '1.0'))  # chat.update の最短間隔
+
+# arXiv API設定
+ARXIV_API_URL = os.getenv('ARXIV_API_URL', 'https://export.arxiv.org/api/query')
+ARXIV_DELAY_SECONDS = float(os.getenv('ARXIV_DELAY_SECONDS', '3'))  # リクエスト間隔（秒）
+
+# 論文ソース設定
+# 有効なソース（カンマ区切り、先に書いたソースの論文を重複判定で優先する）
+PAPER_SOURCES = [s.strip() for s in os.getenv('PAPER_SOURCES', 'arxiv').split(',') if s.strip()]
+# ソースごとのリクエスト間隔（秒、例: "semantic_scholar=1,biorxiv=0.5"）。arXivは ARXIV_DELAY_SECONDS に従う
+PAPER_SOURCE_DELAYS = {
+    name.strip(): float(delay)
+    for name, delay in (item.split('=', 1) for item in os.getenv('PAPER_SOURCE_DELAYS', '').split(',') if '=' in item)
+}
+
+# OAI-PMHによるカテゴリ単位の一括取得設定
+# HARVEST_MODE=oai のとき、キーワードごとの検索の代わりにカテゴリの新着一覧を取得してローカルで照合する
+HARVEST_MODE = os.getenv('HARVEST_MODE', 'search')  # 'search' または 'oai'
+OAI_PMH_URL = os.getenv('OAI_PMH_URL', 'https://oaipmh.arxiv.org/oai')
+HARVEST_CATEGORIES = [c.strip() for c in os.getenv('HARVEST_CATEGORIES', 'cs.AI,cs.CL,cs.CV,cs.LG').split(',') if c.strip()]
+OAI_PMH_DELAY_SECONDS = float(os.getenv('OAI_PMH_DELAY_SECONDS', '3'))  # ページ取得の間隔（秒）
+
 # アプリケーション設定
 DEFAULT_DAYS_BACK = 7         # デフォルトの検索対象期間（日数）
 DEFAULT_MAX_RESULTS = 10      # デフォルトの検索結果最大件数
@@ -43,6 +97,23 @@ MIN_DAYS_LIMIT = 1           # 検索対象期間の最小値
 MAX_RESULTS_LIMIT = 10       # 検索結果件数の最大値
 MIN_RESULTS_LIMIT = 1        # 検索結果件数の最小値
 
+# 関連度ランキング設定
+RELEVANCE_TITLE_WEIGHT = 3.0  # タイトル中の出現に対する重み
+RELEVANCE_LENGTH_NORM = 0.75  # 文書長による正規化の強さ（0.0-1.0）
+
+# キーワードの同義語（代表表記: 表記ゆれ）
+# 購読時は代表表記にまとめて重複を除き、arXiv検索では全ての表記をORで検索する
+KEYWORD_SYNONYMS = {
+    'large language model': ['llm', 'llms', 'large language models'],
+}
+
+# 類似論文検出設定（MinHash/LSH）
+NEAR_DUPLICATE_THRESHOLD = 0.6     # 重複とみなす推定Jaccard類似度
+NEAR_DUPLICATE_NUM_PERM = 128      # MinHashのハッシュ関数の数
+NEAR_DUPLICATE_BANDS = 32          # LSHのバンド数（NUM_PERMを割り切れる値）
+NEAR_DUPLICATE_SHINGLE_SIZE = 3    # 単語シングルの長さ
+NEAR_DUPLICATE_LOOKBACK_DAYS = 30  # 比較対象とする保存済み論文の期間（日数）
+
 # タイムゾーンとスケジュール設定
 TIMEZONE = "Asia/Tokyo"
 SCHEDULE_TIMES = [
@@ -50,15 +121,50 @@ SCHEDULE_TIMES = [
     "15:00",
     "21:00",
 ]
+# チャンネルごとの実行時刻は /paper_set_schedule で設定（未設定のチャンネルは SCHEDULE_TIMES と TIMEZONE を使う）
+SCHEDULE_JITTER_SECONDS = float(os.getenv('SCHEDULE_JITTER_SECONDS', '300'))  # 同じ時刻のチャンネルを分散させる最大の遅延
+
+# /paper_check_now の候補キュー（定期チェックの合間に検索・照合・要約を済ませ、未配信の論文を作業項目として用意しておく）
+CANDIDATE_REFRESH_MINUTES = float(os.getenv('CANDIDATE_REFRESH_MINUTES', '0'))  # 候補キューを更新する間隔（0 なら定期チェックの実行時刻の中間に1回、負なら定期チェックのときだけ）
+CHECK_NOW_MAX_QUEUE_AGE_MINUTES = float(os.getenv('CHECK_NOW_MAX_QUEUE_AGE_MINUTES', '0'))  # これより古い候補キューはその場の検索で補う（0 なら直近の更新時刻より前に更新したもの）
+
+# 複数インスタンスでの分担設定（共有データベースのリースでチャンネルをシャードに分けて担当する）
+NODE_ID = os.getenv('NODE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+COORDINATION_SHARDS = int(os.getenv('COORDINATION_SHARDS', '16'))  # チャンネルを分けるシャード数
+LEASE_TTL_SECONDS = float(os.getenv('LEASE_TTL_SECONDS', '60'))   # 更新が途絶えたリースを他のノードが引き継ぐまでの時間
+SLOT_GRACE_SECONDS = float(os.getenv('SLOT_GRACE_SECONDS', '900'))  # 他のノードが担当するチャンネルの完了を待つ最長時間
+
+# ボタン操作（興味あり・後で読む・アブストラクトの表示）の設定
+ACTION_BATCH_SIZE = int(os.getenv('ACTION_BATCH_SIZE', '50'))          # この件数が溜まったらまとめて書き込む
+ACTION_FLUSH_SECONDS = float(os.getenv('ACTION_FLUSH_SECONDS', '2'))   # 件数に満たなくても書き込むまでの最長時間
+READING_LIST_PAGE_SIZE = 10  # /paper_reading_list の1ページの件数
+ABSTRACT_CACHE_SIZE = int(os.getenv('ABSTRACT_CACHE_SIZE', '1024'))  # アブストラクトの表示切り替え用にメモリに保持する件数
+
+# 過去の論文の取得設定（python manage.py history）
+HISTORY_BACKFILL_WINDOW_DAYS = int(os.getenv('HISTORY_BACKFILL_WINDOW_DAYS', '7'))  # 1回の検索で対象にする期間（日数）
+HISTORY_BACKFILL_MAX_PER_WINDOW = 10000  # 1つの期間で取得する最大件数（arXiv APIで取得できる上限）
+
+# エクスポート設定（python manage.py export）
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(BASE_DIR, 'exports'))
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '5000'))  # データベースから読む単位で、Parquetの行グループの行数
 
 # PDF処理設定
 PDF_DOWNLOAD_TIMEOUT = 10    # PDFダウンロードのタイムアウト（秒）
 PDF_MAX_PAGES = 50          # 処理する最大ページ数
 
+# メトリクス設定（METRICS_PORT=0 で無効化）
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+
 # ログ設定
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-LOG_LEVEL = 'INFO'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_JSON = os.getenv('LOG_JSON', '').lower() in ('1', 'true', 'yes')  # 1行1JSONで出力
 
 # エラーハンドリング設定
 MAX_RETRIES = 3             # APIリクエストの最大リトライ回数
-RETRY_DELAY = 1             # リトライ間の待機時間（秒）
\ No newline at end of file
+RETRY_DELAY = 1             # リトライ間の待機時間（秒、回数ごとに倍にしてジッタを加える）
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))  # 待機の上限（Retry-After がこれより長ければ諦めて後に回す）
+RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', '0.2'))  # リクエスト数に対する再試行の割合の上限
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # サーキットを開く連続失敗回数
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '60'))  # サーキットを開いてから試しに呼び出すまでの時間
\ No newline at end of file
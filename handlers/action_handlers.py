@@ -1,10 +1,14 @@
 # paper_harvester/handlers/action_handlers.py
 
-from config import SessionLocal
-from models.database import Paper
-from utils.message_builder import create_error_blocks
+from handlers.command_handlers import respond_reading_list
+from services.action_recorder import action_recorder
+from services.abstract_cache import abstract_cache
+from utils.message_builder import create_error_blocks, create_abstract_block, ABSTRACT_SHOW_TEXT, ABSTRACT_HIDE_TEXT
 from slack_sdk.errors import SlackApiError
 from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
 
 def setup_action_handlers(app):
     @app.action("toggle_abstract")
@@ -14,35 +18,28 @@ def setup_action_handlers(app):
         
         try:
             blocks = body['message']['blocks']
-            abstract_block_id = body['actions'][0]['block_id']
+            action = body['actions'][0]
+            content_block_id = action['block_id'] + '_content'
+            button_index = next(i for i, block in enumerate(blocks) if block.get('block_id') == action['block_id'])
             
-            # 現在の表示状態をチェック
-            for i, block in enumerate(blocks):
-                if block.get('block_id') == abstract_block_id + '_content':
-                    # アブストラクトが表示中なので非表示にする
-                    blocks.pop(i)
-                    button_text = "📖 アブストラクトを表示"
-                    break
+            # 変更するのはボタンの直後のアブストラクトのブロックとボタンのテキストだけ
+            if button_index + 1 < len(blocks) and blocks[button_index + 1].get('block_id') == content_block_id:
+                # アブストラクトが表示中なので非表示にする
+                del blocks[button_index + 1]
+                button_text = ABSTRACT_SHOW_TEXT
             else:
-                # アブストラクトを表示する
-                abstract_text = body['actions'][0]['value']
-                abstract_block = {
-                    "type": "section",
-                    "block_id": abstract_block_id + '_content',
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"*アブストラクト*\n{abstract_text}"
-                    }
-                }
-                button_index = next(i for i, block in enumerate(blocks) 
-                                  if block.get('block_id') == abstract_block_id)
-                blocks.insert(button_index + 1, abstract_block)
-                button_text = "📖 アブストラクトを隠す"
-            
-            # ボタンのテキストを更新
-            for block in blocks:
-                if block.get('block_id') == abstract_block_id:
-                    block['elements'][0]['text']['text'] = button_text
+                # ボタンには arXiv ID だけがあるので、アブストラクトはキャッシュ（なければ papers テーブル）から取得する
+                abstract = abstract_cache.get(action['value'])
+                if abstract is None:
+                    client.chat_postEphemeral(
+                        channel=body['channel']['id'],
+                        user=body['user']['id'],
+                        text="この論文のアブストラクトが見つかりませんでした。"
+                    )
+                    return
+                blocks.insert(button_index + 1, create_abstract_block(content_block_id, abstract))
+                button_text = ABSTRACT_HIDE_TEXT
+            blocks[button_index]['elements'][0]['text']['text'] = button_text
             
             # メッセージを更新
             client.chat_update(
@@ -52,16 +49,16 @@ def setup_action_handlers(app):
                 text=body['message']['text']
             )
             
-        except Exception as e:
-            print(f"Error in toggle_abstract: {e}")
+        except Exception:
+            logger.exception("Error in toggle_abstract", extra={'user_id': body['user']['id']})
             try:
                 client.chat_postEphemeral(
                     channel=body['channel']['id'],
                     user=body['user']['id'],
                     blocks=create_error_blocks("アブストラクトの表示切り替えに失敗しました。")
                 )
-            except SlackApiError:
-                print(f"Failed to send error message: {e}")
+            except SlackApiError as e:
+                logger.warning("Failed to send error message", extra={'error': e.response['error']})
 
     @app.action("paper_interest")
     def handle_paper_interest(ack: Any, body: Dict[str, Any], client: Any):
@@ -70,6 +67,9 @@ def setup_action_handlers(app):
         user = body['user']['id']
         
         try:
+            # 記録（データベースへはまとめて書き込む）
+            action_recorder().record(user, 'interest', body['actions'][0]['value'], body['channel']['id'])
+            
             # スレッドにメッセージを投稿
             client.chat_postMessage(
                 channel=body['channel']['id'],
@@ -83,25 +83,17 @@ def setup_action_handlers(app):
                 user=user,
                 text="論文に興味があることを記録しました 👍"
             )
-            
-            # データベースに記録（オプション）
-            db = SessionLocal()
-            try:
-                # TODO: 興味を持った論文の記録を実装
-                pass
-            finally:
-                db.close()
-                
-        except Exception as e:
-            print(f"Error in paper_interest: {e}")
+
+        except Exception:
+            logger.exception("Error in paper_interest", extra={'user_id': body['user']['id']})
             try:
                 client.chat_postEphemeral(
                     channel=body['channel']['id'],
                     user=user,
                     blocks=create_error_blocks("アクションの記録に失敗しました。")
                 )
-            except SlackApiError:
-                print(f"Failed to send error message: {e}")
+            except SlackApiError as e:
+                logger.warning("Failed to send error message", extra={'error': e.response['error']})
 
     @app.action("paper_read_later")
     def handle_paper_read_later(ack: Any, body: Dict[str, Any], client: Any):
@@ -110,6 +102,9 @@ def setup_action_handlers(app):
         user = body['user']['id']
         
         try:
+            # 記録（データベースへはまとめて書き込む）
+            action_recorder().record(user, 'read_later', body['actions'][0]['value'], body['channel']['id'])
+            
             # スレッドにメッセージを投稿
             client.chat_postMessage(
                 channel=body['channel']['id'],
@@ -123,25 +118,24 @@ def setup_action_handlers(app):
                 user=user,
                 text="論文を後で読むリストに追加しました 📌"
             )
-            
-            # データベースに記録（オプション）
-            db = SessionLocal()
-            try:
-                # TODO: 後で読む論文の記録を実装
-                pass
-            finally:
-                db.close()
-                
-        except Exception as e:
-            print(f"Error in paper_read_later: {e}")
+
+        except Exception:
+            logger.exception("Error in paper_read_later", extra={'user_id': body['user']['id']})
             try:
                 client.chat_postEphemeral(
                     channel=body['channel']['id'],
                     user=user,
                     blocks=create_error_blocks("アクションの記録に失敗しました。")
                 )
-            except SlackApiError:
-                print(f"Failed to send error message: {e}")
+            except SlackApiError as e:
+                logger.warning("Failed to send error message", extra={'error': e.response['error']})
+
+    @app.action("reading_list_next")
+    def handle_reading_list_next(ack: Any, body: Dict[str, Any], respond: Any):
+        """保存した論文の一覧の次のページを表示"""
+        ack()
+        action, cursor = body['actions'][0]['value'].split('|', 1)
+        respond_reading_list(respond, body['user']['id'], action, cursor, replace_original=True)
 
     @app.action("paper_read")
     def handle_paper_read(ack: Any, body: Dict[str, Any], client: Any):
@@ -1,21 +1,350 @@
 # paper_harvester/handlers/command_handlers.py
+import logging
 from config import (
     SessionLocal, 
     DEFAULT_DAYS_BACK,
     DEFAULT_MAX_RESULTS,
-    SLACK_BOT_TOKEN
+    SLACK_BOT_TOKEN,
+    SLACK_API_URL,
+    HARVEST_MODE,
+    OPENAI_DAILY_TOKEN_BUDGET,
+    OPENAI_CHANNEL_DAILY_TOKEN_BUDGET,
+    SUMMARY_STREAMING,
+    READING_LIST_PAGE_SIZE,
+    CHECK_NOW_MAX_QUEUE_AGE_MINUTES
 )
-from models.database import Channel, Keyword, ChannelConfig
+from models.database import Channel, Keyword, ChannelConfig, PaperDelivery, RunItem
+from services.action_recorder import ActionRecorder, ACTIONS, action_recorder
 from services.arxiv import ArxivService
+from services.author_index import AuthorIndex
+from services.backfill import SubscriptionBackfill
+from services.keyword_matcher import KeywordMatcher
+from services.oai_harvester import OAIHarvester
 from services.paper_processor import PaperProcessor
-from utils.message_builder import create_paper_message_blocks, create_summary_blocks
+from utils.message_builder import create_paper_message_blocks, create_summary_blocks, create_reading_list_blocks
 from sqlalchemy.orm import joinedload
 from slack_bolt import App
 from slack_sdk import WebClient
-import time
-from services.openai_service import OpenAIService
+from slack_sdk.errors import SlackApiError
+from datetime import datetime, timedelta
+from typing import Optional
+from services.run_tracer import RunTracer, trace_span, percentile
+from services.scheduler import SchedulerService
+from services.slack_service import ProgressiveMessage, call_slack
+from services.summary_budget import SummaryBudget, SummaryQueue, token_cost
+from utils.keyword_query import canonicalize, KeywordQueryError
+from utils.schedule_times import parse_schedule, ScheduleError
+from utils.resilience import unavailable_services, CircuitOpenError
+import pytz
 
-client = WebClient(token=SLACK_BOT_TOKEN)
+logger = logging.getLogger(__name__)
+
+client = WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL)
+
+def run_paper_check_now(respond, command) -> str:
+    """チャンネルの全キーワードで論文をチェックして投稿（実行トレースを記録）"""
+    tracer = RunTracer('check_now', command["channel_id"])
+    with tracer.activate():
+        status = _paper_check_now(respond, command)
+    tracer.finish(status)
+    return status
+
+def _paper_check_now(respond, command) -> str:
+    """/paper_check_now の本体（実行結果を返す）"""
+    db = SessionLocal()
+    try:
+        log_fields = {'channel_id': command['channel_id']}
+        logger.info("Starting paper_check_now", extra=log_fields)
+        
+        # チャンネルとキーワードの取得
+        channel = db.query(Channel).filter_by(
+            slack_channel_id=command["channel_id"]
+        ).options(
+            joinedload(Channel.keywords),
+            joinedload(Channel.config)
+        ).first()
+        
+        if not channel or not (channel.keywords or AuthorIndex.follows(db, [channel.id])):
+            logger.info("No channel or keywords found", extra=log_fields)
+            respond("このチャンネルにはキーワードが設定されていません。`/paper_subscribe`で設定してください。")
+            return 'ok'
+        
+        # 障害中のサービスがあれば、タイムアウトを待たずにすぐ知らせる
+        unavailable = unavailable_services()
+        if unavailable:
+            logger.warning("Dependencies unavailable, skipping paper_check_now", extra={**log_fields, 'services': ','.join(unavailable)})
+            respond(f"{'、'.join(unavailable)} に接続できない状態です。約{int(max(unavailable.values())) + 1}秒後に再度お試しください。")
+            return 'deferred'
+        
+        queue = SummaryQueue()
+        budget = SummaryBudget()
+        
+        # 定期チェック・候補キューの更新で見つけて要約済みの未配信の論文を先に投稿
+        with trace_span('drain', slack_channel_id=command["channel_id"]):
+            total_new_papers = _drain_candidates(db, channel, budget)
+        
+        # 候補キューが新しければ、arXivへの問い合わせをせずに返す
+        checked_at = datetime.now(pytz.UTC)
+        refreshed_at = SchedulerService.candidates_refreshed_at(db, channel)
+        if refreshed_at and _queue_fresh(channel, refreshed_at, checked_at):
+            age_minutes = int((checked_at - refreshed_at).total_seconds() // 60)
+            logger.info("Completed paper_check_now from candidate queue", extra={
+                **log_fields,
+                'papers': total_new_papers,
+                'queue_age_minutes': age_minutes
+            })
+            if total_new_papers == 0:
+                respond(f"前回の確認（{age_minutes}分前）以降に新着論文はありません。")
+            else:
+                respond(f"✅ {total_new_papers}件の新着論文を投稿しました（{age_minutes}分前に更新した候補から）。")
+            return 'ok'
+        
+        # 候補キューが古い（または未作成の）場合はその場で検索する（見つけた論文も作業項目として保存してから投稿）
+        slot = checked_at.isoformat()
+        complete = True
+        if HARVEST_MODE == 'oai':
+            # カテゴリの新着一覧を更新してから、保存済みの論文とローカルで照合
+            try:
+                with trace_span('harvest'):
+                    OAIHarvester().harvest(db)
+            except Exception:
+                db.rollback()
+                complete = False
+                logger.exception("Error harvesting OAI-PMH listings", extra=log_fields)
+            with trace_span('match', slack_channel_id=command["channel_id"]):
+                matches = KeywordMatcher.pending_papers(db, [channel]).get(channel.id, [])
+            queue.extend(channel, matches)
+        else:
+            # 検索結果はページごとに保存されるので、後のページの取得を待たずに先の論文から投稿する
+            # （類似論文のインデックスはキーワード間で共有する）
+            with ArxivService.shared_search():
+                for keyword in channel.keywords:
+                    with trace_span('keyword', slack_channel_id=command["channel_id"], keyword=keyword.word):
+                        posted = 0
+                        try:
+                            for paper in ArxivService.iter_new_papers(db, keyword.word, command["channel_id"], commit=False):
+                                posted += _post_new_paper(db, channel, paper, keyword, slot, budget)
+                        except Exception:
+                            db.rollback()
+                            complete = False
+                            logger.exception("Error processing keyword", extra={**log_fields, 'keyword': keyword.word})
+                        logger.debug("Found new papers", extra={**log_fields, 'keyword': keyword.word, 'papers': posted})
+                        total_new_papers += posted
+        
+        # フォロー中の著者の論文は保存済みの論文から照合する（arXivへの問い合わせはしない）
+        with trace_span('match_authors', slack_channel_id=command["channel_id"]):
+            queue.extend(channel, AuthorIndex.pending_papers(db, [channel]).get(channel.id, []))
+        
+        # 関連度の高い論文から、トークン予算の範囲で要約して投稿
+        for _, paper, keyword in queue:
+            total_new_papers += _post_new_paper(db, channel, paper, keyword, slot, budget)
+        if complete:
+            SchedulerService.mark_candidates_refreshed(db, channel, checked_at)
+        
+        logger.info("Completed paper_check_now", extra={**log_fields, 'papers': total_new_papers})
+        if total_new_papers == 0:
+            respond(f"検索期間（過去{channel.config.days_back}日間）に新着論文は見つかりませんでした。")
+        else:
+            respond(f"✅ {total_new_papers}件の新着論文が見つかりました。")
+        return 'ok'
+        
+    except Exception:
+        logger.exception("Error in handle_paper_check_now", extra={'channel_id': command['channel_id']})
+        respond("論文チェック中にエラーが発生しました。")
+        return 'error'
+    finally:
+        db.close()
+
+def run_subscription_backfill(respond, channel_id, keyword_text) -> str:
+    """購読したキーワードに一致する保存済みの論文をすぐに投稿（実行トレースを記録）"""
+    tracer = RunTracer('backfill', channel_id)
+    with tracer.activate():
+        status = _subscription_backfill(respond, channel_id, keyword_text)
+    tracer.finish(status)
+    return status
+
+def _subscription_backfill(respond, channel_id, keyword_text) -> str:
+    """購読直後のバックフィルの本体（実行結果を返す）"""
+    db = SessionLocal()
+    try:
+        channel = db.query(Channel).filter_by(
+            slack_channel_id=channel_id
+        ).options(
+            joinedload(Channel.keywords),
+            joinedload(Channel.config)
+        ).first()
+        canonical = canonicalize(keyword_text)
+        keyword = next(
+            (k for k in channel.keywords if k.canonical == canonical or k.word == keyword_text),
+            None
+        ) if channel else None
+        if keyword is None:
+            return 'ok'
+        
+        papers = SubscriptionBackfill.backfill(db, channel, keyword)
+        days_back = channel.config.days_back if channel.config else DEFAULT_DAYS_BACK
+        if not papers:
+            respond(f"過去{days_back}日間に「{keyword.word}」に一致する未配信の論文はありませんでした。")
+            return 'ok'
+        
+        respond(f"📚 過去{days_back}日間の論文から{len(papers)}件を投稿します。")
+        budget = SummaryBudget()
+        slot = datetime.now(pytz.UTC).isoformat()
+        for paper in papers:
+            with trace_span('keyword', slack_channel_id=channel_id, keyword=keyword.word):
+                _post_new_paper(db, channel, paper, keyword, slot, budget)
+        return 'ok'
+        
+    except Exception:
+        logger.exception("Error in subscription backfill", extra={'channel_id': channel_id, 'keyword': keyword_text})
+        return 'error'
+    finally:
+        db.close()
+
+# /paper_check_now が投稿する作業項目の状態（送信中の作業項目は定期チェックに任せる）
+_DRAIN_STATES = ('fetched', 'summarized')
+
+def _drain_candidates(db, channel, budget) -> int:
+    """チャンネルの未配信の作業項目を関連度の高い順に投稿し、投稿した件数を返す
+
+    作業項目は送信中（posting）に進めてから投稿するので、同時に動いている定期チェックと二重に投稿しない。
+    """
+    items = db.query(RunItem)\
+        .filter(RunItem.channel_id == channel.id, RunItem.state.in_(_DRAIN_STATES))\
+        .order_by(RunItem.id)\
+        .all()
+    if not items:
+        return 0
+    delivered = {
+        paper_id for (paper_id,) in db.query(PaperDelivery.paper_id)
+        .filter(PaperDelivery.channel_id == channel.id, PaperDelivery.paper_id.in_([item.paper_id for item in items]))
+    }
+    matches = SchedulerService.item_matches(db, {channel.id: channel}, items)
+    by_paper = {}
+    for item in items:
+        if item.paper_id in delivered:
+            # その場の検索で先に投稿した論文
+            SchedulerService.advance_item(db, item, _DRAIN_STATES, 'posted')
+        elif matches[item.id] is not None:
+            by_paper[item.paper_id] = item
+    queue = SummaryQueue()
+    queue.extend(channel, [(item.paper, matches[item.id]) for item in by_paper.values()])
+    
+    return sum(_post_item(db, channel, by_paper[paper.id], paper, match, budget) for _, paper, match in queue)
+
+def _queue_fresh(channel, refreshed_at: datetime, now: datetime) -> bool:
+    """候補キューが新しく、その場の検索を省けるか（CHECK_NOW_MAX_QUEUE_AGE_MINUTES が 0 なら直近の更新時刻以降に更新済みか）"""
+    if CHECK_NOW_MAX_QUEUE_AGE_MINUTES > 0:
+        return now - refreshed_at <= timedelta(minutes=CHECK_NOW_MAX_QUEUE_AGE_MINUTES)
+    return refreshed_at >= SchedulerService.refresh_slot(channel, now)[0]
+
+def _post_new_paper(db, channel, paper, keyword, slot: str, budget) -> bool:
+    """その場で見つけた論文を作業項目として保存してから投稿（投稿できたか返す）"""
+    SchedulerService.add_items(db, channel, [(paper, keyword)], slot)
+    db.commit()
+    item = db.query(RunItem).filter_by(channel_id=channel.id, paper_id=paper.id).one()
+    return _post_item(db, channel, item, paper, keyword, budget)
+
+def _post_item(db, channel, item, paper, match, budget) -> bool:
+    """作業項目を送信中（posting）に進めてから投稿し、結果に応じて状態を進める（投稿できたか返す）
+
+    定期チェック・候補キューの更新と同時に動いても二重に投稿しない。
+    """
+    if not SchedulerService.advance_item(db, item, _DRAIN_STATES, 'posting'):
+        return False  # 定期チェックが先に投稿した
+    with trace_span('deliver', slack_channel_id=channel.slack_channel_id, keyword=match.word):
+        try:
+            sent = _post_paper_with_summary(db, channel, paper, match, budget)
+        except Exception:
+            # メインメッセージを投稿済みなら配信済みにする（投稿できたか分からなければ、送信中のまま定期チェックが確認する）
+            db.rollback()
+            if db.query(PaperDelivery.id).filter_by(channel_id=channel.id, paper_id=paper.id).first():
+                SchedulerService.advance_item(db, item, ('posting',), 'posted')
+            raise
+    SchedulerService.advance_item(db, item, ('posting',), 'posted' if sent else 'summarized' if paper.summary else 'fetched')
+    return sent
+
+def _post_paper_with_summary(db, channel, paper, keyword, budget) -> bool:
+    """論文を投稿してスレッドに要約（予算が足りなければアブストラクト）を付け、配信済みとして記録（投稿できたか返す）"""
+    blocks = create_paper_message_blocks(paper, keyword.word)
+    
+    with trace_span('slack_post', arxiv_id=paper.arxiv_id):
+        response = call_slack(lambda: client.chat_postMessage(
+            channel=channel.slack_channel_id,
+            blocks=blocks,
+            text=f"New paper: {paper.title}"
+        ))
+    
+    if not response or 'ts' not in response:
+        return False
+    db.add(PaperDelivery(channel_id=channel.id, paper_id=paper.id, keyword_id=keyword.id, message_ts=response['ts']))
+    db.commit()
+    
+    if not (SUMMARY_STREAMING and not paper.summary and _post_streamed_summary(db, channel, paper, response['ts'], budget)):
+        # 仮のメッセージを投稿できなかった場合も、要約をまとめて送る
+        summary = budget.summarize(db, channel, paper) or _abstract_only_text(paper)
+        _post_thread_reply(channel, paper, response['ts'], summary)
+    return True
+
+def _post_streamed_summary(db, channel, paper, thread_ts, budget) -> bool:
+    """スレッドに仮のメッセージを投稿し、生成中の要約で更新していく（仮のメッセージを投稿できなければ False）"""
+    placeholder_ts = _post_thread_reply(channel, paper, thread_ts, "📝 要約を生成しています…")
+    if placeholder_ts is None:
+        return False
+    message = ProgressiveMessage(client, channel.slack_channel_id, placeholder_ts)
+    summary = budget.summarize(db, channel, paper, on_delta=message.update)
+    with trace_span('slack_update', arxiv_id=paper.arxiv_id):
+        message.finish(summary or _abstract_only_text(paper))
+    return True
+
+def _post_thread_reply(channel, paper, thread_ts, text) -> Optional[str]:
+    """スレッドに返信して ts を返す（送信できなければログに残して None。メインメッセージは配信済みのまま）"""
+    log_fields = {'channel_id': channel.slack_channel_id, 'arxiv_id': paper.arxiv_id, 'ts': thread_ts}
+    try:
+        with trace_span('slack_post', arxiv_id=paper.arxiv_id):
+            response = call_slack(lambda: client.chat_postMessage(
+                channel=channel.slack_channel_id,
+                thread_ts=thread_ts,
+                text=text
+            ))
+    except CircuitOpenError as e:
+        logger.warning("Slack unavailable, thread reply not sent", extra={**log_fields, 'retry_in': round(e.retry_in)})
+        return None
+    except SlackApiError as e:
+        logger.error("Failed to send thread reply", extra={**log_fields, 'error': e.response['error']})
+        return None
+    except Exception:
+        logger.exception("Error sending thread reply", extra=log_fields)
+        return None
+    return response.get('ts') if response else None
+
+def _abstract_only_text(paper) -> str:
+    """要約を生成できなかったときのスレッドの本文"""
+    return f"（要約は省略されました）\n\n*Abstract*\n{paper.abstract}"
+
+def respond_reading_list(respond, user_id: str, action: str, cursor=None, replace_original: bool = False):
+    """ユーザーが保存した論文の一覧を1ページ分表示"""
+    # 書き込み待ちの操作も一覧に含める
+    action_recorder().flush()
+    
+    db = SessionLocal()
+    try:
+        try:
+            entries, next_cursor = ActionRecorder.reading_list(db, user_id, action, READING_LIST_PAGE_SIZE, cursor)
+        except ValueError:
+            respond("ページの指定が正しくありません。", replace_original=replace_original)
+            return
+        if not entries:
+            respond("保存した論文はありません。" if cursor is None else "これ以上の論文はありません。",
+                    replace_original=replace_original)
+            return
+        respond(
+            blocks=create_reading_list_blocks(entries, action, next_cursor),
+            text="保存した論文の一覧",
+            replace_original=replace_original
+        )
+    finally:
+        db.close()
 
 def setup_command_handlers(app):
     # ... 既存のコード ...
@@ -31,6 +360,13 @@ def setup_command_handlers(app):
                 return
             
             keyword_text = command["text"].strip()
+            try:
+                canonicalize(keyword_text)
+            except KeywordQueryError as e:
+                respond(f"キーワードの書式が正しくありません: {e}\n"
+                        "例：`/paper_subscribe \"diffusion model\" AND cat:cs.CV NOT survey`")
+                return
+            
             db = SessionLocal()
             
             try:
@@ -42,11 +378,13 @@ def setup_command_handlers(app):
                     
             finally:
                 db.close()
+            
+            # 次回の定期チェックを待たずに、保存済みの論文から一致するものを投稿
+            if success_message:
+                run_subscription_backfill(respond, command["channel_id"], keyword_text)
                 
-        except Exception as e:
-            print(f"Error in handle_paper_subscribe: {e}")
-            import traceback
-            print(traceback.format_exc())
+        except Exception:
+            logger.exception("Error in handle_paper_subscribe", extra={'channel_id': command['channel_id']})
             respond("エラーが発生しました。")
 
     @app.command("/paper_list_keywords")
@@ -85,7 +423,11 @@ def setup_command_handlers(app):
         db = SessionLocal()
         try:
             channel = db.query(Channel).filter_by(slack_channel_id=command["channel_id"]).first()
-            keyword = db.query(Keyword).filter_by(word=word).first()
+            try:
+                condition = (Keyword.canonical == canonicalize(word)) | (Keyword.word == word)
+            except KeywordQueryError:
+                condition = Keyword.word == word
+            keyword = db.query(Keyword).filter(condition).first()
             
             if channel and keyword and keyword in channel.keywords:
                 channel.keywords.remove(keyword)
@@ -96,83 +438,72 @@ def setup_command_handlers(app):
         finally:
             db.close()
 
-    @app.command("/paper_check_now")
-    def handle_paper_check_now(ack, respond, command):
-        """今すぐ論文をチェック"""
+    @app.command("/paper_follow_author")
+    def handle_follow_author(ack, respond, command):
+        """著者をフォロー（名前を省略するとフォロー中の著者を表示）"""
         ack()
-        
+
+        name = command.get('text', '').strip()
         db = SessionLocal()
         try:
-            print(f"\n=== Starting paper_check_now for channel: {command['channel_id']} ===")
-            
-            # チャンネルとキーワードの取得
-            channel = db.query(Channel).filter_by(
-                slack_channel_id=command["channel_id"]
-            ).options(
-                joinedload(Channel.keywords),
-                joinedload(Channel.config)
-            ).first()
-            
-            print(f"Channel found: {channel is not None}")
-            if channel:
-                print(f"Keywords count: {len(channel.keywords) if channel.keywords else 0}")
-                print(f"Keywords: {[k.word for k in channel.keywords] if channel.keywords else []}")
-                print(f"Config: days_back={channel.config.days_back if channel.config else 'None'}")
-            
-            if not channel or not channel.keywords:
-                print("No channel or keywords found")
-                respond("このチャンネルにはキーワードが設定されていません。`/paper_subscribe`で設定してください。")
+            if not name:
+                channel = db.query(Channel).filter_by(slack_channel_id=command["channel_id"]).first()
+                follows = AuthorIndex.follows(db, [channel.id]) if channel else []
+                if follows:
+                    respond(f"フォロー中の著者: {'、'.join(f'「{f.author.name}」' for f in follows)}")
+                else:
+                    respond("フォローする著者を指定してください。例：`/paper_follow_author Yoshua Bengio`")
                 return
-            
-            openai_service = OpenAIService()
-            total_new_papers = 0
-            
-            for keyword in channel.keywords:
-                print(f"\nProcessing keyword: {keyword.word}")
-                new_papers = ArxivService.fetch_and_process_papers(db, keyword.word, command["channel_id"])
-                print(f"Found {len(new_papers)} new papers for keyword: {keyword.word}")
-                total_new_papers += len(new_papers)
-                
-                for paper in new_papers:
-                    print(f"Creating message blocks for paper: {paper.title}")
-                    blocks = create_paper_message_blocks(paper, keyword.word)
-                    
-                    response = client.chat_postMessage(
-                        channel=command["channel_id"],
-                        blocks=blocks,
-                        text=f"New paper: {paper.title}"
-                    )
-                    time.sleep(1)
-                    
-                    if response and 'ts' in response:
-                        paper_info = {
-                            'title': paper.title,
-                            'authors': paper.authors,
-                            'abstract': paper.abstract
-                        }
-                        summary = openai_service.generate_summary(paper_info)
-                        
-                        client.chat_postMessage(
-                            channel=command["channel_id"],
-                            thread_ts=response['ts'],
-                            text=summary
-                        )
-                        time.sleep(1)
-            
-            print(f"\nTotal new papers found: {total_new_papers}")
-            if total_new_papers == 0:
-                respond(f"検索期間（過去{channel.config.days_back}日間）に新着論文は見つかりませんでした。")
+
+            channel = PaperProcessor.get_or_create_channel(db, command["channel_id"])
+            follow, created = AuthorIndex.follow(db, channel, name)
+            if follow is None:
+                respond("著者名を指定してください。例：`/paper_follow_author Yoshua Bengio`")
+                return
+            if not created:
+                respond(f"著者「{follow.author.name}」は既にフォローしています。")
+                return
+
+            days_back = channel.config.days_back if channel.config else DEFAULT_DAYS_BACK
+            since = datetime.now(pytz.UTC) - timedelta(days=days_back)
+            recent = AuthorIndex.recent_counts(db, [follow.author_id], since).get(follow.author_id, 0)
+            respond(f"著者「{follow.author.name}」をフォローしました。"
+                    f"保存済みの論文のうち過去{days_back}日間の{recent}件と、以降に取得した論文を次回のチェックで配信します。")
+        except Exception:
+            db.rollback()
+            logger.exception("Error in handle_follow_author", extra={'channel_id': command['channel_id']})
+            respond("エラーが発生しました。")
+        finally:
+            db.close()
+
+    @app.command("/paper_unfollow_author")
+    def handle_unfollow_author(ack, respond, command):
+        """著者のフォローを解除"""
+        ack()
+
+        name = command.get('text', '').strip()
+        if not name:
+            respond("フォローを解除する著者を指定してください。")
+            return
+
+        db = SessionLocal()
+        try:
+            channel = db.query(Channel).filter_by(slack_channel_id=command["channel_id"]).first()
+            author = AuthorIndex.unfollow(db, channel, name) if channel else None
+            if author:
+                respond(f"著者「{author.name}」のフォローを解除しました。")
             else:
-                respond(f"✅ {total_new_papers}件の新着論文が見つかりました。")
-            
-        except Exception as e:
-            print(f"Error in handle_paper_check_now: {e}")
-            import traceback
-            print(traceback.format_exc())
-            respond("論文チェック中にエラーが発生しました。")
+                respond(f"著者「{name}」はフォローしていません。")
         finally:
             db.close()
 
+    @app.command("/paper_check_now")
+    def handle_paper_check_now(ack, respond, command):
+        """今すぐ論文をチェック"""
+        ack()
+        
+        run_paper_check_now(respond, command)
+
     @app.command("/paper_set_days")
     def handle_set_days(ack, respond, command):
         """論文検索の対象期間を設定"""
@@ -207,6 +538,76 @@ def setup_command_handlers(app):
         finally:
             db.close()
 
+    @app.command("/paper_set_schedule")
+    def handle_set_schedule(ack, respond, command):
+        """定期チェックの実行時刻とタイムゾーンを設定"""
+        ack()
+        
+        text = command.get("text", "").strip()
+        try:
+            times, timezone = parse_schedule(text) if text.lower() != 'default' else (None, None)
+        except ScheduleError as e:
+            respond(f"{e}（例: `/paper_set_schedule 09:00 18:30 Asia/Tokyo`、既定に戻す場合は `/paper_set_schedule default`）")
+            return
+        
+        db = SessionLocal()
+        try:
+            channel = db.query(Channel).filter_by(slack_channel_id=command["channel_id"]).first()
+            if not channel:
+                channel = Channel(slack_channel_id=command["channel_id"], name=command["channel_name"])
+                db.add(channel)
+                db.commit()
+            
+            config = db.query(ChannelConfig).filter_by(channel_id=channel.id).first()
+            if not config:
+                config = ChannelConfig(channel_id=channel.id)
+                db.add(config)
+            
+            config.schedule_times = ','.join(times) if times else None
+            config.timezone = timezone
+            db.commit()
+            db.refresh(channel)
+            
+            times, timezone = SchedulerService.channel_schedule(channel)
+            next_run = SchedulerService.next_run(channel).astimezone(pytz.timezone(timezone))
+            respond(
+                f"定期チェックの実行時刻を {', '.join(times)}（{timezone}）に設定しました。\n"
+                f"次回の実行予定: {next_run:%Y-%m-%d %H:%M}"
+            )
+        finally:
+            db.close()
+
+    @app.command("/paper_set_priority")
+    def handle_set_priority(ack, respond, command):
+        """トークン予算が少ないときに優先して要約するチャンネルの優先度を設定"""
+        ack()
+        
+        try:
+            priority = int(command["text"].strip())
+        except ValueError:
+            respond("正しい優先度を整数で指定してください（例: `/paper_set_priority 10`、大きいほど優先）")
+            return
+        
+        db = SessionLocal()
+        try:
+            channel = db.query(Channel).filter_by(slack_channel_id=command["channel_id"]).first()
+            if not channel:
+                channel = Channel(slack_channel_id=command["channel_id"], name=command["channel_name"])
+                db.add(channel)
+                db.commit()
+            
+            config = db.query(ChannelConfig).filter_by(channel_id=channel.id).first()
+            if not config:
+                config = ChannelConfig(channel_id=channel.id)
+                db.add(config)
+            
+            config.priority = priority
+            db.commit()
+            
+            respond(f"要約の優先度を{priority}に設定しました。")
+        finally:
+            db.close()
+
     @app.command("/paper_settings")
     def handle_show_settings(ack, respond, command):
         """現在の設定を表示"""
@@ -215,15 +616,108 @@ def setup_command_handlers(app):
         try:
             channel = db.query(Channel).filter_by(slack_channel_id=command["channel_id"]).first()
             if channel and channel.config:
+                times, timezone = SchedulerService.channel_schedule(channel)
+                next_run = SchedulerService.next_run(channel).astimezone(pytz.timezone(timezone))
                 respond(
                     f"現在の設定:\n"
                     f"• 検索対象期間: {channel.config.days_back}日前まで\n"
                     f"• 最大検索件数: {channel.config.max_results}件\n"
-                    f"• 登録キーワード数: {len(channel.keywords)}個"
+                    f"• 要約の優先度: {channel.config.priority or 0}\n"
+                    f"• 登録キーワード数: {len(channel.keywords)}個\n"
+                    f"• 実行時刻: {', '.join(times)}（{timezone}）\n"
+                    f"• 次回の実行予定: {next_run:%Y-%m-%d %H:%M}"
                 )
             else:
                 respond("設定が見つかりません。デフォルト値が使用されます。")
         finally:
             db.close()
 
+    @app.command("/paper_stats")
+    def handle_paper_stats(ack, respond, command):
+        """直近の実行のステージ別所要時間を表示"""
+        ack()
+        
+        text = command.get("text", "").strip()
+        try:
+            last_runs = int(text) if text else 20
+            if last_runs <= 0:
+                raise ValueError
+        except ValueError:
+            respond("正しい実行回数を指定してください（例: `/paper_stats 20`）")
+            return
+        
+        db = SessionLocal()
+        try:
+            stats = RunTracer.stage_stats(db, last_runs)
+            if not stats['runs']:
+                respond("実行記録がまだありません。")
+                return
+            
+            lines = [f"*直近{stats['runs']}回の実行統計*"]
+            if stats['run_durations']:
+                lines.append(
+                    f"• 実行時間: p50 {percentile(stats['run_durations'], 50) / 1000:.1f}秒 / "
+                    f"p95 {percentile(stats['run_durations'], 95) / 1000:.1f}秒"
+                )
+            
+            lines.append("\n*ステージ別所要時間*")
+            for stage, values in sorted(stats['stages'].items(), key=lambda s: s[1]['total'], reverse=True):
+                lines.append(
+                    f"• `{stage}`: p50 {values['p50']:.0f}ms / p95 {values['p95']:.0f}ms "
+                    f"（{values['count']}件, 合計 {values['total'] / 1000:.1f}秒）"
+                )
+            
+            if stats['slowest_keywords']:
+                lines.append("\n*時間のかかっているキーワード*")
+                for k in stats['slowest_keywords']:
+                    lines.append(
+                        f"• 「{k['keyword']}」: p50 {k['p50'] / 1000:.1f}秒 / 最大 {k['max'] / 1000:.1f}秒（{k['count']}回）"
+                    )
+            
+            respond("\n".join(lines))
+        finally:
+            db.close()
+
+    @app.command("/paper_usage")
+    def handle_usage(ack, respond, command):
+        """本日のトークン使用量と推定料金を表示"""
+        ack()
+        
+        db = SessionLocal()
+        try:
+            usage = SummaryBudget.usage(db)
+            total = {
+                key: sum(u[key] for u in usage.values())
+                for key in ('requests', 'prompt_tokens', 'completion_tokens')
+            }
+            channel_usage = usage.get(command["channel_id"], {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+            
+            def describe(u, budget):
+                tokens = SummaryBudget.total_tokens(u)
+                line = (f"{u['requests']}件 / {tokens:,}トークン"
+                        f"（入力 {u['prompt_tokens']:,}・出力 {u['completion_tokens']:,}）"
+                        f" / 約${token_cost(u['prompt_tokens'], u['completion_tokens']):.3f}")
+                if budget > 0:
+                    line += f" / 残り {max(budget - tokens, 0):,}トークン（予算 {budget:,}）"
+                return line
+            
+            respond(
+                f"*本日（{SummaryBudget.today()}）の要約のトークン使用量*\n"
+                f"• このチャンネル: {describe(channel_usage, OPENAI_CHANNEL_DAILY_TOKEN_BUDGET)}\n"
+                f"• 全チャンネル: {describe(total, OPENAI_DAILY_TOKEN_BUDGET)}"
+            )
+        finally:
+            db.close()
+
+    @app.command("/paper_reading_list")
+    def handle_reading_list(ack, respond, command):
+        """後で読む（または興味ありの）論文の一覧を表示"""
+        ack()
+        
+        text = command.get("text", "").strip() or 'read_later'
+        if text not in ACTIONS:
+            respond("一覧の種類を指定してください（例: `/paper_reading_list`、`/paper_reading_list interest`）")
+            return
+        respond_reading_list(respond, command["user_id"], text)
+
     return app
@@ -1,4 +1,5 @@
 # paper_harvester/main.py
+import logging
 import os
 import sys
 from pathlib import Path
@@ -9,14 +10,18 @@ if str(current_dir) not in sys.path:
     sys.path.append(str(current_dir))
 
 from slack_bolt.adapter.socket_mode import SocketModeHandler
-from config import SLACK_APP_TOKEN, engine, DB_PATH, BASE_DIR, SessionLocal
+from config import SLACK_APP_TOKEN, engine, DB_PATH, BASE_DIR, SessionLocal, METRICS_HOST, METRICS_PORT
 from services.slack_service import SlackService
 from services.scheduler import SchedulerService
-from models.database import Base, Channel
+from models.database import Channel, upgrade_schema
+from utils.metrics import start_metrics_server
+from utils.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
 
 def init_db():
     """データベースの初期化"""
-    print(f"Initializing database at: {DB_PATH}")
+    logger.info("Initializing database", extra={'path': DB_PATH})
     
     # データベースディレクトリの権限設定
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
@@ -25,24 +30,31 @@ def init_db():
     if os.path.exists(DB_PATH):
         if os.getenv("ENVIRONMENT") == "development":
             os.remove(DB_PATH)
-            print("Removed existing database")
+            logger.info("Removed existing database")
         else:
-            print("Database already exists, skipping initialization")
+            logger.info("Database already exists, upgrading schema if needed")
+            upgrade_schema(engine)
             return
     
-    # データベース作成
-    Base.metadata.create_all(engine)
+    # データベース作成（全文検索インデックスを含む）
+    upgrade_schema(engine)
     
     # データベースファイルの権限設定
     os.chmod(DB_PATH, 0o666)
-    print("Database initialized successfully!")
+    logger.info("Database initialized successfully")
 
 def main():
-    print(f"Project root directory: {BASE_DIR}")
+    # ログ出力はキュー経由で専用スレッドに任せる
+    setup_logging()
+    logger.info("Project root directory", extra={'path': BASE_DIR})
     
     # データベース初期化
     init_db()
     
+    # メトリクスエンドポイントの起動
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT, METRICS_HOST)
+    
     # Slackサービスの初期化
     slack_service = SlackService()
     
@@ -51,7 +63,7 @@ def main():
     scheduler_service.start()
     
     # SocketModeでアプリを起動
-    print("⚡️ Bolt app is running!")
+    logger.info("⚡️ Bolt app is running!")
     handler = SocketModeHandler(slack_service.app, SLACK_APP_TOKEN)
     handler.start()
 
@@ -0,0 +1,237 @@
+# paper_harvester/manage.py
+"""運用コマンド
+
+    python manage.py harvest                          # HARVEST_CATEGORIES の新着を取得
+    python manage.py harvest --categories cs.CL,cs.LG --from 2024-01-01
+    python manage.py leases                           # ノード・シャードのリースと実行枠の進捗を表示
+    python manage.py history --query LLM --from 2023-01-01 --until 2023-12-31 [--summarize]
+    python manage.py export --format parquet --incremental   # 論文と配信記録を EXPORT_DIR に書き出す
+    python manage.py compact                          # データベースを最適化（VACUUM）してサイズと主要クエリの時間を表示
+    python manage.py sources --query LLM              # 有効な論文ソースを検索し、ソースごとの件数と重複を除いた件数を表示
+    python manage.py authors --name "Yoshua Bengio" --days 30   # 著者の保存済みの論文を新しい順に表示
+"""
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+# paper_harvesterディレクトリをPythonパスに追加
+current_dir = Path(__file__).resolve().parent
+if str(current_dir) not in sys.path:
+    sys.path.append(str(current_dir))
+
+from config import SessionLocal, engine, HARVEST_CATEGORIES, EXPORT_DIR, EXPORT_BATCH_SIZE, HISTORY_BACKFILL_WINDOW_DAYS
+from models.database import upgrade_schema
+from utils.logging_config import setup_logging
+
+def harvest(args):
+    """OAI-PMHでカテゴリの新着論文を取得して保存"""
+    from services.oai_harvester import OAIHarvester
+
+    categories = [c.strip() for c in args.categories.split(',') if c.strip()] if args.categories else HARVEST_CATEGORIES
+    from_date = date.fromisoformat(args.from_date) if args.from_date else None
+    db = SessionLocal()
+    try:
+        new_papers = OAIHarvester().harvest(db, categories, from_date)
+        print(f"Harvested {new_papers} new papers from {', '.join(categories)}")
+    finally:
+        db.close()
+
+def leases(args):
+    """リースの保持状況と、シャードごとに完了した実行枠を表示"""
+    from datetime import datetime
+    import pytz
+    from models.database import Lease, HarvestCheckpoint, as_utc
+
+    db = SessionLocal()
+    try:
+        now = datetime.now(pytz.UTC)
+        for lease in db.query(Lease).order_by(Lease.name):
+            expires_at = as_utc(lease.expires_at)
+            state = 'active' if expires_at >= now else 'expired'
+            print(f"{lease.name:40s} {lease.holder:30s} token={lease.token:<4d} {state:7s} expires={expires_at.isoformat(timespec='seconds')}")
+        for checkpoint in db.query(HarvestCheckpoint).filter(HarvestCheckpoint.name.like('schedule:%')).order_by(HarvestCheckpoint.name):
+            print(f"{checkpoint.name:40s} completed_slot={checkpoint.cursor}")
+    finally:
+        db.close()
+
+def history(args):
+    """キーワードまたはカテゴリの過去の論文を期間を区切って取得（中断しても同じ条件で再実行すれば続きから）"""
+    from datetime import timedelta
+    from models.database import Channel
+    from services.history_backfill import HistoricalBackfill
+    from utils.keyword_query import KeywordQueryError
+
+    until = date.fromisoformat(args.until) if args.until else date.today() - timedelta(days=1)
+    try:
+        backfill = HistoricalBackfill(args.query, date.fromisoformat(args.from_date), until, args.window_days)
+    except (KeywordQueryError, ValueError) as e:
+        raise SystemExit(f"invalid arguments: {e}")
+    db = SessionLocal()
+    try:
+        new_papers = backfill.run(db)
+        print(f"Stored {new_papers} new papers for {args.query} ({args.from_date} - {until.isoformat()})")
+        if args.summarize:
+            channel = db.query(Channel).filter_by(slack_channel_id=args.channel).first() if args.channel else None
+            summarized, remaining = backfill.summarize(db, channel)
+            print(f"Summarized {summarized} papers ({remaining} remaining)")
+    finally:
+        db.close()
+
+def export(args):
+    """論文と配信記録を Parquet または JSONL に書き出す"""
+    from services.exporter import CorpusExporter, EXPORT_TABLES
+
+    tables = [t.strip() for t in args.tables.split(',') if t.strip()]
+    unknown = set(tables) - set(EXPORT_TABLES)
+    if unknown:
+        raise SystemExit(f"unknown tables: {', '.join(sorted(unknown))}")
+    exporter = CorpusExporter(args.batch_size)
+    db = SessionLocal()
+    try:
+        for table in tables:
+            path, rows = exporter.export(db, table, args.format, args.output, args.incremental)
+            print(f"Exported {rows} rows from {table} to {path}")
+    finally:
+        db.close()
+
+def _database_size() -> int:
+    """SQLiteのデータベースファイル（WALを含む）のバイト数"""
+    import os
+    path = engine.url.database
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+def _time_hot_queries() -> dict:
+    """一覧・照合で使う主要なクエリの所要時間（ミリ秒）"""
+    import time
+    from models.database import Paper
+
+    queries = {
+        'match_scan': lambda db: db.query(Paper.id, Paper.title, Paper.abstract, Paper.categories).all(),
+        'load_papers': lambda db: db.query(Paper).all(),
+    }
+    timings = {}
+    db = SessionLocal()
+    try:
+        for name, query in queries.items():
+            started = time.perf_counter()
+            query(db)
+            timings[name] = (time.perf_counter() - started) * 1000
+            db.expunge_all()
+    finally:
+        db.close()
+    return timings
+
+def compact(args):
+    """未使用の領域を解放して統計情報を更新し、前後のサイズとクエリ時間を表示"""
+    from sqlalchemy import text
+
+    if engine.dialect.name != 'sqlite':
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text('VACUUM ANALYZE'))
+        print("VACUUM ANALYZE completed")
+        return
+
+    size_before, timings_before = _database_size(), _time_hot_queries()
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('VACUUM'))
+        conn.execute(text('ANALYZE'))
+        # WALモードでは VACUUM の結果もWALに書かれるので、本体に反映してWALを空にする
+        conn.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+    size_after, timings_after = _database_size(), _time_hot_queries()
+
+    print(f"database size: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+    for name in timings_before:
+        print(f"{name:12s} {timings_before[name]:8.1f} ms -> {timings_after[name]:8.1f} ms")
+
+def sources(args):
+    """有効な論文ソースをそれぞれ検索し、結果の件数と重複を除いた件数を表示（保存はしない）"""
+    from datetime import datetime, timedelta
+    import pytz
+    from services.paper_sources import SourceFanout, Deduplicator, enabled_sources
+
+    end_date = datetime.now(pytz.UTC)
+    start_date = end_date - timedelta(days=args.days)
+    dedup = Deduplicator()
+    merged = 0
+    for source in enabled_sources():
+        stream = SourceFanout([source]).search(args.query, args.max_results, start_date, end_date)
+        records = list(stream)
+        status = 'failed' if stream.failed else f"{len(records)} papers"
+        print(f"{source.name:20s} {status}")
+        merged += sum(1 for record in records if not dedup.seen(record))
+    print(f"{'merged':20s} {merged} papers")
+
+def authors(args):
+    """著者の保存済みの論文を authors / paper_authors のインデックスから引いて表示"""
+    from datetime import datetime, timedelta
+    import pytz
+    from services.author_index import AuthorIndex
+
+    db = SessionLocal()
+    try:
+        author = AuthorIndex.find(db, args.name)
+        if author is None:
+            print(f"No stored papers by {args.name}")
+            return
+        since = datetime.now(pytz.UTC) - timedelta(days=args.days)
+        papers = AuthorIndex.papers(db, author.id, since, args.limit)
+        print(f"{author.name}: {len(papers)} papers in the last {args.days} days")
+        for paper in papers:
+            print(f"{paper.published_date:%Y-%m-%d} {paper.arxiv_id:20s} {paper.title}")
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Paper Harvester management commands")
+    parser.add_argument('--log-level', default=None, help='ログレベル（デフォルトは LOG_LEVEL）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    harvest_parser = subparsers.add_parser('harvest', help='OAI-PMHでカテゴリの新着論文を取得')
+    harvest_parser.add_argument('--categories', help='カンマ区切りのarXivカテゴリ（デフォルトは HARVEST_CATEGORIES）')
+    harvest_parser.add_argument('--from', dest='from_date', help='取得開始日（YYYY-MM-DD、デフォルトは前回の続き）')
+    harvest_parser.set_defaults(func=harvest)
+
+    leases_parser = subparsers.add_parser('leases', help='複数ノードのリースと実行枠の進捗を表示')
+    leases_parser.set_defaults(func=leases)
+
+    history_parser = subparsers.add_parser('history', help='キーワードまたはカテゴリの過去の論文を取得（再開可能）')
+    history_parser.add_argument('--query', required=True, help='キーワードまたはカテゴリ（例: "LLM", "cat:cs.CL"）')
+    history_parser.add_argument('--from', dest='from_date', required=True, help='取得開始日（YYYY-MM-DD）')
+    history_parser.add_argument('--until', help='取得終了日（YYYY-MM-DD、デフォルトは昨日）')
+    history_parser.add_argument('--window-days', type=int, default=HISTORY_BACKFILL_WINDOW_DAYS, help='1回の検索で対象にする日数')
+    history_parser.add_argument('--summarize', action='store_true', help='取得後、要約のない論文を予算の範囲で要約する')
+    history_parser.add_argument('--channel', help='要約のトークン使用量を記録するチャンネルID')
+    history_parser.set_defaults(func=history)
+
+    export_parser = subparsers.add_parser('export', help='論文と配信記録を Parquet/JSONL に書き出す')
+    export_parser.add_argument('--format', choices=['parquet', 'jsonl'], default='jsonl', help='出力形式（parquet には pyarrow が必要）')
+    export_parser.add_argument('--tables', default='papers,deliveries', help='カンマ区切りの対象（papers, deliveries）')
+    export_parser.add_argument('--output', default=EXPORT_DIR, help='出力先のディレクトリ（デフォルトは EXPORT_DIR）')
+    export_parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE, help='1回に読み込む行数（Parquetの行グループの行数）')
+    export_parser.add_argument('--incremental', action='store_true', help='前回のエクスポート以降に更新された行だけを書き出す')
+    export_parser.set_defaults(func=export)
+
+    compact_parser = subparsers.add_parser('compact', help='データベースを最適化してサイズと主要クエリの時間を表示')
+    compact_parser.set_defaults(func=compact)
+
+    sources_parser = subparsers.add_parser('sources', help='有効な論文ソースを検索して件数を表示（保存しない）')
+    sources_parser.add_argument('--query', required=True, help='キーワード')
+    sources_parser.add_argument('--days', type=int, default=7, help='検索する日数')
+    sources_parser.add_argument('--max-results', type=int, default=20, help='ソースごとの最大件数')
+    sources_parser.set_defaults(func=sources)
+
+    authors_parser = subparsers.add_parser('authors', help='著者の保存済みの論文を表示')
+    authors_parser.add_argument('--name', required=True, help='著者名（大文字・小文字やアクセント記号の違いは区別しない）')
+    authors_parser.add_argument('--days', type=int, default=30, help='対象にする日数')
+    authors_parser.add_argument('--limit', type=int, default=50, help='表示する最大件数')
+    authors_parser.set_defaults(func=authors)
+
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    upgrade_schema(engine)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,24 @@
 # paper_harvester/models/__init__.py
-from .database import Base, Channel, Keyword, Paper, ChannelConfig, channel_keywords
+from .database import Base, Channel, Keyword, Paper, PaperContent, ChannelConfig, channel_keywords, PaperDelivery, paper_authors, Author, AuthorFollow, RunItem, HarvestCheckpoint, Lease, TokenUsage, UserPaperAction, Run, RunSpan, upgrade_schema
 
 __all__ = [
     'Base',
     'Channel',
     'Keyword',
     'Paper',
+    'PaperContent',
     'ChannelConfig',
-    'channel_keywords'
+    'channel_keywords',
+    'PaperDelivery',
+    'paper_authors',
+    'Author',
+    'AuthorFollow',
+    'RunItem',
+    'HarvestCheckpoint',
+    'Lease',
+    'TokenUsage',
+    'UserPaperAction',
+    'Run',
+    'RunSpan',
+    'upgrade_schema'
 ]
\ No newline at end of file
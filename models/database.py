@@ -1,9 +1,14 @@
 # paper_harvester/models/database.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Text
-from sqlalchemy.orm import relationship, declarative_base
+import logging
+import zlib
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Text, LargeBinary, Float, Index, UniqueConstraint, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import relationship, declarative_base, deferred
 from datetime import datetime
 import pytz
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
 # 中間テーブル
@@ -37,11 +42,25 @@ class Channel(Base):
         cascade="all, delete-orphan"
     )
 
+def as_utc(value: datetime) -> datetime:
+    # SQLiteから読み込んだ日時はタイムゾーン情報を持たない
+    return value if value.tzinfo else pytz.UTC.localize(value)
+
+def _default_canonical(context):
+    """キーワードの正規形（構文エラーの場合は未設定）"""
+    from utils.keyword_query import canonicalize, KeywordQueryError
+    
+    try:
+        return canonicalize(context.get_current_parameters()['word'])
+    except KeywordQueryError:
+        return None
+
 class Keyword(Base):
     __tablename__ = 'keywords'
     
     id = Column(Integer, primary_key=True)
-    word = Column(String, unique=True, nullable=False, index=True)
+    word = Column(String, unique=True, nullable=False, index=True)  # 最初に登録されたときの表記
+    canonical = Column(String, unique=True, index=True, default=_default_canonical)  # 正規形（購読の重複判定に使用）
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     
     channels = relationship(
@@ -58,6 +77,9 @@ class ChannelConfig(Base):
     channel_id = Column(Integer, ForeignKey('channels.id', ondelete='CASCADE'), nullable=False)
     days_back = Column(Integer, default=2, nullable=False)
     max_results = Column(Integer, default=3, nullable=False)
+    schedule_times = Column(String)  # カンマ区切りのHH:MM（未設定なら SCHEDULE_TIMES）
+    timezone = Column(String)  # 実行時刻のタイムゾーン（未設定なら TIMEZONE）
+    priority = Column(Integer, default=0)  # 要約の優先度（大きいチャンネルから予算を使う）
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     updated_at = Column(DateTime(timezone=True), 
                        default=lambda: datetime.now(pytz.UTC), 
@@ -67,11 +89,12 @@ class Paper(Base):
     __tablename__ = 'papers'
     
     id = Column(Integer, primary_key=True)
-    arxiv_id = Column(String, unique=True, nullable=False, index=True)
+    arxiv_id = Column(String, unique=True, nullable=False, index=True)  # バージョン付きID（例: 2401.01234v2）
+    base_id = Column(String, index=True)  # バージョンを除いたID（例: 2401.01234）
+    version = Column(Integer)
     title = Column(String, nullable=False)
     authors = Column(String, nullable=False)
     abstract = Column(Text)
-    full_text = Column(Text)
     url = Column(String, nullable=False)
     summary = Column(Text)
     source_type = Column(String)  # 'arxiv' or 'arxiv_abstract_only'
@@ -79,6 +102,462 @@ class Paper(Base):
     notified_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     error_count = Column(Integer, default=0)  # 処理エラーの回数
     last_error = Column(String)  # 最後に発生したエラーメッセージ
+    minhash = deferred(Column(LargeBinary))  # 類似論文検出用のMinHash署名（列を指定して読み込む）
+    categories = Column(String)  # 空白区切りのarXivカテゴリ（例: "cs.CL cs.LG"）
+    source = Column(String, default='arxiv')  # 取得元のソース（未設定の既存論文は 'arxiv'）
+    doi = Column(String, index=True)  # 小文字に揃えたDOI（ソースをまたいだ重複判定に使う）
+    updated_at = Column(DateTime(timezone=True),  # 差分エクスポートの基準（要約の保存などで更新）
+                       default=lambda: datetime.now(pytz.UTC),
+                       onupdate=lambda: datetime.now(pytz.UTC),
+                       index=True)
+    
+    # 本文は一覧・照合のクエリで読み込まないよう、圧縮して別テーブルに置く
+    content = relationship(
+        'PaperContent',
+        uselist=False,
+        lazy='select',
+        cascade="all, delete-orphan"
+    )
+    
+    @property
+    def full_text(self):
+        """PDFから抽出した本文（参照したときに paper_contents から読み込んで展開する）"""
+        return self.content.text if self.content else None
+    
+    @full_text.setter
+    def full_text(self, value):
+        if value is None:
+            self.content = None
+        elif self.content is None:
+            self.content = PaperContent(text=value)
+        else:
+            self.content.text = value
 
     def __repr__(self):
-        return f"<Paper(title='{self.title}', arxiv_id='{self.arxiv_id}')>"
\ No newline at end of file
+        return f"<Paper(title='{self.title}', arxiv_id='{self.arxiv_id}')>"
+
+# 本文の zlib 圧縮レベル
+_COMPRESSION_LEVEL = 6
+
+class PaperContent(Base):
+    __tablename__ = 'paper_contents'
+    
+    paper_id = Column(Integer, ForeignKey('papers.id', ondelete='CASCADE'), primary_key=True)
+    codec = Column(String, nullable=False, default='zlib')
+    data = Column(LargeBinary, nullable=False)  # 圧縮した本文
+    raw_size = Column(Integer, nullable=False)  # 圧縮前のバイト数
+    updated_at = Column(DateTime(timezone=True),
+                       default=lambda: datetime.now(pytz.UTC),
+                       onupdate=lambda: datetime.now(pytz.UTC))
+    
+    def __init__(self, text: str = None, **kwargs):
+        super().__init__(**kwargs)
+        if text is not None:
+            self.text = text
+    
+    @property
+    def text(self) -> str:
+        return decompress_text(self.codec, self.data)
+    
+    @text.setter
+    def text(self, value: str):
+        raw = value.encode('utf-8')
+        self.codec = 'zlib'
+        self.data = zlib.compress(raw, _COMPRESSION_LEVEL)
+        self.raw_size = len(raw)
+
+def decompress_text(codec: str, data: bytes) -> str:
+    if codec != 'zlib':
+        raise ValueError(f"unknown codec: {codec}")
+    return zlib.decompress(data).decode('utf-8')
+
+class PaperDelivery(Base):
+    __tablename__ = 'paper_deliveries'
+    __table_args__ = (
+        UniqueConstraint('channel_id', 'paper_id', name='uq_paper_deliveries_channel_paper'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    channel_id = Column(Integer, ForeignKey('channels.id', ondelete='CASCADE'), nullable=False)
+    paper_id = Column(Integer, ForeignKey('papers.id', ondelete='CASCADE'), nullable=False, index=True)
+    keyword_id = Column(Integer, ForeignKey('keywords.id', ondelete='SET NULL'))  # 一致したキーワード
+    message_ts = Column(String)  # 投稿したメインメッセージの ts（スレッドの要約は送信できなかった場合もある）
+    delivered_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), nullable=False)
+
+# 論文と著者の中間テーブル（著者ごとの論文一覧を author_id のインデックスで引く）
+paper_authors = Table(
+    'paper_authors',
+    Base.metadata,
+    Column('paper_id', Integer, ForeignKey('papers.id', ondelete='CASCADE'), primary_key=True),
+    Column('author_id', Integer, ForeignKey('authors.id', ondelete='CASCADE'), primary_key=True),
+    Column('position', Integer, nullable=False),  # 著者リスト内の順番（0始まり）
+    Index('ix_paper_authors_author_paper', 'author_id', 'paper_id')
+)
+
+class Author(Base):
+    __tablename__ = 'authors'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)  # 最初に保存されたときの表記
+    name_key = Column(String, unique=True, nullable=False, index=True)  # 比較用に揃えた名前（utils.paper_keys.author_key）
+
+class AuthorFollow(Base):
+    __tablename__ = 'author_follows'
+    __table_args__ = (
+        UniqueConstraint('channel_id', 'author_id', name='uq_author_follows_channel_author'),
+        Index('ix_author_follows_author', 'author_id'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    channel_id = Column(Integer, ForeignKey('channels.id', ondelete='CASCADE'), nullable=False)
+    author_id = Column(Integer, ForeignKey('authors.id', ondelete='CASCADE'), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
+    
+    author = relationship('Author', lazy='joined')
+
+class RunItem(Base):
+    __tablename__ = 'run_items'
+    __table_args__ = (
+        UniqueConstraint('channel_id', 'paper_id', name='uq_run_items_channel_paper'),
+        Index('ix_run_items_channel_state', 'channel_id', 'state'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    slot = Column(String, nullable=False)  # 論文を見つけた定期チェックの実行時刻（UTC、ISO形式）
+    channel_id = Column(Integer, ForeignKey('channels.id', ondelete='CASCADE'), nullable=False)
+    paper_id = Column(Integer, ForeignKey('papers.id', ondelete='CASCADE'), nullable=False)
+    keyword_id = Column(Integer, ForeignKey('keywords.id', ondelete='SET NULL'))
+    author_id = Column(Integer, ForeignKey('authors.id', ondelete='SET NULL'))  # フォロー中の著者で一致した場合
+    # 'fetched' → 'summarized' → 'posting'（Slackへ送信中） → 'posted'、送信に失敗し続けた場合は 'failed'
+    state = Column(String, nullable=False, default='fetched')
+    attempts = Column(Integer, nullable=False, default=0)  # 送信に失敗した回数
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), nullable=False)
+    updated_at = Column(DateTime(timezone=True),
+                       default=lambda: datetime.now(pytz.UTC),
+                       onupdate=lambda: datetime.now(pytz.UTC))
+    
+    paper = relationship('Paper', lazy='joined')
+
+class HarvestCheckpoint(Base):
+    __tablename__ = 'harvest_checkpoints'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)  # 例: 'oai:cs'
+    cursor = Column(String)  # 次回の取得開始位置（OAI-PMHでは from に渡す日付）
+    covered_from = Column(DateTime(timezone=True))  # この期間に公開された論文はすべて保存済み
+    covered_until = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True),
+                       default=lambda: datetime.now(pytz.UTC),
+                       onupdate=lambda: datetime.now(pytz.UTC))
+    
+    def extend_coverage(self, start: datetime, end: datetime):
+        """保存済みの期間を更新（連続していれば広げ、途切れていれば置き換える）"""
+        covered_from = as_utc(self.covered_from) if self.covered_from else None
+        covered_until = as_utc(self.covered_until) if self.covered_until else None
+        if covered_from is not None and covered_until is not None and start <= covered_until:
+            self.covered_from = min(covered_from, start)
+            self.covered_until = max(covered_until, end)
+        else:
+            self.covered_from = start
+            self.covered_until = end
+
+class Lease(Base):
+    __tablename__ = 'leases'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)  # 例: 'node:host-123', 'shard:3', 'leader:2024-01-01T09:00'
+    holder = Column(String, nullable=False)  # 保持しているノードのID
+    token = Column(Integer, nullable=False, default=1)  # 別のノードが取得するたびに増えるフェンシングトークン
+    acquired_at = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class TokenUsage(Base):
+    __tablename__ = 'token_usage'
+    __table_args__ = (
+        UniqueConstraint('day', 'slack_channel_id', 'mode', name='uq_token_usage_day_channel_mode'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(String, nullable=False, index=True)  # TIMEZONE での日付（例: '2024-01-01'）
+    slack_channel_id = Column(String, nullable=False)
+    mode = Column(String, nullable=False)  # 'full' または 'short'
+    requests = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True),
+                       default=lambda: datetime.now(pytz.UTC),
+                       onupdate=lambda: datetime.now(pytz.UTC))
+
+class UserPaperAction(Base):
+    __tablename__ = 'user_paper_actions'
+    __table_args__ = (
+        UniqueConstraint('slack_user_id', 'action', 'paper_id', name='uq_user_paper_actions_user_action_paper'),
+        Index('ix_user_paper_actions_user_action_created', 'slack_user_id', 'action', 'created_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    slack_user_id = Column(String, nullable=False)
+    action = Column(String, nullable=False)  # 'interest' または 'read_later'
+    paper_id = Column(Integer, ForeignKey('papers.id', ondelete='CASCADE'), nullable=False)
+    slack_channel_id = Column(String)  # ボタンが押されたチャンネル
+    created_at = Column(DateTime(timezone=True), nullable=False)  # ボタンが押された時刻
+    
+    paper = relationship('Paper', lazy='joined')
+
+class Run(Base):
+    __tablename__ = 'runs'
+    
+    id = Column(Integer, primary_key=True)
+    trigger = Column(String, nullable=False)  # 'scheduled', 'prepare'（候補キューの更新）, 'check_now' or 'backfill'
+    slack_channel_id = Column(String)  # /paper_check_now の場合のみ
+    status = Column(String)  # 'ok', 'error', 'interrupted', 'incomplete', 'deferred'
+    started_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    finished_at = Column(DateTime(timezone=True))
+    duration_ms = Column(Float)
+    
+    spans = relationship(
+        'RunSpan',
+        backref='run',
+        cascade="all, delete-orphan",
+        order_by='RunSpan.sequence'
+    )
+
+class RunSpan(Base):
+    __tablename__ = 'run_spans'
+    __table_args__ = (
+        Index('ix_run_spans_run_stage', 'run_id', 'stage'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('runs.id', ondelete='CASCADE'), nullable=False)
+    sequence = Column(Integer, nullable=False)  # 実行内での開始順
+    parent_sequence = Column(Integer)  # 親スパンの sequence
+    stage = Column(String, nullable=False)  # 'channel', 'keyword', 'arxiv_search', 'summarize', 'slack_post' など
+    slack_channel_id = Column(String)
+    keyword = Column(String)
+    arxiv_id = Column(String)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    duration_ms = Column(Float, nullable=False)
+    outcome = Column(String)
+
+def upgrade_schema(engine):
+    """既存データベースに不足しているテーブル・カラム・インデックスを追加"""
+    seed_deliveries = not inspect(engine).has_table(PaperDelivery.__tablename__)
+    Base.metadata.create_all(engine)
+    
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logger.info("Added column", extra={'table': table.name, 'column': column.name})
+            
+            existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    logger.info("Created index", extra={'index': index.name})
+    
+    if seed_deliveries:
+        _seed_paper_deliveries(engine)
+    _backfill_base_ids(engine)
+    _backfill_keyword_canonicals(engine)
+    _move_full_text(engine)
+    _backfill_paper_updated_at(engine)
+    _backfill_paper_authors(engine)
+    _create_paper_search_index(engine)
+
+# タイトル・アブストラクトの全文検索インデックス（SQLiteのFTS5、papers の内容をトリガーで同期）
+PAPER_SEARCH_TABLE = 'papers_fts'
+
+_PAPER_SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE {PAPER_SEARCH_TABLE} USING fts5("
+    "title, abstract, content='papers', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER {PAPER_SEARCH_TABLE}_ai AFTER INSERT ON papers BEGIN "
+    f"INSERT INTO {PAPER_SEARCH_TABLE}(rowid, title, abstract) VALUES (new.id, new.title, new.abstract); END",
+    f"CREATE TRIGGER {PAPER_SEARCH_TABLE}_ad AFTER DELETE ON papers BEGIN "
+    f"INSERT INTO {PAPER_SEARCH_TABLE}({PAPER_SEARCH_TABLE}, rowid, title, abstract) "
+    "VALUES ('delete', old.id, old.title, old.abstract); END",
+    f"CREATE TRIGGER {PAPER_SEARCH_TABLE}_au AFTER UPDATE OF title, abstract ON papers BEGIN "
+    f"INSERT INTO {PAPER_SEARCH_TABLE}({PAPER_SEARCH_TABLE}, rowid, title, abstract) "
+    "VALUES ('delete', old.id, old.title, old.abstract); "
+    f"INSERT INTO {PAPER_SEARCH_TABLE}(rowid, title, abstract) VALUES (new.id, new.title, new.abstract); END",
+    f"INSERT INTO {PAPER_SEARCH_TABLE}({PAPER_SEARCH_TABLE}) VALUES ('rebuild')"
+)
+
+def has_paper_search_index(bind) -> bool:
+    """全文検索インデックスが利用できるか"""
+    if bind.dialect.name != 'sqlite':
+        return False
+    return bind.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': PAPER_SEARCH_TABLE}
+    ).first() is not None
+
+_PAPER_SEARCH_TRIGGERS = tuple(f"{PAPER_SEARCH_TABLE}_{suffix}" for suffix in ('ai', 'ad', 'au'))
+
+def _create_paper_search_index(engine):
+    """全文検索インデックスを作成して既存の論文を登録（FTS5が使えない場合は作成しない）"""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.connect() as conn:
+        existing = {name for (name,) in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE name = :table OR (type = 'trigger' AND tbl_name = 'papers')"
+        ), {'table': PAPER_SEARCH_TABLE})}
+    if {PAPER_SEARCH_TABLE, *_PAPER_SEARCH_TRIGGERS} <= existing:
+        return
+    try:
+        with engine.begin() as conn:
+            # papers を作り直した場合などトリガーが欠けていれば、インデックスごと作り直す
+            for trigger in _PAPER_SEARCH_TRIGGERS:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {PAPER_SEARCH_TABLE}"))
+            for statement in _PAPER_SEARCH_DDL:
+                conn.execute(text(statement))
+        logger.info("Created paper search index", extra={'table': PAPER_SEARCH_TABLE})
+    except OperationalError as e:
+        logger.warning("Paper search index unavailable, falling back to scanning", extra={'error': str(e)})
+
+def _move_full_text(engine, batch_size: int = 500):
+    """以前の papers.full_text を圧縮して paper_contents に移し、列を削除する"""
+    if 'full_text' not in {c['name'] for c in inspect(engine).get_columns('papers')}:
+        return
+    
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                'SELECT id, full_text FROM papers WHERE full_text IS NOT NULL LIMIT :limit'
+            ), {'limit': batch_size}).fetchall()
+            if not rows:
+                break
+            existing = {paper_id for (paper_id,) in conn.execute(
+                PaperContent.__table__.select().with_only_columns(PaperContent.paper_id)
+                .where(PaperContent.paper_id.in_([paper_id for paper_id, _ in rows]))
+            )}
+            contents = []
+            for paper_id, full_text in rows:
+                if paper_id in existing:
+                    continue
+                content = PaperContent(text=full_text)
+                contents.append({'paper_id': paper_id, 'codec': content.codec, 'data': content.data,
+                                 'raw_size': content.raw_size, 'updated_at': datetime.now(pytz.UTC)})
+            if contents:
+                conn.execute(PaperContent.__table__.insert(), contents)
+            conn.execute(
+                text('UPDATE papers SET full_text = NULL WHERE id = :id'),
+                [{'id': paper_id} for paper_id, _ in rows]
+            )
+            moved += len(contents)
+    
+    try:
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE papers DROP COLUMN full_text'))
+    except OperationalError as e:
+        # DROP COLUMN に対応していない古いSQLiteでは空の列を残す
+        logger.warning("Could not drop papers.full_text", extra={'error': str(e)})
+    logger.info("Moved full text to paper_contents", extra={'papers': moved})
+
+def _seed_paper_deliveries(engine):
+    """paper_deliveries がなかったデータベースの保存済みの論文を、全チャンネルに配信済みとして記録
+
+    以前は保存済みの論文を通知済みとみなしていたので、アップグレード後の最初のチェックで投稿し直さない。
+    """
+    with engine.begin() as conn:
+        seeded = conn.execute(text(
+            'INSERT INTO paper_deliveries (channel_id, paper_id, delivered_at) '
+            'SELECT channels.id, papers.id, COALESCE(papers.notified_at, papers.published_date) '
+            'FROM channels CROSS JOIN papers'
+        )).rowcount
+    if seeded:
+        logger.info("Seeded paper deliveries for stored papers", extra={'deliveries': seeded})
+
+def _backfill_paper_updated_at(engine):
+    """updated_at が未設定の論文は保存日時で補完"""
+    with engine.begin() as conn:
+        updated = conn.execute(text(
+            'UPDATE papers SET updated_at = COALESCE(notified_at, published_date) WHERE updated_at IS NULL'
+        )).rowcount
+    if updated:
+        logger.info("Backfilled paper updated_at", extra={'papers': updated})
+
+def _backfill_paper_authors(engine, batch_size: int = 500):
+    """paper_authors が未登録の論文の著者を authors テーブルに登録する"""
+    from sqlalchemy.orm import Session
+    from services.author_index import AuthorIndex
+    
+    linked = 0
+    last_id = 0
+    while True:
+        with Session(engine) as db:
+            rows = db.execute(text(
+                'SELECT id, authors FROM papers WHERE id > :last_id '
+                'AND NOT EXISTS (SELECT 1 FROM paper_authors WHERE paper_authors.paper_id = papers.id) '
+                'ORDER BY id LIMIT :limit'
+            ), {'last_id': last_id, 'limit': batch_size}).fetchall()
+            if not rows:
+                break
+            AuthorIndex.link(db, {paper_id: authors for paper_id, authors in rows})
+            db.commit()
+        last_id = rows[-1][0]
+        linked += len(rows)
+    if linked:
+        logger.info("Backfilled paper authors", extra={'papers': linked})
+
+def _backfill_base_ids(engine):
+    """base_id・versionが未設定の論文をarxiv_idから補完"""
+    from utils.arxiv_id import parse_arxiv_id
+    
+    with engine.begin() as conn:
+        rows = conn.execute(text('SELECT id, arxiv_id FROM papers WHERE base_id IS NULL')).fetchall()
+        if not rows:
+            return
+        params = []
+        for paper_id, arxiv_id in rows:
+            base_id, version = parse_arxiv_id(arxiv_id)
+            params.append({'id': paper_id, 'base_id': base_id, 'version': version})
+        conn.execute(
+            text('UPDATE papers SET base_id = :base_id, version = :version WHERE id = :id'),
+            params
+        )
+        logger.info("Backfilled base_id", extra={'papers': len(params)})
+
+def _backfill_keyword_canonicals(engine):
+    """正規形が未設定のキーワードを補完し、同じ正規形になるキーワードを1つにまとめる"""
+    from utils.keyword_query import canonicalize, KeywordQueryError
+    
+    with engine.begin() as conn:
+        rows = conn.execute(text('SELECT id, word FROM keywords WHERE canonical IS NULL ORDER BY id')).fetchall()
+        if not rows:
+            return
+        existing = dict(conn.execute(text('SELECT canonical, id FROM keywords WHERE canonical IS NOT NULL')).fetchall())
+        merged = 0
+        for keyword_id, word in rows:
+            try:
+                canonical = canonicalize(word)
+            except KeywordQueryError:
+                continue
+            
+            target_id = existing.get(canonical)
+            if target_id is None:
+                conn.execute(
+                    text('UPDATE keywords SET canonical = :canonical WHERE id = :id'),
+                    {'canonical': canonical, 'id': keyword_id}
+                )
+                existing[canonical] = keyword_id
+                continue
+            
+            # 購読チャンネルを先に登録されたキーワードへ付け替えてから削除
+            conn.execute(text(
+                'INSERT INTO channel_keywords (channel_id, keyword_id) '
+                'SELECT channel_id, :target_id FROM channel_keywords WHERE keyword_id = :id '
+                'AND channel_id NOT IN (SELECT channel_id FROM channel_keywords WHERE keyword_id = :target_id)'
+            ), {'target_id': target_id, 'id': keyword_id})
+            conn.execute(text('DELETE FROM channel_keywords WHERE keyword_id = :id'), {'id': keyword_id})
+            conn.execute(text('DELETE FROM keywords WHERE id = :id'), {'id': keyword_id})
+            merged += 1
+        logger.info("Backfilled keyword canonical forms", extra={'keywords': len(rows), 'merged': merged})
@@ -2,6 +2,16 @@
 from services.arxiv import ArxivService
 from services.openai_service import generate_summary
 from services.paper_processor import PaperProcessor
+from services.paper_sources import PaperSource, SourceFanout
+from services.relevance import RelevanceScorer
+from services.near_duplicate import NearDuplicateDetector
+from services.oai_harvester import OAIHarvester
+from services.keyword_matcher import KeywordMatcher
+from services.author_index import AuthorIndex
+from services.backfill import SubscriptionBackfill
+from services.coordination import LeaseManager
+from services.summary_budget import SummaryBudget, SummaryQueue
+from services.action_recorder import ActionRecorder
 from services.scheduler import SchedulerService
 from services.slack_service import SlackService
 
@@ -9,6 +19,18 @@ __all__ = [
     'ArxivService',
     'generate_summary',
     'PaperProcessor',
+    'PaperSource',
+    'SourceFanout',
+    'RelevanceScorer',
+    'NearDuplicateDetector',
+    'OAIHarvester',
+    'KeywordMatcher',
+    'AuthorIndex',
+    'SubscriptionBackfill',
+    'LeaseManager',
+    'SummaryBudget',
+    'SummaryQueue',
+    'ActionRecorder',
     'SchedulerService',
     'SlackService'
 ]
\ No newline at end of file
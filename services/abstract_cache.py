@@ -0,0 +1,54 @@
+# paper_harvester/services/abstract_cache.py
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+from config import SessionLocal, ABSTRACT_CACHE_SIZE
+from models.database import Paper
+from utils.metrics import registry
+
+ABSTRACT_CACHE_TOTAL = registry.counter(
+    'paper_harvester_abstract_cache_total',
+    'アブストラクトのキャッシュの参照結果（hit, miss: データベースから読み込み, not_found: 論文が見つからない）',
+    ['result']
+)
+
+class AbstractCache:
+    """arXiv ID からアブストラクトを引く LRU キャッシュ（見つからなければ papers テーブルから読み込む）
+
+    ボタンには arXiv ID だけを持たせ、表示のたびにアブストラクトをここから取得する。
+    """
+
+    def __init__(self, max_size: int = ABSTRACT_CACHE_SIZE, session_factory=SessionLocal):
+        self.max_size = max_size
+        self.session_factory = session_factory
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, arxiv_id: str) -> Optional[str]:
+        """アブストラクトを取得（論文がない場合は None）"""
+        with self._lock:
+            abstract = self._entries.get(arxiv_id)
+            if abstract is not None:
+                self._entries.move_to_end(arxiv_id)
+                ABSTRACT_CACHE_TOTAL.inc(result='hit')
+                return abstract
+
+        db = self.session_factory()
+        try:
+            row = db.query(Paper.abstract).filter_by(arxiv_id=arxiv_id).first()
+        finally:
+            db.close()
+        if row is None or row.abstract is None:
+            ABSTRACT_CACHE_TOTAL.inc(result='not_found')
+            return None
+
+        ABSTRACT_CACHE_TOTAL.inc(result='miss')
+        with self._lock:
+            self._entries[arxiv_id] = row.abstract
+            self._entries.move_to_end(arxiv_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return row.abstract
+
+abstract_cache = AbstractCache()
@@ -0,0 +1,205 @@
+# paper_harvester/services/action_recorder.py
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+import pytz
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.exc import IntegrityError
+from config import SessionLocal, ACTION_BATCH_SIZE, ACTION_FLUSH_SECONDS
+from models.database import Paper, UserPaperAction, as_utc
+from utils.metrics import registry
+
+USER_ACTIONS_TOTAL = registry.counter(
+    'paper_harvester_user_actions_total',
+    'ボタン操作の記録結果（recorded: 保存, duplicate: 記録済み, unknown_paper: 論文が見つからない, dropped: 保存に失敗して破棄）',
+    ['action', 'result']
+)
+ACTION_FLUSH_SECONDS_HISTOGRAM = registry.histogram(
+    'paper_harvester_action_flush_seconds',
+    'ボタン操作の一括書き込み1回の所要時間'
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('interest', 'read_later')
+
+class PendingAction(NamedTuple):
+    slack_user_id: str
+    action: str
+    arxiv_id: str
+    slack_channel_id: Optional[str]
+    created_at: datetime
+
+class ActionRecorder:
+    """ボタン操作をメモリに溜め、batch_size 件ごとまたは flush_seconds ごとに1トランザクションで書き込む
+
+    ボタンが連続して押されても、クリックごとにトランザクションを発行しないようにする。
+    同じユーザー・操作・論文の組み合わせは最初の1回だけを保存する。
+    """
+
+    def __init__(self, batch_size: int = ACTION_BATCH_SIZE, flush_seconds: float = ACTION_FLUSH_SECONDS,
+                 session_factory=SessionLocal):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.session_factory = session_factory
+        self._pending: List[PendingAction] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 書き込みは1つずつ
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, slack_user_id: str, action: str, arxiv_id: str, slack_channel_id: Optional[str] = None):
+        """操作を書き込み待ちに追加"""
+        if action not in ACTIONS:
+            raise ValueError(f"unknown action: {action}")
+        entry = PendingAction(slack_user_id, action, arxiv_id, slack_channel_id, datetime.now(pytz.UTC))
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='action-recorder', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self):
+        """書き込み待ちの操作を保存してスレッドを止める"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def flush(self) -> int:
+        """書き込み待ちの操作を保存し、新たに保存した件数を返す"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            db = self.session_factory()
+            try:
+                return self._write(db, batch)
+            except Exception:
+                db.rollback()
+                logger.exception("Failed to write user actions", extra={'count': len(batch)})
+                for entry in batch:
+                    USER_ACTIONS_TOTAL.inc(action=entry.action, result='dropped')
+                return 0
+            finally:
+                db.close()
+                ACTION_FLUSH_SECONDS_HISTOGRAM.observe(time.perf_counter() - started)
+
+    def _write(self, db, batch: List[PendingAction]) -> int:
+        # 同じ組み合わせはバッチ内で最初の操作だけを残す
+        unique = {}
+        for entry in batch:
+            key = (entry.slack_user_id, entry.action, entry.arxiv_id)
+            if key in unique:
+                USER_ACTIONS_TOTAL.inc(action=entry.action, result='duplicate')
+            else:
+                unique[key] = entry
+
+        paper_ids = dict(
+            db.query(Paper.arxiv_id, Paper.id).filter(Paper.arxiv_id.in_({e.arxiv_id for e in unique.values()}))
+        )
+        existing = set(
+            db.query(UserPaperAction.slack_user_id, UserPaperAction.action, UserPaperAction.paper_id).filter(
+                UserPaperAction.slack_user_id.in_({e.slack_user_id for e in unique.values()}),
+                UserPaperAction.paper_id.in_(paper_ids.values())
+            )
+        )
+
+        rows = []
+        for entry in unique.values():
+            paper_id = paper_ids.get(entry.arxiv_id)
+            if paper_id is None:
+                USER_ACTIONS_TOTAL.inc(action=entry.action, result='unknown_paper')
+                logger.warning("Action for unknown paper", extra={'user_id': entry.slack_user_id, 'arxiv_id': entry.arxiv_id})
+            elif (entry.slack_user_id, entry.action, paper_id) in existing:
+                USER_ACTIONS_TOTAL.inc(action=entry.action, result='duplicate')
+            else:
+                rows.append({
+                    'slack_user_id': entry.slack_user_id,
+                    'action': entry.action,
+                    'paper_id': paper_id,
+                    'slack_channel_id': entry.slack_channel_id,
+                    'created_at': entry.created_at
+                })
+        if not rows:
+            return 0
+
+        try:
+            db.execute(insert(UserPaperAction), rows)
+            db.commit()
+            inserted = rows
+        except IntegrityError:
+            # 他のノードが同じ操作を先に保存した。1件ずつ入れ直す
+            db.rollback()
+            inserted = []
+            for row in rows:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(UserPaperAction), [row])
+                    inserted.append(row)
+                except IntegrityError:
+                    USER_ACTIONS_TOTAL.inc(action=row['action'], result='duplicate')
+            db.commit()
+
+        for row in inserted:
+            USER_ACTIONS_TOTAL.inc(action=row['action'], result='recorded')
+        logger.debug("User actions written", extra={'count': len(inserted), 'batch': len(batch)})
+        return len(inserted)
+
+    @staticmethod
+    def reading_list(db, slack_user_id: str, action: str, limit: int,
+                     cursor: Optional[str] = None) -> Tuple[List[UserPaperAction], Optional[str]]:
+        """保存した論文を新しい順に limit 件取得し、(操作, 次のページのカーソル) を返す
+
+        カーソルは前のページの最後の (created_at, id) で、インデックスの範囲走査だけで次のページを取得する。
+        """
+        query = db.query(UserPaperAction).filter_by(slack_user_id=slack_user_id, action=action)
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                UserPaperAction.created_at < created_at,
+                and_(UserPaperAction.created_at == created_at, UserPaperAction.id < last_id)
+            ))
+        entries = query.order_by(UserPaperAction.created_at.desc(), UserPaperAction.id.desc()).limit(limit + 1).all()
+        if len(entries) <= limit:
+            return entries, None
+        entries = entries[:limit]
+        return entries, encode_cursor(entries[-1])
+
+def encode_cursor(entry: UserPaperAction) -> str:
+    return f"{as_utc(entry.created_at).isoformat()}|{entry.id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """カーソルを (created_at, id) に戻す（不正な値は ValueError）"""
+    created_at, last_id = cursor.rsplit('|', 1)
+    return datetime.fromisoformat(created_at), int(last_id)
+
+_recorder: Optional[ActionRecorder] = None
+_recorder_lock = threading.Lock()
+
+def action_recorder() -> ActionRecorder:
+    """プロセス内で共有される ActionRecorder（終了時に書き込み待ちを保存する）"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = ActionRecorder()
+            atexit.register(_recorder.stop)
+        return _recorder
@@ -1,131 +1,381 @@
 # paper_harvester/services/arxiv.py
 
-import arxiv
+import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
 import pytz
-from models.database import Paper, Channel
-from config import DEFAULT_DAYS_BACK, DEFAULT_MAX_RESULTS
-from services.paper_processor import PaperProcessor
-from .openai_service import generate_summary
+from models.database import Paper, Channel, PaperDelivery, RunItem
+from config import DEFAULT_DAYS_BACK, DEFAULT_MAX_RESULTS, NEAR_DUPLICATE_LOOKBACK_DAYS
+from services.author_index import AuthorIndex
+from services.paper_sources import PaperRecord, SourceFanout, SourceStream
+from services.relevance import RelevanceScorer
+from services.near_duplicate import NearDuplicateDetector
+from utils.arxiv_id import parse_arxiv_id
+from utils.keyword_query import keyword_query, search_terms, canonicalize
+from utils.metrics import registry
+from services.run_tracer import trace_span
 import time
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, load_only
+
+ARXIV_SEARCH_SECONDS = registry.histogram(
+    'paper_harvester_arxiv_search_seconds',
+    '論文検索（有効なすべてのソースの並列検索と結果の統合を含む）の所要時間',
+    ['status']
+)
+ARXIV_RESULTS_TOTAL = registry.counter(
+    'paper_harvester_arxiv_results_total',
+    '検索結果（ソース間の重複を除いた後）の件数',
+    ['outcome']
+)
+ARXIV_SEARCH_CACHE_TOTAL = registry.counter(
+    'paper_harvester_arxiv_search_cache_total',
+    '実行内で共有した検索結果の利用件数（hit はソースへのリクエストを省略）',
+    ['result']
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+_local = threading.local()
+
+# 既存判定・関連度順の並べ替え・類似論文の除外をまとめて行う件数（arXiv APIの1ページ分）
+_CHUNK_SIZE = 100
+
+class _SharedResults:
+    """実行内で共有する検索結果（後の検索には取得済みの分を再生し、残りは最初の検索の続きから取得する）"""
+
+    def __init__(self, stream: SourceStream):
+        self.stream = stream
+        self._iterator = iter(stream)
+        self._records: List[PaperRecord] = []
+        self.complete = False
+
+    def __iter__(self) -> Iterator[PaperRecord]:
+        index = 0
+        while True:
+            if index < len(self._records):
+                yield self._records[index]
+                index += 1
+                continue
+            if self.complete:
+                return
+            try:
+                self._records.append(next(self._iterator))
+            except StopIteration:
+                self.complete = True
+
+def _chunks(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 class ArxivService:
+    @staticmethod
+    @contextmanager
+    def shared_search():
+        """ブロック内では同じキーワード・件数の検索を1回にまとめ、結果を共有する
+
+        類似論文の判定に使うLSHインデックスもブロック内で1回だけ構築し、保存した論文を追加しながら共有する。
+        """
+        previous = getattr(_local, 'search_cache', None), getattr(_local, 'near_duplicate_index', None)
+        _local.search_cache = {}
+        _local.near_duplicate_index = None
+        try:
+            yield
+        finally:
+            for shared in _local.search_cache.values():
+                shared.stream.close()
+            _local.search_cache, _local.near_duplicate_index = previous
+
     @classmethod
-    def search_papers(cls, keyword: str, days_back: int = 2, max_results: int = 20):
-        """arXivから論文を検索"""
+    def search_papers(cls, keyword: str, days_back: int = 2, max_results: int = 20,
+                      start_date: Optional[datetime] = None,
+                      end_date: Optional[datetime] = None) -> Iterator[PaperRecord]:
+        """有効なすべての論文ソースから論文を検索し、取得しながら期間内の論文を順に返す
+
+        start_date を指定した場合はその期間だけを検索する。読むのをやめると残りのページは取得しない。
+        """
+        started = time.perf_counter()
+        status = 'error'
+        stream = None
+        found = 0
         try:
-            end_date = datetime.now(pytz.UTC)
-            start_date = end_date - timedelta(days=days_back)
-            
-            print(f"\nSearching papers for keyword '{keyword}'")
-            print(f"Date range: {start_date.strftime('%Y-%m-%d %H:%M:%S UTC')} to {end_date.strftime('%Y-%m-%d %H:%M:%S UTC')}")
+            bounded = start_date is not None
+            if not bounded:
+                end_date = datetime.now(pytz.UTC)
+                start_date = end_date - timedelta(days=days_back)
+            else:
+                end_date = end_date or datetime.now(pytz.UTC)
+            logger.debug("Searching papers", extra={
+                'keyword': keyword,
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            })
             
             # 期間内の論文を確実に取得するため、より多くの論文を取得
             search_max_results = max_results * 3  # 余裕を持って取得
             
-            query = arxiv.Search(
-                query=f'all:"{keyword}"',
-                max_results=search_max_results,
-                sort_by=arxiv.SortCriterion.SubmittedDate,
-                sort_order=arxiv.SortOrder.Descending
-            )
+            def search():
+                return SourceFanout().search(
+                    keyword, search_max_results,
+                    start_date if bounded else None, end_date if bounded else None
+                )
             
-            papers = []
-            print("Fetching results from arXiv...")
+            cache = getattr(_local, 'search_cache', None)
+            if cache is None:
+                stream = search()
+                results = stream
+            else:
+                # 等価なキーワードは同じ検索になるよう正規形で共有する
+                cache_key = (canonicalize(keyword), search_max_results, (start_date, end_date) if bounded else None)
+                shared = cache.get(cache_key)
+                # 失敗したソースがある結果は共有しない（同じ実行の後の検索で再試行する）
+                if shared is not None and shared.complete and shared.stream.failed:
+                    shared = None
+                if shared is None:
+                    shared = cache[cache_key] = _SharedResults(search())
+                    ARXIV_SEARCH_CACHE_TOTAL.inc(result='miss')
+                else:
+                    ARXIV_SEARCH_CACHE_TOTAL.inc(result='hit')
+                results = shared
             
-            for result in query.results():
-                print(f"Checking paper: {result.title} (published: {result.published})")
-                if start_date <= result.published <= end_date:
-                    paper_info = {
-                        'arxiv_id': result.entry_id.split('/')[-1],
-                        'title': result.title,
-                        'authors': ', '.join([author.name for author in result.authors]),
-                        'abstract': result.summary,
-                        'url': result.pdf_url,
-                        'published_date': result.published
-                    }
-                    papers.append(paper_info)
-                    print(f"📝 Found matching paper: {paper_info['title']}")
+            # 論文ごとのログは DEBUG のときだけ組み立てる
+            debug = logger.isEnabledFor(logging.DEBUG)
+            
+            for record in results:
+                if start_date <= record.published_date <= end_date:
+                    ARXIV_RESULTS_TOTAL.inc(outcome='in_range')
+                    if debug:
+                        logger.debug("Found matching paper", extra={'keyword': keyword, 'arxiv_id': record.arxiv_id})
+                    found += 1
+                    yield record
                 else:
-                    print(f"❌ Skipped paper (out of date range): {result.title}")
+                    ARXIV_RESULTS_TOTAL.inc(outcome='out_of_range')
+                    if debug:
+                        logger.debug("Skipped paper out of date range", extra={
+                            'keyword': keyword,
+                            'arxiv_id': record.arxiv_id,
+                            'published': record.published_date.isoformat()
+                        })
             
-            print(f"Found {len(papers)} papers within date range")
-            return papers
+            failed = (results.stream if isinstance(results, _SharedResults) else results).failed
+            status = 'rejected' if failed else 'ok'
+            logger.info("Found papers within date range", extra={'keyword': keyword, 'papers': found})
             
-        except Exception as e:
-            print(f"Error searching papers: {e}")
-            import traceback
-            print(traceback.format_exc())
+        except GeneratorExit:
+            # 呼び出し側が必要な件数を取得し終えた
+            status = 'ok'
+            raise
+        except Exception:
+            logger.exception("Error searching papers", extra={'keyword': keyword})
+        finally:
+            if stream is not None:
+                stream.close()
+            ARXIV_SEARCH_SECONDS.observe(time.perf_counter() - started, status=status)
+
+    @classmethod
+    def fetch_and_process_papers(cls, db, keyword, channel_id,
+                                 start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                                 limit: Optional[int] = None, commit: bool = True) -> List[Paper]:
+        """論文を取得して処理し、チャンネルに未配信の論文の一覧を返す（期間・件数を指定した場合はチャンネル設定の代わりに使用）
+
+        commit が False の場合は新しい論文を flush するだけで、コミットは呼び出し側に任せる。
+        """
+        try:
+            return list(cls.iter_new_papers(db, keyword, channel_id, start_date, end_date, limit, commit))
+        except Exception:
+            db.rollback()
+            logger.exception("Error in fetch_and_process_papers", extra={'keyword': keyword, 'channel_id': channel_id})
             return []
 
     @classmethod
-    def fetch_and_process_papers(cls, db, keyword, channel_id):
-        """論文を取得して処理"""
+    def iter_new_papers(cls, db, keyword, channel_id,
+                        start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                        limit: Optional[int] = None, commit: bool = True) -> Iterator[Paper]:
+        """論文を取得しながら処理し、チャンネルに未配信の論文を順に返す
+
+        検索結果は _CHUNK_SIZE 件ごとに、配信済みの除外・関連度順の並べ替え・類似論文の除外をして新しい論文を保存（commit が
+        False なら flush）してから返す。同じキーワードのチャンネルで検索結果を共有しても、他のチャンネルが先に保存した
+        論文はこのチャンネルにも返す。後のページの取得中に先の論文を通知でき、メモリに置く検索結果は
+        ページ数によらず一定になる。返す論文が max_results 件に達したら残りのページは取得しない。
+        例外は呼び出し側に送出する（返した論文は commit が True なら保存済み）。
+        """
+        channel = db.query(Channel).filter_by(slack_channel_id=channel_id).first()
+        days_back = channel.config.days_back if channel and channel.config else DEFAULT_DAYS_BACK
+        max_results = channel.config.max_results if channel and channel.config else DEFAULT_MAX_RESULTS
+        if limit is not None:
+            max_results = limit
+        
+        log_fields = {'keyword': keyword, 'channel_id': channel_id}
+        logger.debug("Processing papers", extra={**log_fields, 'days_back': days_back, 'max_results': max_results})
+        
+        # チャンネルのキーワード集合に対する関連度で並べる
+        channel_keywords = [k.word for k in channel.keywords] if channel and channel.keywords else [keyword]
+        channel_keywords = [term for word in channel_keywords for term in search_terms(keyword_query(word))]
+        
+        records = cls.search_papers(keyword, days_back, max_results, start_date, end_date)
+        chunks = _chunks(records, _CHUNK_SIZE)
+        detector = None
+        fetched = existing = reused = new = 0
         try:
-            channel = db.query(Channel).filter_by(slack_channel_id=channel_id).first()
-            days_back = channel.config.days_back if channel and channel.config else DEFAULT_DAYS_BACK
-            max_results = channel.config.max_results if channel and channel.config else DEFAULT_MAX_RESULTS
-            
-            print(f"\nProcessing papers for keyword: {keyword} in channel: {channel_id}")
-            print(f"Search parameters - days_back: {days_back}, max_results: {max_results}")
-            
-            papers = ArxivService.search_papers(keyword, days_back, max_results)
-            if not papers:
-                print("ℹ️ No papers found")
-                return []
-            
-            new_papers = []
-            print(f"\nChecking {len(papers)} papers for duplicates...")
-            
-            for paper_info in papers:
-                existing_paper = db.query(Paper).filter_by(
-                    arxiv_id=paper_info['arxiv_id']
-                ).first()
+            while new < max_results:
+                with trace_span('arxiv_search', keyword=keyword) as span:
+                    chunk = next(chunks, None)
+                    if span and not chunk and not fetched:
+                        span.outcome = 'empty'
+                if not chunk:
+                    break
+                fetched += len(chunk)
                 
-                if not existing_paper:
-                    print(f"✨ New paper found: {paper_info['title']}")
-                    paper = Paper(
-                        arxiv_id=paper_info['arxiv_id'],
-                        title=paper_info['title'],
-                        authors=paper_info['authors'],
-                        abstract=paper_info['abstract'],
-                        url=paper_info['url'],
-                        published_date=paper_info['published_date']
-                    )
-                    db.add(paper)
-                    new_papers.append(paper)
+                # 配信済みの除外・関連度順の並べ替え・類似論文の除外
+                with trace_span('filter', keyword=keyword):
+                    candidates = cls._undelivered_records(db, chunk, channel)
+                    existing += len(chunk) - len(candidates)
+                    candidates = [(c['record'], c['paper']) for c in RelevanceScorer.rank(
+                        [{'title': r.title, 'abstract': r.abstract, 'record': r, 'paper': p} for r, p in candidates],
+                        channel_keywords
+                    )]
                     
-                    if len(new_papers) >= max_results:
-                        break
-                else:
-                    print(f"📎 Paper already exists: {paper_info['title']}")
-            
-            if new_papers:
-                db.commit()
-                print(f"✅ Successfully processed {len(new_papers)} new papers")
-            else:
-                print("ℹ️ No new papers found")
-            
-            return new_papers
-            
-        except Exception as e:
-            print(f"❌ Error in fetch_and_process_papers: {e}")
-            import traceback
-            print(traceback.format_exc())
-            return []
+                    papers = []
+                    authors = {}
+                    seen = set()
+                    for record, paper in candidates:
+                        if new + len(papers) >= max_results:
+                            break
+                        if paper is not None:
+                            # 同じ検索結果を共有する他のチャンネルが先に保存した論文（類似論文の判定は保存時に済んでいる）
+                            if paper.id not in seen:
+                                seen.add(paper.id)
+                                reused += 1
+                                papers.append(paper)
+                            continue
+                        
+                        # 再投稿や関連論文など、内容がほぼ同じ論文は要約・投稿の前に除外
+                        if detector is None:
+                            detector = cls._near_duplicate_index(db)
+                        signature = NearDuplicateDetector.signature(record.title, record.abstract)
+                        # 共有したインデックスには、同じ実行で保存を取り消した論文自身が残っていることがある
+                        duplicates = [key for key in detector.query(signature) if key != record.base_id]
+                        if duplicates:
+                            logger.debug("Near-duplicate skipped", extra={
+                                **log_fields,
+                                'arxiv_id': record.arxiv_id,
+                                'similar_to': duplicates[0]
+                            })
+                            continue
+                        detector.add(record.base_id, signature)
+                        
+                        logger.debug("New paper found", extra={**log_fields, 'arxiv_id': record.arxiv_id})
+                        paper = Paper(**record.row(), minhash=signature.tobytes())
+                        db.add(paper)
+                        papers.append(paper)
+                        authors[paper] = record.authors
+                    
+                    # 論文IDを確定して著者を対応付け、既存論文に補完した署名も合わせてコミット
+                    db.flush()
+                    AuthorIndex.link(db, {paper.id: names for paper, names in authors.items()})
+                    if commit:
+                        db.commit()
+                
+                new += len(papers)
+                yield from papers
+        finally:
+            chunks.close()
+            records.close()
+        
+        logger.info("Processed papers", extra={
+            **log_fields,
+            'fetched': fetched,
+            'existing': existing,
+            'reused': reused,
+            'new': new
+        })
+
+    @staticmethod
+    def _undelivered_records(db, records: List[PaperRecord], channel: Optional[Channel]) -> List[Tuple[PaperRecord, Optional[Paper]]]:
+        """チャンネルに未配信の論文を (検索結果, 保存済みの論文または None) で返す
+
+        保存済みかはバージョンを除いたID、または別のソースから取得した論文とのDOIの一致で判定する。
+        同じキーワードの検索結果を共有する他のチャンネルが先に保存した論文も、このチャンネルに配信済み・
+        配信待ち（作業項目あり）でなければ返す。チャンネルがなければ保存済みでない論文だけを返す。
+        """
+        stored = db.query(Paper).filter(Paper.base_id.in_([r.base_id for r in records])).all()
+        dois = [r.doi for r in records if r.doi]
+        if dois:
+            stored += db.query(Paper).filter(Paper.doi.in_(dois)).all()
+        by_base_id = {paper.base_id: paper for paper in stored}
+        by_doi = {paper.doi: paper for paper in stored if paper.doi}
+
+        taken = set()
+        paper_ids = list({paper.id for paper in stored})
+        if channel is not None and paper_ids:
+            taken.update(paper_id for (paper_id,) in db.query(PaperDelivery.paper_id).filter(
+                PaperDelivery.channel_id == channel.id, PaperDelivery.paper_id.in_(paper_ids)
+            ))
+            taken.update(paper_id for (paper_id,) in db.query(RunItem.paper_id).filter(
+                RunItem.channel_id == channel.id, RunItem.paper_id.in_(paper_ids)
+            ))
+
+        undelivered = []
+        for record in records:
+            paper = by_base_id.get(record.base_id) or (by_doi.get(record.doi) if record.doi else None)
+            if paper is None:
+                undelivered.append((record, None))
+            elif channel is not None and paper.id not in taken:
+                undelivered.append((record, paper))
+        return undelivered
+
+    @classmethod
+    def _near_duplicate_index(cls, db) -> NearDuplicateDetector:
+        """類似論文の判定に使うLSHインデックス（shared_search のブロック内では構築済みのものを共有）"""
+        if getattr(_local, 'search_cache', None) is None:
+            return cls._load_near_duplicate_index(db)
+        if _local.near_duplicate_index is None:
+            _local.near_duplicate_index = cls._load_near_duplicate_index(db)
+        return _local.near_duplicate_index
+
+    @staticmethod
+    def _load_near_duplicate_index(db) -> NearDuplicateDetector:
+        """直近の保存済み論文からLSHインデックスを構築"""
+        detector = NearDuplicateDetector()
+        cutoff_date = datetime.now(pytz.UTC) - timedelta(days=NEAR_DUPLICATE_LOOKBACK_DAYS)
+        rows = db.query(Paper.id, Paper.base_id, Paper.title, Paper.abstract, Paper.minhash)\
+            .filter(Paper.published_date >= cutoff_date)\
+            .all()
+        
+        missing = []
+        for paper_id, base_id, title, abstract, minhash in rows:
+            signature = NearDuplicateDetector.from_bytes(minhash)
+            if signature is None:
+                # 署名のない既存論文はここで計算して保存する
+                signature = NearDuplicateDetector.signature(title, abstract)
+                missing.append({'id': paper_id, 'minhash': signature.tobytes()})
+            detector.add(base_id, signature)
+        
+        if missing:
+            db.bulk_update_mappings(Paper, missing)
+        return detector
 
     @staticmethod
     def get_paper_by_id(db, arxiv_id: str) -> Optional[Paper]:
-        """指定したarXiv IDの論文を取得"""
-        return db.query(Paper).filter_by(arxiv_id=arxiv_id).first()
+        """指定したarXiv IDの論文を取得（バージョンは問わない）"""
+        base_id, _ = parse_arxiv_id(arxiv_id)
+        return db.query(Paper).filter_by(base_id=base_id).order_by(Paper.version.desc()).first()
 
     @staticmethod
     def get_recent_papers(db, days: int = 7) -> List[Paper]:
-        """最近の論文を取得"""
+        """最近の論文を取得（一覧表示用に、本文・署名などは読み込まない）"""
         cutoff_date = datetime.now(pytz.UTC) - timedelta(days=days)
         return db.query(Paper)\
+            .options(load_only(Paper.id, Paper.arxiv_id, Paper.base_id, Paper.title, Paper.authors,
+                               Paper.url, Paper.published_date, Paper.categories))\
             .filter(Paper.published_date >= cutoff_date)\
             .order_by(Paper.published_date.desc())\
             .all()
\ No newline at end of file
@@ -0,0 +1,29 @@
+# paper_harvester/services/arxiv_client.py
+
+import threading
+from typing import Optional
+import arxiv
+from config import ARXIV_API_URL, ARXIV_DELAY_SECONDS
+
+_client: Optional[arxiv.Client] = None
+_client_lock = threading.Lock()
+
+def get_arxiv_client() -> arxiv.Client:
+    """プロセス共通のarXivクライアントを取得
+
+    リクエスト間隔（ARXIV_DELAY_SECONDS）は全ての検索で共有される。
+    再試行はクライアントでは行わず、呼び出し側で service_policy('arxiv') に任せる。
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = arxiv.Client(delay_seconds=ARXIV_DELAY_SECONDS, num_retries=0)
+            _client.query_url_format = ARXIV_API_URL + '?{}'
+        return _client
+
+
+def is_retryable(error: Exception) -> bool:
+    """arXiv APIの一時的な障害か（4xx は 429 以外は再試行しない）"""
+    if isinstance(error, arxiv.HTTPError):
+        return error.status == 429 or error.status >= 500
+    return True
@@ -0,0 +1,253 @@
+# paper_harvester/services/author_index.py
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+import pytz
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from config import DEFAULT_DAYS_BACK, DEFAULT_MAX_RESULTS
+from models.database import Author, AuthorFollow, Paper, PaperDelivery, paper_authors, as_utc
+from utils.metrics import registry
+from utils.paper_keys import author_key
+
+logger = logging.getLogger(__name__)
+
+AUTHOR_LINKS_TOTAL = registry.counter(
+    'paper_harvester_author_links_total',
+    '論文と著者の対応付けの件数（new_author: 新しく登録した著者, link: 論文と著者の対応）',
+    ['kind']
+)
+
+# 1回のクエリで指定するIDや名前の数（SQLiteの変数上限を超えないように分割）
+_CHUNK = 500
+
+class AuthorMatch(NamedTuple):
+    """フォロー中の著者による一致（作業項目・通知ではキーワードの代わりに使う）"""
+    author_id: int
+    word: str  # 通知に表示するラベル
+    id: Optional[int] = None  # キーワードのID（著者による一致では常に None）
+
+    @classmethod
+    def of(cls, author: Author) -> 'AuthorMatch':
+        return cls(author_id=author.id, word=f"author: {author.name}")
+
+def _split_authors(authors: Union[str, Sequence[str]]) -> List[str]:
+    """著者名の一覧（保存済みの論文ではカンマ区切りの文字列）を名前のリストにする"""
+    if isinstance(authors, str):
+        authors = authors.split(',')
+    return [' '.join(name.split()) for name in authors if name and name.strip()]
+
+def _chunks(values: List, size: int = _CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class AuthorIndex:
+    """論文の著者を正規化した authors / paper_authors テーブルで管理する
+
+    著者名は比較用のキー（utils.paper_keys.author_key）で1行にまとめ、論文の保存と同じトランザクションで対応付ける。
+    著者のフォローは保存済みの論文を author_id のインデックスで引いて照合するので、arXivへの問い合わせは増えない。
+    """
+
+    @classmethod
+    def link(cls, db, authors_by_paper: Dict[int, Union[str, Sequence[str]]]) -> int:
+        """論文ID → 著者名の一覧 を対応付け、追加した対応の件数を返す（コミットは呼び出し側で行う）"""
+        if not authors_by_paper:
+            return 0
+        linked = set()
+        for chunk in _chunks(list(authors_by_paper)):
+            linked.update(paper_id for (paper_id,) in db.query(paper_authors.c.paper_id)
+                          .filter(paper_authors.c.paper_id.in_(chunk)).distinct())
+
+        names = {}
+        papers = []
+        for paper_id, authors in authors_by_paper.items():
+            if paper_id in linked:
+                continue
+            keys = []
+            for name in _split_authors(authors):
+                key = author_key(name)
+                if key and key not in keys:
+                    keys.append(key)
+                    names.setdefault(key, name)
+            papers.append((paper_id, keys))
+        if not names:
+            return 0
+
+        author_ids = cls._author_ids(db, names)
+        rows = [
+            {'paper_id': paper_id, 'author_id': author_ids[key], 'position': position}
+            for paper_id, keys in papers
+            for position, key in enumerate(keys)
+        ]
+        db.execute(insert(paper_authors), rows)
+        AUTHOR_LINKS_TOTAL.inc(len(rows), kind='link')
+        return len(rows)
+
+    @classmethod
+    def link_records(cls, db, records: Iterable) -> int:
+        """保存した論文の記録（PaperRecord）の著者を対応付ける（論文IDは arxiv_id から引く）"""
+        authors_by_id = {record.arxiv_id: record.authors for record in records}
+        authors_by_paper = {}
+        for chunk in _chunks(list(authors_by_id)):
+            for paper_id, arxiv_id in db.query(Paper.id, Paper.arxiv_id).filter(Paper.arxiv_id.in_(chunk)):
+                authors_by_paper[paper_id] = authors_by_id[arxiv_id]
+        return cls.link(db, authors_by_paper)
+
+    @staticmethod
+    def _author_ids(db, names: Dict[str, str]) -> Dict[str, int]:
+        """名前のキー → 著者ID（未登録の著者は追加する）"""
+        def lookup(keys):
+            found = {}
+            for chunk in _chunks(keys):
+                found.update(db.query(Author.name_key, Author.id).filter(Author.name_key.in_(chunk)))
+            return found
+
+        ids = lookup(list(names))
+        missing = [{'name': names[key], 'name_key': key} for key in names if key not in ids]
+        if missing:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Author), missing)
+            except IntegrityError:
+                # 他のノードが同じ著者を先に登録した。1件ずつ入れ直す
+                for row in missing:
+                    try:
+                        with db.begin_nested():
+                            db.execute(insert(Author), [row])
+                    except IntegrityError:
+                        pass
+            AUTHOR_LINKS_TOTAL.inc(len(missing), kind='new_author')
+            ids.update(lookup([row['name_key'] for row in missing]))
+        return ids
+
+    @staticmethod
+    def find(db, name: str) -> Optional[Author]:
+        """名前のキーが一致する著者"""
+        key = author_key(name)
+        return db.query(Author).filter_by(name_key=key).first() if key else None
+
+    @classmethod
+    def follow(cls, db, channel, name: str) -> Tuple[Optional[AuthorFollow], bool]:
+        """チャンネルで著者をフォローし、(フォロー, 新しく追加したか) を返す（名前が空なら (None, False)）"""
+        key = author_key(name)
+        if not key:
+            return None, False
+        author = cls.find(db, name)
+        if author is None:
+            # まだ論文が保存されていない著者も、以降の論文から照合できるように登録する
+            author = Author(name=' '.join(name.split()), name_key=key)
+            db.add(author)
+            db.flush()
+        follow = db.query(AuthorFollow).filter_by(channel_id=channel.id, author_id=author.id).first()
+        if follow is not None:
+            return follow, False
+        follow = AuthorFollow(channel_id=channel.id, author_id=author.id)
+        db.add(follow)
+        db.commit()
+        logger.info("Following author", extra={'channel_id': channel.slack_channel_id, 'author': author.name})
+        return follow, True
+
+    @classmethod
+    def unfollow(cls, db, channel, name: str) -> Optional[Author]:
+        """フォローを解除し、解除した著者を返す（フォローしていなければ None）"""
+        author = cls.find(db, name)
+        if author is None:
+            return None
+        deleted = db.query(AuthorFollow).filter_by(channel_id=channel.id, author_id=author.id).delete()
+        db.commit()
+        return author if deleted else None
+
+    @staticmethod
+    def follows(db, channel_ids: List[int]) -> List[AuthorFollow]:
+        """チャンネルのフォロー（フォローした順）"""
+        if not channel_ids:
+            return []
+        return db.query(AuthorFollow)\
+            .filter(AuthorFollow.channel_id.in_(channel_ids))\
+            .order_by(AuthorFollow.id)\
+            .all()
+
+    @staticmethod
+    def recent_counts(db, author_ids: List[int], since: datetime) -> Dict[int, int]:
+        """著者ごとの since 以降に公開された保存済みの論文数"""
+        if not author_ids:
+            return {}
+        return dict(
+            db.query(paper_authors.c.author_id, func.count())
+            .join(Paper, Paper.id == paper_authors.c.paper_id)
+            .filter(paper_authors.c.author_id.in_(author_ids), Paper.published_date >= since)
+            .group_by(paper_authors.c.author_id)
+        )
+
+    @staticmethod
+    def papers(db, author_id: int, since: datetime, limit: int) -> List[Paper]:
+        """著者の since 以降に公開された保存済みの論文（新しい順）"""
+        return db.query(Paper)\
+            .join(paper_authors, paper_authors.c.paper_id == Paper.id)\
+            .filter(paper_authors.c.author_id == author_id, Paper.published_date >= since)\
+            .order_by(Paper.published_date.desc(), Paper.id.desc())\
+            .limit(limit)\
+            .all()
+
+    @classmethod
+    def pending_papers(cls, db, channels) -> Dict[int, List[Tuple[Paper, AuthorMatch]]]:
+        """保存済みの論文から、各チャンネルでフォロー中の著者の未配信の論文を新しい順に選ぶ"""
+        follows = cls.follows(db, [channel.id for channel in channels])
+        if not follows:
+            return {}
+
+        def days_back(channel):
+            return channel.config.days_back if channel.config else DEFAULT_DAYS_BACK
+
+        now = datetime.now(pytz.UTC)
+        cutoff = now - timedelta(days=max(days_back(channel) for channel in channels))
+        # 著者IDのインデックスから期間内の論文だけを引く（著者名の文字列は走査しない）
+        by_author = defaultdict(list)
+        rows = db.query(paper_authors.c.author_id, Paper)\
+            .join(Paper, Paper.id == paper_authors.c.paper_id)\
+            .filter(paper_authors.c.author_id.in_({f.author_id for f in follows}), Paper.published_date >= cutoff)\
+            .order_by(Paper.published_date.desc(), Paper.id.desc())
+        for author_id, paper in rows:
+            by_author[author_id].append(paper)
+
+        delivered = defaultdict(set)
+        for channel_id, paper_id in db.query(PaperDelivery.channel_id, PaperDelivery.paper_id)\
+                .filter(PaperDelivery.delivered_at >= cutoff):
+            delivered[channel_id].add(paper_id)
+
+        follows_by_channel = defaultdict(list)
+        for follow in follows:
+            follows_by_channel[follow.channel_id].append(follow)
+
+        pending = {}
+        for channel in channels:
+            channel_follows = follows_by_channel.get(channel.id)
+            if not channel_follows:
+                continue
+            channel_cutoff = now - timedelta(days=days_back(channel))
+            # キーワードと同じく、件数の上限は著者単位で適用する
+            max_results = channel.config.max_results if channel.config else DEFAULT_MAX_RESULTS
+            selected = []
+            seen = set()
+            for follow in channel_follows:
+                match = AuthorMatch.of(follow.author)
+                count = 0
+                for paper in by_author.get(follow.author_id, []):
+                    if count >= max_results:
+                        break
+                    if paper.id in seen or paper.id in delivered[channel.id]:
+                        continue
+                    if as_utc(paper.published_date) < channel_cutoff:
+                        break
+                    seen.add(paper.id)
+                    selected.append((paper, match))
+                    count += 1
+            pending[channel.id] = selected
+            logger.info("Matched followed authors", extra={
+                'channel_id': channel.slack_channel_id,
+                'authors': len(channel_follows),
+                'selected': len(selected)
+            })
+        return pending
@@ -0,0 +1,136 @@
+# paper_harvester/services/backfill.py
+
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import pytz
+from sqlalchemy import Integer, column, text
+from config import DEFAULT_DAYS_BACK, DEFAULT_MAX_RESULTS, HARVEST_MODE, HARVEST_CATEGORIES
+from models.database import Paper, PaperDelivery, HarvestCheckpoint, PAPER_SEARCH_TABLE, has_paper_search_index, as_utc
+from services.arxiv import ArxivService
+from services.keyword_matcher import KeywordMatcher
+from services.oai_harvester import OAIHarvester
+from services.relevance import RelevanceScorer
+from services.run_tracer import trace_span
+from utils.keyword_query import Node, keyword_query, to_fts_query, required_categories, search_terms
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# これより短い未取得期間は検索しない（arXivの公開は1日1回のため、直近の投稿はまだ検索に現れない）
+_MIN_UNCOVERED = timedelta(hours=1)
+
+BACKFILL_PAPERS_TOTAL = registry.counter(
+    'paper_harvester_backfill_papers_total',
+    '購読時のバックフィルで配信候補になった論文の件数（local は保存済み、arxiv は未取得期間の検索結果）',
+    ['source']
+)
+
+class SubscriptionBackfill:
+    """購読したキーワードに一致する論文を保存済みの論文から探し、すぐに配信できるようにする
+
+    保存済みの論文は全文検索インデックスで候補を絞ってからキーワードの構文木で照合する。
+    OAI-PMHで一覧を取得済みの期間はローカルだけで完結させ、残りの期間だけarXivを検索する。
+    """
+
+    @staticmethod
+    def local_matches(db, keyword, since: datetime) -> List[Paper]:
+        """保存済みの論文のうち、期間内でキーワードに一致するものを新しい順に返す"""
+        query = db.query(Paper).filter(Paper.published_date >= since)
+        fts_query = to_fts_query(keyword_query(keyword.word))
+        if fts_query and has_paper_search_index(db.connection()):
+            matched_ids = text(f"SELECT rowid FROM {PAPER_SEARCH_TABLE} WHERE {PAPER_SEARCH_TABLE} MATCH :query")\
+                .bindparams(query=fts_query)\
+                .columns(column('rowid', Integer))
+            query = query.filter(Paper.id.in_(matched_ids))
+
+        # 全文検索は候補の絞り込みだけに使い、カテゴリ・否定を含めた判定は照合で行う
+        matcher = KeywordMatcher([keyword])
+        return [
+            paper for paper in query.order_by(Paper.published_date.desc())
+            if matcher.match(paper.title, paper.abstract, paper.categories)
+        ]
+
+    @staticmethod
+    def covered_range(db, node: Node) -> Optional[Tuple[datetime, datetime]]:
+        """キーワードに一致する論文がローカルに揃っている期間（OAI-PMHの取得範囲から判断）"""
+        if HARVEST_MODE == 'oai':
+            categories = set(HARVEST_CATEGORIES)
+        else:
+            # 検索モードでは取得対象のカテゴリに限定されたキーワードだけがローカルで完結する
+            categories = required_categories(node)
+            if not categories or not all(OAIHarvester.in_categories(c, HARVEST_CATEGORIES) for c in categories):
+                return None
+
+        names = {f"oai:{OAIHarvester.set_spec(category)}" for category in categories}
+        checkpoints = db.query(HarvestCheckpoint).filter(HarvestCheckpoint.name.in_(names)).all()
+        if len(checkpoints) < len(names) or any(c.covered_from is None or c.covered_until is None for c in checkpoints):
+            return None
+        start = max(as_utc(c.covered_from) for c in checkpoints)
+        end = min(as_utc(c.covered_until) for c in checkpoints)
+        return (start, end) if start < end else None
+
+    @staticmethod
+    def uncovered_ranges(start: datetime, end: datetime,
+                         covered: Optional[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+        """期間のうちローカルに揃っていない部分"""
+        if covered is None:
+            return [(start, end)]
+        covered_from, covered_until = covered
+        ranges = []
+        if start < covered_from:
+            ranges.append((start, min(covered_from, end)))
+        if covered_until < end:
+            ranges.append((max(covered_until, start), end))
+        return [(low, high) for low, high in ranges if high - low >= _MIN_UNCOVERED]
+
+    @classmethod
+    def backfill(cls, db, channel, keyword) -> List[Paper]:
+        """チャンネルに未配信でキーワードに一致する論文を関連度順に選ぶ"""
+        days_back = channel.config.days_back if channel.config else DEFAULT_DAYS_BACK
+        max_results = channel.config.max_results if channel.config else DEFAULT_MAX_RESULTS
+        now = datetime.now(pytz.UTC)
+        since = now - timedelta(days=days_back)
+        node = keyword_query(keyword.word)
+        log_fields = {'channel_id': channel.slack_channel_id, 'keyword': keyword.word}
+
+        # ローカルに揃っていない期間だけarXivを検索（取得した論文は保存済みになる）
+        ranges = cls.uncovered_ranges(since, now, cls.covered_range(db, node))
+        remote = []
+        for start, end in ranges:
+            remaining = max_results - len(remote)
+            if remaining <= 0:
+                break
+            remote.extend(ArxivService.fetch_and_process_papers(
+                db, keyword.word, channel.slack_channel_id, start, end, limit=remaining
+            ))
+
+        with trace_span('match', keyword=keyword.word):
+            delivered = {
+                paper_id for (paper_id,) in db.query(PaperDelivery.paper_id).filter(
+                    PaperDelivery.channel_id == channel.id,
+                    PaperDelivery.delivered_at >= since
+                )
+            }
+            remote_ids = {paper.id for paper in remote}
+            local = [
+                paper for paper in cls.local_matches(db, keyword, since)
+                if paper.id not in delivered and paper.id not in remote_ids
+            ]
+            local = [c['paper'] for c in RelevanceScorer.rank(
+                [{'title': p.title, 'abstract': p.abstract, 'paper': p} for p in local],
+                search_terms(node)
+            )][:max(max_results - len(remote), 0)]
+
+        BACKFILL_PAPERS_TOTAL.inc(len(local), source='local')
+        BACKFILL_PAPERS_TOTAL.inc(len(remote), source='arxiv')
+        logger.info("Backfilled subscription", extra={
+            **log_fields,
+            'local': len(local),
+            'arxiv': len(remote),
+            'arxiv_ranges': len(ranges)
+        })
+
+        # arXivから取得した論文は保存済みのため、件数の上限内で必ず配信する
+        candidates = [{'title': p.title, 'abstract': p.abstract, 'paper': p} for p in remote + local]
+        return [c['paper'] for c in RelevanceScorer.rank(candidates, search_terms(node))]
@@ -0,0 +1,257 @@
+# paper_harvester/services/coordination.py
+
+import logging
+import math
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+import pytz
+from sqlalchemy import case, or_, update
+from sqlalchemy.exc import IntegrityError
+from config import SessionLocal, NODE_ID, COORDINATION_SHARDS, LEASE_TTL_SECONDS
+from models.database import Lease
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LEASES_HELD = registry.gauge(
+    'paper_harvester_leases_held',
+    'このノードが保持しているリースの数',
+    ['kind']
+)
+LEASE_CHANGES_TOTAL = registry.counter(
+    'paper_harvester_lease_changes_total',
+    'リースの取得・解放・喪失と、引き継がれた後の書き込みを拒否（fenced）した回数',
+    ['kind', 'event']
+)
+
+# 期限切れの判定に余裕を持たせ、他のノードが引き継ぐ前に自分の処理を止める
+_EXPIRY_MARGIN = 0.2
+
+def shard_of(key: str, shards: int = COORDINATION_SHARDS) -> int:
+    """チャンネルなどのキーを担当シャードに割り当てる（どのノードでも同じ結果になる）"""
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+def _kind(name: str) -> str:
+    return name.split(':', 1)[0]
+
+class LeaseManager:
+    """共有データベースの有効期限つきリース行で、複数ノードの担当を調整する
+
+    リースの取得は「自分が保持中、または期限切れ」の行だけを更新する条件付きUPDATEで行うため、
+    PostgreSQLでもSQLite（WALモード）でも同時に1ノードだけが成功する。
+    保持中のリースは heartbeat() で定期的に延長し、止まったノードのリースは期限切れ後に他のノードが引き継ぐ。
+    別のノードが取得するたびに増えるトークンを覚えておき、fence() で書き込みの前に引き継がれていないかを確かめる。
+    """
+
+    def __init__(self, node_id: str = NODE_ID, ttl_seconds: float = LEASE_TTL_SECONDS,
+                 shards: int = COORDINATION_SHARDS):
+        self.node_id = node_id
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.shards = shards
+        self._held: Dict[str, float] = {}  # リース名 → 手元で保持しているとみなせる期限（monotonic）
+        self._tokens: Dict[str, int] = {}  # リース名 → 取得したときのフェンシングトークン
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def node_lease(self) -> str:
+        return f"node:{self.node_id}"
+
+    def _held_until(self, started: float) -> float:
+        return started + self.ttl.total_seconds() * (1 - _EXPIRY_MARGIN)
+
+    def _remember(self, name: str, started: Optional[float], token: Optional[int] = None):
+        with self._lock:
+            if started is None:
+                self._held.pop(name, None)
+                self._tokens.pop(name, None)
+            else:
+                self._held[name] = self._held_until(started)
+                self._tokens[name] = token
+            counts = {}
+            for held in self._held:
+                counts[_kind(held)] = counts.get(_kind(held), 0) + 1
+        LEASES_HELD.set(counts.get(_kind(name), 0), kind=_kind(name))
+
+    def holds(self, name: str) -> bool:
+        """リースを保持中か（期限が近いものは保持していないとみなす）"""
+        with self._lock:
+            deadline = self._held.get(name)
+        return deadline is not None and time.monotonic() < deadline
+
+    def try_acquire(self, name: str) -> bool:
+        """リースを取得（自分が保持中なら延長）し、成功したかを返す"""
+        started = time.monotonic()
+        now = datetime.now(pytz.UTC)
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(Lease)
+                .where(Lease.name == name, or_(Lease.holder == self.node_id, Lease.expires_at < now))
+                .values(
+                    token=case((Lease.holder == self.node_id, Lease.token), else_=Lease.token + 1),
+                    acquired_at=case((Lease.holder == self.node_id, Lease.acquired_at), else_=now),
+                    holder=self.node_id,
+                    expires_at=now + self.ttl
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                if db.query(Lease.id).filter_by(name=name).first():
+                    db.rollback()
+                    return False
+                db.add(Lease(name=name, holder=self.node_id, acquired_at=now, expires_at=now + self.ttl, token=1))
+                token = 1
+            else:
+                token = db.query(Lease.token).filter_by(name=name).scalar()
+            db.commit()
+        except IntegrityError:
+            # 同時に別のノードが行を作成した
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+        if not self.holds(name):
+            LEASE_CHANGES_TOTAL.inc(kind=_kind(name), event='acquired')
+            logger.info("Acquired lease", extra={'lease': name, 'node_id': self.node_id})
+        self._remember(name, started, token)
+        return True
+
+    def fence(self, db, names: Iterable[str]) -> bool:
+        """db のトランザクションの書き込みを、names のリースを取得したときのトークンのまま保持している場合だけ許すか
+
+        書き込みを flush してから確認する（PostgreSQLではリースの行を共有ロックする）ので、確認してから
+        コミットするまでに他のノードが引き継ぐことはない。False なら呼び出し側でロールバックする。
+        """
+        with self._lock:
+            tokens = {name: self._tokens.get(name) for name in names}
+        db.flush()
+        current = dict(
+            db.query(Lease.name, Lease.token)
+            .filter(Lease.name.in_(list(tokens)), Lease.holder == self.node_id)
+            .with_for_update(read=True)
+            .all()
+        )
+        stale = sorted(name for name, token in tokens.items() if token is None or current.get(name) != token)
+        for name in stale:
+            LEASE_CHANGES_TOTAL.inc(kind=_kind(name), event='fenced')
+        if stale:
+            logger.warning("Lease taken over, discarding write", extra={'leases': ','.join(stale), 'node_id': self.node_id})
+        return not stale
+
+    def release(self, name: str):
+        """リースを解放（期限を過去にして、すぐに他のノードが取得できるようにする）"""
+        self._remember(name, None)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Lease)
+                .where(Lease.name == name, Lease.holder == self.node_id)
+                .values(expires_at=datetime.now(pytz.UTC) - timedelta(seconds=1))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            LEASE_CHANGES_TOTAL.inc(kind=_kind(name), event='released')
+            logger.info("Released lease", extra={'lease': name, 'node_id': self.node_id})
+        except Exception:
+            db.rollback()
+            logger.exception("Error releasing lease", extra={'lease': name})
+        finally:
+            db.close()
+
+    def heartbeat(self):
+        """ノードの生存を登録し、保持中のリースを延長（延長できなかったリースは手放す）"""
+        with self._lock:
+            names = [self.node_lease] + [name for name in self._held if name != self.node_lease]
+        for name in names:
+            try:
+                renewed = self.try_acquire(name)
+            except Exception:
+                logger.exception("Error renewing lease", extra={'lease': name})
+                continue
+            if not renewed:
+                self._remember(name, None)
+                LEASE_CHANGES_TOTAL.inc(kind=_kind(name), event='lost')
+                logger.warning("Lost lease", extra={'lease': name, 'node_id': self.node_id})
+
+    def prune(self, prefix: str, older_than: timedelta = timedelta(days=1)) -> int:
+        """期限切れから時間が経ったリース行を削除（時間枠ごとのリースが溜まらないようにする）"""
+        db = SessionLocal()
+        try:
+            deleted = db.query(Lease).filter(
+                Lease.name.like(f"{prefix}:%"),
+                Lease.expires_at < datetime.now(pytz.UTC) - older_than
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def live_nodes(self) -> int:
+        """期限内のリースを持つノードの数"""
+        db = SessionLocal()
+        try:
+            return db.query(Lease).filter(
+                Lease.name.like('node:%'),
+                Lease.expires_at >= datetime.now(pytz.UTC)
+            ).count()
+        finally:
+            db.close()
+
+    def owned_shards(self) -> Set[int]:
+        """保持中のシャード"""
+        return {shard for shard in range(self.shards) if self.holds(f"shard:{shard}")}
+
+    def rebalance(self) -> Set[int]:
+        """生存ノード数で割った担当数になるようシャードを取得・解放し、保持中のシャードを返す
+
+        止まったノードのシャードは期限切れ後にここで引き継がれる。
+        """
+        self.heartbeat()
+        fair_share = math.ceil(self.shards / max(self.live_nodes(), 1))
+
+        owned = sorted(self.owned_shards())
+        for shard in owned[fair_share:]:
+            self.release(f"shard:{shard}")
+        owned = set(owned[:fair_share])
+
+        # ノードごとに探し始める位置をずらして、同時に同じシャードを取り合わないようにする
+        offset = shard_of(self.node_id, self.shards)
+        for i in range(self.shards):
+            if len(owned) >= fair_share:
+                break
+            shard = (offset + i) % self.shards
+            if shard not in owned and self.try_acquire(f"shard:{shard}"):
+                owned.add(shard)
+        return owned
+
+    def start(self):
+        """保持中のリースを延長し続けるスレッドを開始"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.heartbeat()
+
+        def run():
+            interval = self.ttl.total_seconds() / 3
+            while not self._stop.wait(interval):
+                self.heartbeat()
+
+        self._thread = threading.Thread(target=run, name='lease-heartbeat', daemon=True)
+        self._thread.start()
+        logger.info("Lease heartbeat started", extra={'node_id': self.node_id, 'ttl_seconds': self.ttl.total_seconds()})
+
+    def stop(self):
+        """延長を止めて全てのリースを解放"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        with self._lock:
+            names = list(self._held)
+        for name in names:
+            self.release(name)
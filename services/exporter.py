@@ -0,0 +1,180 @@
+# paper_harvester/services/exporter.py
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Tuple
+import pytz
+from sqlalchemy import select, or_
+from config import EXPORT_BATCH_SIZE
+from models.database import Paper, PaperDelivery, Channel, Keyword, HarvestCheckpoint, as_utc
+from utils.metrics import registry
+
+EXPORT_ROWS_TOTAL = registry.counter(
+    'paper_harvester_export_rows_total',
+    'エクスポートした行数',
+    ['table', 'format']
+)
+
+logger = logging.getLogger(__name__)
+
+class ExportTable(NamedTuple):
+    source: object
+    columns: List[Tuple[str, str, object]]  # (出力する列名, 型: 'int'/'str'/'datetime', 列)
+    watermark: object  # 差分エクスポートの基準にする日時の列
+    joins: List[Tuple[object, object]]
+
+EXPORT_TABLES: Dict[str, ExportTable] = {
+    # 本文（paper_contents）・MinHash署名は含めない
+    'papers': ExportTable(
+        source=Paper,
+        columns=[
+            ('id', 'int', Paper.id),
+            ('arxiv_id', 'str', Paper.arxiv_id),
+            ('base_id', 'str', Paper.base_id),
+            ('version', 'int', Paper.version),
+            ('title', 'str', Paper.title),
+            ('authors', 'str', Paper.authors),
+            ('abstract', 'str', Paper.abstract),
+            ('url', 'str', Paper.url),
+            ('summary', 'str', Paper.summary),
+            ('source_type', 'str', Paper.source_type),
+            ('categories', 'str', Paper.categories),
+            ('source', 'str', Paper.source),
+            ('doi', 'str', Paper.doi),
+            ('published_date', 'datetime', Paper.published_date),
+            ('notified_at', 'datetime', Paper.notified_at),
+            ('updated_at', 'datetime', Paper.updated_at),
+        ],
+        watermark=Paper.updated_at,
+        joins=[]
+    ),
+    'deliveries': ExportTable(
+        source=PaperDelivery,
+        columns=[
+            ('id', 'int', PaperDelivery.id),
+            ('slack_channel_id', 'str', Channel.slack_channel_id),
+            ('paper_id', 'int', PaperDelivery.paper_id),
+            ('arxiv_id', 'str', Paper.arxiv_id),
+            ('keyword', 'str', Keyword.word),
+            ('delivered_at', 'datetime', PaperDelivery.delivered_at),
+        ],
+        watermark=PaperDelivery.delivered_at,
+        joins=[
+            (Channel, Channel.id == PaperDelivery.channel_id),
+            (Paper, Paper.id == PaperDelivery.paper_id),
+            (Keyword, Keyword.id == PaperDelivery.keyword_id),
+        ]
+    ),
+}
+
+FORMATS = {'jsonl': 'jsonl', 'parquet': 'parquet'}  # 形式: 拡張子
+
+class _JsonlWriter:
+    def __init__(self, path: str, table: ExportTable):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows: List[dict]):
+        for row in rows:
+            self._file.write(json.dumps(
+                {k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()},
+                ensure_ascii=False
+            ))
+            self._file.write('\n')
+
+    def close(self):
+        self._file.close()
+
+class _ParquetWriter:
+    """バッチ1つを1つの行グループとして書き込む（pyarrow が必要）"""
+
+    def __init__(self, path: str, table: ExportTable):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet形式の出力には pyarrow が必要です（pip install pyarrow）")
+        types = {'int': pa.int64(), 'str': pa.string(), 'datetime': pa.timestamp('us', tz='UTC')}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind, _ in table.columns])
+        self._writer = pq.ParquetWriter(path, self._schema, compression='zstd')
+
+    def write(self, rows: List[dict]):
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema), row_group_size=len(rows))
+
+    def close(self):
+        self._writer.close()
+
+_WRITERS = {'jsonl': _JsonlWriter, 'parquet': _ParquetWriter}
+
+class CorpusExporter:
+    """論文と配信記録をファイルに書き出す
+
+    行は yield_per で batch_size 件ずつ読み、そのまま書き込むので、メモリ使用量は件数によらず一定になる。
+    差分エクスポートでは前回の実行開始時刻（harvest_checkpoints の 'export:<テーブル>'）より後に更新された行だけを書き出す。
+    """
+
+    def __init__(self, batch_size: int = EXPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    @staticmethod
+    def checkpoint_name(table: str) -> str:
+        return f"export:{table}"
+
+    def export(self, db, table: str, fmt: str, output_dir: str, incremental: bool = False) -> Tuple[str, int]:
+        """テーブルを1つのファイルに書き出し、(ファイルのパス, 行数) を返す"""
+        spec = EXPORT_TABLES[table]
+        started = datetime.now(pytz.UTC)
+        checkpoint = db.query(HarvestCheckpoint).filter_by(name=self.checkpoint_name(table)).first()
+        since = datetime.fromisoformat(checkpoint.cursor) if incremental and checkpoint and checkpoint.cursor else None
+
+        query = select(*[column.label(name) for name, _, column in spec.columns]).select_from(spec.source)
+        for target, condition in spec.joins:
+            query = query.outerjoin(target, condition)
+        # 実行中に更新された行は次回に回す（開始時刻を次回の基準にする）
+        if since is None:
+            query = query.where(or_(spec.watermark <= started, spec.watermark.is_(None)))
+        else:
+            query = query.where(spec.watermark > since, spec.watermark <= started)
+        query = query.order_by(spec.columns[0][2])
+
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"{table}-{started:%Y%m%dT%H%M%SZ}.{FORMATS[fmt]}")
+        partial_path = path + '.part'
+        writer = _WRITERS[fmt](partial_path, spec)
+        datetime_columns = [name for name, kind, _ in spec.columns if kind == 'datetime']
+        count = 0
+        try:
+            result = db.execute(query.execution_options(yield_per=self.batch_size))
+            for partition in result.mappings().partitions():
+                rows = []
+                for row in partition:
+                    row = dict(row)
+                    for name in datetime_columns:
+                        if row[name] is not None:
+                            row[name] = as_utc(row[name])
+                    rows.append(row)
+                writer.write(rows)
+                count += len(rows)
+                EXPORT_ROWS_TOTAL.inc(len(rows), table=table, format=fmt)
+        except Exception:
+            writer.close()
+            os.remove(partial_path)
+            raise
+        writer.close()
+        os.replace(partial_path, path)
+
+        if checkpoint is None:
+            checkpoint = HarvestCheckpoint(name=self.checkpoint_name(table))
+            db.add(checkpoint)
+        checkpoint.cursor = started.isoformat()
+        db.commit()
+        logger.info("Exported table", extra={
+            'table': table,
+            'format': fmt,
+            'rows': count,
+            'since': since.isoformat() if since else None,
+            'path': path
+        })
+        return path, count
@@ -0,0 +1,177 @@
+# paper_harvester/services/history_backfill.py
+
+import itertools
+import logging
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Iterator, List, Optional, Tuple
+import arxiv
+import pytz
+from sqlalchemy import insert
+from config import HISTORY_BACKFILL_WINDOW_DAYS, HISTORY_BACKFILL_MAX_PER_WINDOW
+from models.database import Paper, Keyword, HarvestCheckpoint, as_utc
+from services.author_index import AuthorIndex
+from services.paper_sources import ArxivSource, PaperRecord
+from services.arxiv_client import get_arxiv_client, is_retryable as arxiv_retryable
+from services.backfill import SubscriptionBackfill
+from services.summary_budget import SummaryBudget, SummaryPool
+from utils.keyword_query import keyword_query, canonicalize, to_arxiv_query
+from utils.metrics import registry
+from utils.resilience import service_policy, unavailable_services
+
+HISTORY_BACKFILL_PAPERS_TOTAL = registry.counter(
+    'paper_harvester_history_backfill_papers_total',
+    '過去の論文の取得で得た論文の件数（new: 保存, existing: 保存済み）',
+    ['outcome']
+)
+
+logger = logging.getLogger(__name__)
+
+# 要約のトークン使用量を記録するときのチャンネルID（--channel を指定しない場合）
+HISTORY_BACKFILL_ACCOUNT = 'history_backfill'
+
+class HistoricalBackfill:
+    """キーワードまたはカテゴリ（例: cat:cs.CL）の過去の論文を、期間を区切って取得し papers テーブルに保存する
+
+    期間は window_days 日ずつに区切り、各期間の検索結果をページ単位で取得する。
+    ページを保存するたびに進捗（期間の開始日時と期間内の取得済み件数）を harvest_checkpoints に保存するので、
+    中断しても同じ条件で実行すれば続きから再開する。arXivへのリクエストは共通のクライアントの間隔に従う。
+    要約は取得中には行わず、summarize で保存済みの論文に対して後から生成する。
+    """
+
+    def __init__(self, query: str, start: date, end: date, window_days: int = HISTORY_BACKFILL_WINDOW_DAYS):
+        if start > end:
+            raise ValueError("start must not be after end")
+        self.query = query
+        self.canonical = canonicalize(query)  # 構文エラーは KeywordQueryError
+        self.start = datetime(start.year, start.month, start.day, tzinfo=pytz.UTC)
+        self.end = datetime(end.year, end.month, end.day, tzinfo=pytz.UTC) + timedelta(days=1)
+        self.window = timedelta(days=window_days)
+
+    @property
+    def checkpoint_name(self) -> str:
+        return f"history:{self.canonical}:{self.start:%Y-%m-%d}:{(self.end - timedelta(days=1)):%Y-%m-%d}"
+
+    def windows(self, resume_from: datetime) -> Iterator[Tuple[datetime, datetime]]:
+        window_start = resume_from
+        while window_start < self.end:
+            window_end = min(window_start + self.window, self.end)
+            yield window_start, window_end
+            window_start = window_end
+
+    def progress(self, db) -> Tuple[datetime, int]:
+        """(再開する期間の開始日時, その期間内の取得済み件数)"""
+        checkpoint = db.query(HarvestCheckpoint).filter_by(name=self.checkpoint_name).first()
+        if checkpoint is None or not checkpoint.cursor:
+            return self.start, 0
+        window_start, offset = checkpoint.cursor.rsplit('|', 1)
+        return datetime.fromisoformat(window_start), int(offset)
+
+    def _save_progress(self, db, window_start: datetime, offset: int):
+        checkpoint = db.query(HarvestCheckpoint).filter_by(name=self.checkpoint_name).first()
+        if checkpoint is None:
+            checkpoint = HarvestCheckpoint(name=self.checkpoint_name)
+            db.add(checkpoint)
+        checkpoint.cursor = f"{window_start.isoformat()}|{offset}"
+        db.commit()
+
+    def run(self, db) -> int:
+        """未取得の期間の論文を取得して保存し、新規件数を返す"""
+        client = get_arxiv_client()
+        base_query = to_arxiv_query(keyword_query(self.query))
+        resume_from, offset = self.progress(db)
+        if resume_from > self.start or offset:
+            logger.info("Resuming history backfill", extra={
+                'query': self.query,
+                'window_start': resume_from.isoformat(),
+                'offset': offset
+            })
+
+        total_new = 0
+        for window_start, window_end in self.windows(resume_from):
+            search = arxiv.Search(
+                query=f"({base_query}) AND submittedDate:[{window_start:%Y%m%d%H%M} TO {window_end:%Y%m%d%H%M}]",
+                max_results=HISTORY_BACKFILL_MAX_PER_WINDOW,
+                sort_by=arxiv.SortCriterion.SubmittedDate,
+                sort_order=arxiv.SortOrder.Ascending
+            )
+            window_new = 0
+            while offset < HISTORY_BACKFILL_MAX_PER_WINDOW:
+                # 1ページ分（1リクエスト）ずつ取得し、保存と進捗の記録を1トランザクションで行う
+                page = service_policy('arxiv').call(
+                    lambda: list(itertools.islice(client.results(search, offset=offset), client.page_size)),
+                    retryable=arxiv_retryable
+                )
+                window_new += self._store(db, [ArxivSource.record(result) for result in page])
+                offset += len(page)
+                self._save_progress(db, window_start, offset)
+                if len(page) < client.page_size:
+                    break
+            else:
+                logger.warning("History backfill window truncated, use a smaller window", extra={
+                    'query': self.query,
+                    'window_start': window_start.isoformat(),
+                    'limit': HISTORY_BACKFILL_MAX_PER_WINDOW
+                })
+
+            self._save_progress(db, window_end, 0)
+            logger.info("History backfill window done", extra={
+                'query': self.query,
+                'window_start': window_start.isoformat(),
+                'fetched': offset,
+                'new': window_new
+            })
+            total_new += window_new
+            offset = 0
+        return total_new
+
+    @staticmethod
+    def _store(db, batch: List[PaperRecord]) -> int:
+        """未保存の論文だけをまとめて挿入して著者を対応付ける（コミットは進捗の保存と合わせて行う）"""
+        if not batch:
+            return 0
+        existing = {
+            base_id for (base_id,) in db.query(Paper.base_id).filter(
+                Paper.base_id.in_([p.base_id for p in batch])
+            )
+        }
+        new = []
+        seen = set()
+        for record in batch:
+            if record.base_id in existing or record.base_id in seen:
+                HISTORY_BACKFILL_PAPERS_TOTAL.inc(outcome='existing')
+                continue
+            seen.add(record.base_id)
+            new.append(record)
+        if new:
+            db.execute(insert(Paper), [record.row() for record in new])
+            AuthorIndex.link_records(db, new)
+            HISTORY_BACKFILL_PAPERS_TOTAL.inc(len(new), outcome='new')
+        return len(new)
+
+    def summarize(self, db, channel=None, budget: Optional[SummaryBudget] = None) -> Tuple[int, int]:
+        """期間内でキーワードに一致する要約のない論文を新しい順に要約し、(要約した件数, 残りの件数) を返す
+
+        要約は SummaryPool で並行して生成し、予算不足や失敗で要約できなかった時点で止める（もう一度実行すれば残りから続ける）。
+        トークン使用量は channel（省略時は HISTORY_BACKFILL_ACCOUNT）の分として記録する。
+        """
+        budget = budget or SummaryBudget()
+        account = channel or SimpleNamespace(slack_channel_id=HISTORY_BACKFILL_ACCOUNT)
+        keyword = Keyword(id=0, word=self.query)
+        papers = [
+            paper for paper in SubscriptionBackfill.local_matches(db, keyword, self.start)
+            if as_utc(paper.published_date) < self.end and not paper.summary
+        ]
+        summarized = 0
+        # 並行して要約し、新しい順に結果を確認する（失敗した時点で先読みした分は取り消す）
+        with SummaryPool(papers, lambda paper: (account.slack_channel_id, paper.id), budget) as pool:
+            for paper, pending in pool:
+                if 'openai' in unavailable_services() or pending.result() is None:
+                    break
+                summarized += 1
+        logger.info("History backfill summaries", extra={
+            'query': self.query,
+            'summarized': summarized,
+            'remaining': len(papers) - summarized
+        })
+        return summarized, len(papers) - summarized
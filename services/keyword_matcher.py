@@ -0,0 +1,110 @@
+# paper_harvester/services/keyword_matcher.py
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+import pytz
+from config import DEFAULT_DAYS_BACK, DEFAULT_MAX_RESULTS
+from models.database import Keyword, Paper, PaperDelivery, as_utc
+from services.relevance import RelevanceScorer
+from utils.aho_corasick import AhoCorasick
+from utils.keyword_query import keyword_query, match_patterns, evaluate, normalize_match_text, search_terms
+
+logger = logging.getLogger(__name__)
+
+class KeywordMatcher:
+    """全チャンネルのキーワードを論文のタイトル・アブストラクトに対して一括評価
+
+    キーワードに含まれる語句をまとめて1つのAho–Corasickオートマトンにし、
+    論文1件につきテキストを1回走査してから各キーワードの構文木を評価する。
+    """
+
+    def __init__(self, keywords: Iterable[Keyword]):
+        self._queries = {keyword.id: keyword_query(keyword.word) for keyword in keywords}
+        patterns = {
+            term: normalize_match_text(term).rstrip()  # 語の先頭で一致（複数形などの接尾辞は許容）
+            for query in self._queries.values()
+            for term in match_patterns(query)
+        }
+        self._automaton = AhoCorasick((pattern, term) for term, pattern in patterns.items())
+
+    def match(self, title: str, abstract: str, categories: str) -> Set[int]:
+        """論文に一致したキーワードのIDを返す"""
+        found = self._automaton.find(normalize_match_text(f"{title} {abstract}"))
+        category_set = set((categories or '').split())
+        return {
+            keyword_id for keyword_id, query in self._queries.items()
+            if evaluate(query, found, category_set)
+        }
+
+    @classmethod
+    def pending_papers(cls, db, channels) -> Dict[int, List[Tuple[Paper, Keyword]]]:
+        """保存済みの論文から、各チャンネルに未配信で一致する論文を関連度順に選ぶ"""
+        keywords = {keyword.id: keyword for channel in channels for keyword in channel.keywords}
+        if not keywords:
+            return {}
+
+        def days_back(channel):
+            return channel.config.days_back if channel.config else DEFAULT_DAYS_BACK
+
+        now = datetime.now(pytz.UTC)
+        cutoff = now - timedelta(days=max(days_back(channel) for channel in channels))
+        # 照合に必要な列だけを走査し、一致した論文だけをオブジェクトとして読み込む
+        rows = db.query(Paper.id, Paper.title, Paper.abstract, Paper.categories)\
+            .filter(Paper.published_date >= cutoff)
+        matcher = cls(keywords.values())
+        matched = {}
+        for paper_id, title, abstract, categories in rows:
+            keyword_ids = matcher.match(title, abstract, categories)
+            if keyword_ids:
+                matched[paper_id] = keyword_ids
+        papers = db.query(Paper)\
+            .filter(Paper.id.in_(matched))\
+            .order_by(Paper.published_date.desc())\
+            .all() if matched else []
+
+        # 配信済みの論文は期間内に配信されたものだけを確認すればよい
+        delivered = defaultdict(set)
+        for channel_id, paper_id in db.query(PaperDelivery.channel_id, PaperDelivery.paper_id)\
+                .filter(PaperDelivery.delivered_at >= cutoff):
+            delivered[channel_id].add(paper_id)
+
+        pending = {}
+        for channel in channels:
+            channel_cutoff = now - timedelta(days=days_back(channel))
+            channel_keyword_ids = [k.id for k in channel.keywords]
+            candidates = []
+            for paper in papers:
+                keyword_ids = matched.get(paper.id)
+                if not keyword_ids or paper.id in delivered[channel.id]:
+                    continue
+                if as_utc(paper.published_date) < channel_cutoff:
+                    continue
+                keyword_id = next((k for k in channel_keyword_ids if k in keyword_ids), None)
+                if keyword_id is None:
+                    continue
+                candidates.append({
+                    'title': paper.title,
+                    'abstract': paper.abstract,
+                    'paper': paper,
+                    'keyword': keywords[keyword_id]
+                })
+
+            terms = [term for k in channel.keywords for term in search_terms(keyword_query(k.word))]
+            # キーワードごとの検索と同じく、件数の上限はキーワード単位で適用する
+            max_results = channel.config.max_results if channel.config else DEFAULT_MAX_RESULTS
+            per_keyword = defaultdict(int)
+            selected = []
+            for candidate in RelevanceScorer.rank(candidates, terms):
+                keyword_id = candidate['keyword'].id
+                if per_keyword[keyword_id] < max_results:
+                    per_keyword[keyword_id] += 1
+                    selected.append((candidate['paper'], candidate['keyword']))
+            pending[channel.id] = selected
+            logger.info("Matched harvested papers", extra={
+                'channel_id': channel.slack_channel_id,
+                'matched': len(candidates),
+                'selected': len(selected)
+            })
+        return pending
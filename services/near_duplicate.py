@@ -0,0 +1,90 @@
+# paper_harvester/services/near_duplicate.py
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+from config import (
+    NEAR_DUPLICATE_NUM_PERM,
+    NEAR_DUPLICATE_BANDS,
+    NEAR_DUPLICATE_SHINGLE_SIZE,
+    NEAR_DUPLICATE_THRESHOLD
+)
+
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# 署名はDBに保存するため、ハッシュ関数のパラメータは固定シードで生成する
+_rng = np.random.RandomState(20240101)
+_PERM_A = _rng.randint(1, 1 << 31, size=NEAR_DUPLICATE_NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NEAR_DUPLICATE_NUM_PERM).astype(np.uint64)
+
+class NearDuplicateDetector:
+    """タイトルとアブストラクトのMinHash/LSHによる類似論文検出
+
+    再投稿や関連論文（companion paper）のように本文がほぼ同じ論文を、
+    要約やSlack投稿の前に検出するために使用する。
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                 bands: int = NEAR_DUPLICATE_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NEAR_DUPLICATE_NUM_PERM // bands
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+
+    @staticmethod
+    def signature(title: Optional[str], abstract: Optional[str]) -> np.ndarray:
+        """テキストのMinHash署名を計算"""
+        words = _WORD_PATTERN.findall(f"{title or ''} {abstract or ''}".lower())
+        size = NEAR_DUPLICATE_SHINGLE_SIZE
+        if len(words) < size:
+            shingles = {' '.join(words)}
+        else:
+            shingles = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # (a * x + b) mod p をハッシュ関数ごとに一括計算して最小値を取る
+        permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def from_bytes(data: Optional[bytes]) -> Optional[np.ndarray]:
+        """DBに保存された署名を復元（形式が異なる場合はNone）"""
+        if not data:
+            return None
+        signature = np.frombuffer(data, dtype=np.uint32)
+        if len(signature) != NEAR_DUPLICATE_NUM_PERM:
+            return None
+        return signature
+
+    def add(self, key: Hashable, signature: np.ndarray):
+        """署名をインデックスに登録"""
+        self._signatures[key] = signature
+        for band, bucket in enumerate(self._buckets):
+            start = band * self.rows
+            bucket[signature[start:start + self.rows].tobytes()].append(key)
+
+    def query(self, signature: np.ndarray) -> List[Hashable]:
+        """類似度がしきい値以上の登録済みキーを類似度順に返す"""
+        candidates = set()
+        for band, bucket in enumerate(self._buckets):
+            start = band * self.rows
+            candidates.update(bucket.get(signature[start:start + self.rows].tobytes(), ()))
+
+        matches = []
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= self.threshold:
+                matches.append((similarity, key))
+        return [key for _, key in sorted(matches, key=lambda m: m[0], reverse=True)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
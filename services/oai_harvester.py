@@ -0,0 +1,273 @@
+# paper_harvester/services/oai_harvester.py
+
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import pytz
+import requests
+from sqlalchemy import insert
+from config import (
+    OAI_PMH_URL,
+    OAI_PMH_DELAY_SECONDS,
+    HARVEST_CATEGORIES,
+    DEFAULT_DAYS_BACK
+)
+from models.database import Paper, HarvestCheckpoint
+from services.author_index import AuthorIndex
+from services.paper_sources import PaperRecord
+from utils.metrics import registry
+from utils.paper_keys import normalize_doi
+from utils.resilience import service_policy
+
+logger = logging.getLogger(__name__)
+
+OAI_REQUEST_SECONDS = registry.histogram(
+    'paper_harvester_oai_request_seconds',
+    'OAI-PMHの1ページ分の取得にかかった時間',
+    ['status']
+)
+OAI_RECORDS_TOTAL = registry.counter(
+    'paper_harvester_oai_records_total',
+    'OAI-PMHで取得したレコードの件数',
+    ['outcome']
+)
+
+_NS = {
+    'oai': 'http://www.openarchives.org/OAI/2.0/',
+    'arxiv': 'http://arxiv.org/OAI/arXiv/'
+}
+
+# OAI-PMHのセットが "physics:アーカイブ名" になる物理系のアーカイブ
+_PHYSICS_ARCHIVES = {
+    'astro-ph', 'cond-mat', 'gr-qc', 'hep-ex', 'hep-lat', 'hep-ph', 'hep-th',
+    'math-ph', 'nlin', 'nucl-ex', 'nucl-th', 'physics', 'quant-ph'
+}
+
+# 1回のクエリで既存判定するIDの数（SQLiteの変数上限を超えないように分割）
+_EXISTING_CHUNK = 500
+
+class OAIHarvestError(Exception):
+    """OAI-PMHのエラー応答"""
+
+def _is_retryable(error: Exception) -> bool:
+    """接続エラー・タイムアウト・5xx・429 は再試行する"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, requests.RequestException)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    value = response.headers.get('Retry-After') if response is not None else None
+    return float(value) if value and value.isdigit() else None
+
+class OAIHarvester:
+    """arXivのOAI-PMHからカテゴリ単位で新着論文の一覧を取得して保存する
+
+    リクエスト数はキーワード数ではなくカテゴリ（セット）数と新着件数で決まる。
+    セットごとに最後に取得した日付をチェックポイントとして保存し、次回はその日付から取得する。
+    """
+
+    def __init__(self, base_url: str = OAI_PMH_URL, delay_seconds: float = OAI_PMH_DELAY_SECONDS):
+        self.base_url = base_url
+        self.delay_seconds = delay_seconds
+        self._session = requests.Session()
+        self._last_request = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def set_spec(category: str) -> str:
+        """arXivカテゴリ（cs.CL など）を対応するOAI-PMHのセットに変換"""
+        archive = category.split('.', 1)[0]
+        if archive in _PHYSICS_ARCHIVES:
+            return f"physics:{archive}"
+        return archive
+
+    def _request(self, params: Dict[str, str]) -> ET.Element:
+        """1ページ分を取得（503 と Retry-After による流量制御に従い、arXivの障害時はすぐに諦める）"""
+        response = service_policy('arxiv').call(
+            lambda: self._get(params),
+            retryable=_is_retryable,
+            retry_after=_retry_after
+        )
+        return ET.fromstring(response.content)
+
+    def _get(self, params: Dict[str, str]) -> requests.Response:
+        with self._lock:
+            wait = self._last_request + self.delay_seconds - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = self._session.get(self.base_url, params=params, timeout=60)
+            if response.status_code == 503:
+                status = 'retry'
+                logger.info("OAI-PMH asked to retry", extra={'retry_after': response.headers.get('Retry-After')})
+            response.raise_for_status()
+            status = 'ok'
+            return response
+        finally:
+            OAI_REQUEST_SECONDS.observe(time.perf_counter() - started, status=status)
+
+    def list_records(self, set_spec: str, from_date: date, until_date: Optional[date] = None) -> Iterator[PaperRecord]:
+        """セット内で from_date 以降に追加・更新されたレコードを順に返す"""
+        params = {
+            'verb': 'ListRecords',
+            'metadataPrefix': 'arXiv',
+            'set': set_spec,
+            'from': from_date.isoformat()
+        }
+        if until_date:
+            params['until'] = until_date.isoformat()
+
+        while True:
+            root = self._request(params)
+            error = root.find('oai:error', _NS)
+            if error is not None:
+                if error.get('code') == 'noRecordsMatch':
+                    return
+                raise OAIHarvestError(f"{error.get('code')}: {(error.text or '').strip()}")
+
+            list_records = root.find('oai:ListRecords', _NS)
+            if list_records is None:
+                return
+            for record in list_records.findall('oai:record', _NS):
+                paper = self._parse_record(record)
+                if paper:
+                    yield paper
+                else:
+                    OAI_RECORDS_TOTAL.inc(outcome='deleted')
+
+            # 続きがある場合はレジュメーショントークンだけを指定して次のページを取得
+            token = list_records.find('oai:resumptionToken', _NS)
+            if token is None or not (token.text or '').strip():
+                return
+            params = {'verb': 'ListRecords', 'resumptionToken': token.text.strip()}
+
+    @staticmethod
+    def _parse_record(record: ET.Element) -> Optional[PaperRecord]:
+        """arXivメタデータ形式のレコードを論文情報に変換（削除済みは None）"""
+        header = record.find('oai:header', _NS)
+        if header is not None and header.get('status') == 'deleted':
+            return None
+        metadata = record.find('oai:metadata/arxiv:arXiv', _NS)
+        if metadata is None:
+            return None
+
+        def text(path: str) -> str:
+            return ' '.join((metadata.findtext(path, default='', namespaces=_NS) or '').split())
+
+        authors = []
+        for author in metadata.findall('arxiv:authors/arxiv:author', _NS):
+            name = ' '.join(filter(None, (
+                author.findtext('arxiv:forenames', default='', namespaces=_NS),
+                author.findtext('arxiv:keyname', default='', namespaces=_NS),
+                author.findtext('arxiv:suffix', default='', namespaces=_NS)
+            )))
+            authors.append(' '.join(name.split()))
+
+        arxiv_id = text('arxiv:id')
+        created = datetime.strptime(text('arxiv:created'), '%Y-%m-%d').replace(tzinfo=pytz.UTC)
+        return PaperRecord(
+            arxiv_id=arxiv_id,
+            base_id=arxiv_id,
+            version=None,
+            title=text('arxiv:title'),
+            authors=tuple(authors),
+            abstract=(metadata.findtext('arxiv:abstract', default='', namespaces=_NS) or '').strip(),
+            url=f"https://arxiv.org/pdf/{arxiv_id}",
+            published_date=created,
+            categories=text('arxiv:categories'),
+            doi=normalize_doi(text('arxiv:doi')),
+            source='arxiv'
+        )
+
+    @staticmethod
+    def in_categories(paper_categories: str, categories: List[str]) -> bool:
+        """論文のカテゴリが対象カテゴリ（アーカイブ指定を含む）のいずれかに該当するか"""
+        for category in paper_categories.split():
+            for target in categories:
+                if category == target or ('.' not in target and category.startswith(target + '.')):
+                    return True
+        return False
+
+    def harvest(self, db, categories: Optional[List[str]] = None, from_date: Optional[date] = None) -> int:
+        """対象カテゴリの新着論文を取得して papers テーブルに保存し、新規件数を返す"""
+        categories = categories or HARVEST_CATEGORIES
+        by_set = defaultdict(list)
+        for category in categories:
+            by_set[self.set_spec(category)].append(category)
+
+        # 一覧の取得開始時点までに公開された論文は取得済みとみなす
+        harvested_at = datetime.now(pytz.UTC)
+        until_date = harvested_at.date()
+        total_new = 0
+        for set_spec, set_categories in by_set.items():
+            checkpoint_name = f"oai:{set_spec}"
+            checkpoint = db.query(HarvestCheckpoint).filter_by(name=checkpoint_name).first()
+            start = from_date
+            if start is None and checkpoint and checkpoint.cursor:
+                start = date.fromisoformat(checkpoint.cursor)
+            if start is None:
+                start = until_date - timedelta(days=DEFAULT_DAYS_BACK)
+
+            logger.info("Harvesting OAI-PMH set", extra={
+                'set': set_spec,
+                'from': start.isoformat(),
+                'categories': ','.join(set_categories)
+            })
+            batch = []
+            new_count = 0
+            for paper in self.list_records(set_spec, start):
+                if not self.in_categories(paper.categories, set_categories):
+                    OAI_RECORDS_TOTAL.inc(outcome='filtered')
+                    continue
+                batch.append(paper)
+                if len(batch) >= _EXISTING_CHUNK:
+                    new_count += self._store(db, batch)
+                    batch = []
+            new_count += self._store(db, batch)
+
+            # 一覧を最後まで取得できたセットだけ次回の開始日を進める
+            if checkpoint is None:
+                checkpoint = HarvestCheckpoint(name=checkpoint_name)
+                db.add(checkpoint)
+            checkpoint.cursor = until_date.isoformat()
+            checkpoint.extend_coverage(
+                datetime(start.year, start.month, start.day, tzinfo=pytz.UTC),
+                harvested_at
+            )
+            db.commit()
+            logger.info("Harvested OAI-PMH set", extra={'set': set_spec, 'new': new_count})
+            total_new += new_count
+        return total_new
+
+    @staticmethod
+    def _store(db, batch: List[PaperRecord]) -> int:
+        """未保存の論文だけをまとめて挿入し、著者を対応付ける"""
+        if not batch:
+            return 0
+        existing = {
+            base_id for (base_id,) in db.query(Paper.base_id).filter(
+                Paper.base_id.in_([p.base_id for p in batch])
+            )
+        }
+        new = []
+        seen = set()
+        for paper in batch:
+            if paper.base_id in existing or paper.base_id in seen:
+                OAI_RECORDS_TOTAL.inc(outcome='existing')
+                continue
+            seen.add(paper.base_id)
+            new.append(paper)
+        if new:
+            db.execute(insert(Paper), [paper.row() for paper in new])
+            AuthorIndex.link_records(db, new)
+            OAI_RECORDS_TOTAL.inc(len(new), outcome='new')
+        return len(new)
@@ -1,43 +1,188 @@
 # paper_harvester/services/openai_service.py
 
+import logging
+import openai
 from openai import OpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_PARAMS
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_MODEL,
+    OPENAI_PARAMS,
+    OPENAI_RPM_LIMIT,
+    OPENAI_TPM_LIMIT,
+    OPENAI_MAX_CONCURRENCY,
+    SUMMARY_COMPLETION_TOKENS
+)
 from services.paper_processor import PaperProcessor
 import time
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional, Tuple
+from utils.metrics import registry
+from utils.rate_limiter import RateLimiter
+from utils.resilience import service_policy, CircuitOpenError
+
+OPENAI_REQUEST_SECONDS = registry.histogram(
+    'paper_harvester_openai_request_seconds',
+    'OpenAIによる要約生成の所要時間',
+    ['status']
+)
+OPENAI_TOKENS_TOTAL = registry.counter(
+    'paper_harvester_openai_tokens_total',
+    'OpenAI APIで消費したトークン数',
+    ['type']
+)
+OPENAI_FIRST_TOKEN_SECONDS = registry.histogram(
+    'paper_harvester_openai_first_token_seconds',
+    'ストリーミングでの要約生成で最初のテキストが届くまでの時間'
+)
+
+logger = logging.getLogger(__name__)
+
+# プロセス内のすべての要約（定期チェック・/paper_check_now・過去分の要約）で共有する
+rate_limiter = RateLimiter('openai', OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, OPENAI_MAX_CONCURRENCY)
+
+# システムプロンプトとメッセージの書式の分
+MESSAGE_OVERHEAD_TOKENS = 100
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（英数字は約4文字、日本語は約1文字で1トークン）"""
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+def _is_retryable(error: Exception) -> bool:
+    """接続エラー・タイムアウト・レート制限・5xx は再試行する"""
+    return isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
 
 class OpenAIService:
     def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        # 再試行はクライアントでは行わず、service_policy('openai') に任せる
+        self.client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
 
     def generate_summary(self, paper_info: Dict[str, Any]) -> Optional[str]:
         """論文の要約を生成"""
-        print(f"Generating summary for paper: {paper_info['title'][:50]}...")
+        summary, _, _ = self.summarize(paper_info)
+        return summary or f"要約の生成に失敗しました。\n論文タイトル: {paper_info['title']}"
+
+    def summarize(self, paper_info: Dict[str, Any], mode: str = 'full',
+                  on_delta: Optional[Callable[[str], None]] = None) -> Tuple[Optional[str], int, int]:
+        """論文の要約を生成し、(要約, 入力トークン数, 出力トークン数) を返す（失敗時の要約は None）
+
+        mode が 'short' の場合は短いプロンプトを使い、出力トークン数にも上限を設ける。
+        on_delta を指定した場合はストリーミングで受信し、受信済みのテキスト全体を受信のたびに渡す。
+        """
+        logger.debug("Generating summary", extra={'title': paper_info['title'][:50], 'mode': mode})
+        started = time.perf_counter()
+        status = 'error'
         try:
-            prompt = self._create_summary_prompt(paper_info)
+            prompt = self.create_prompt(paper_info, mode)
+            params = dict(OPENAI_PARAMS)
+            if mode == 'short':
+                params['max_tokens'] = SUMMARY_COMPLETION_TOKENS['short']
+            if on_delta:
+                params.update(stream=True, stream_options={'include_usage': True})
+            messages = [
+                {
+                    "role": "system",
+                    "content": "あなたは研究論文を深く理解し、技術的な詳細を分かりやすく解説する専門家です。"
+                            "論文の全体像を把握し、重要なポイントを簡潔かつ正確に説明してください。"
+                },
+                {"role": "user", "content": prompt}
+            ]
             
-            response = self.client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "あなたは研究論文を深く理解し、技術的な詳細を分かりやすく解説する専門家です。"
-                                "論文の全体像を把握し、重要なポイントを簡潔かつ正確に説明してください。"
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                **OPENAI_PARAMS
+            # 出力の上限を指定しない場合は見込みの出力トークン数で枠を確保し、応答の使用量で置き換える
+            estimate = estimate_tokens(prompt) + MESSAGE_OVERHEAD_TOKENS + \
+                params.get('max_tokens', SUMMARY_COMPLETION_TOKENS[mode])
+
+            def request():
+                with rate_limiter.reserve(estimate) as reservation:
+                    try:
+                        response = self.client.chat.completions.create(model=OPENAI_MODEL, messages=messages, **params)
+                        if on_delta:
+                            result = self._consume_stream(response, on_delta, started)
+                        else:
+                            result = response.choices[0].message.content, response.usage
+                    except openai.RateLimitError as e:
+                        # 他のスレッドの送信も止めて、上限が回復するのを待つ
+                        rate_limiter.pause(_retry_after(e) or 1.0)
+                        raise
+                    usage = result[1]
+                    reservation.settle(usage.prompt_tokens + usage.completion_tokens if usage else None)
+                    return result
+
+            content, usage = service_policy('openai').call(
+                request,
+                retryable=_is_retryable,
+                retry_after=_retry_after
             )
             
-            summary = response.choices[0].message.content.strip()
-            print("Summary generated successfully")
-            return summary
-
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            import traceback
-            print(traceback.format_exc())
-            return f"要約の生成に失敗しました。\n論文タイトル: {paper_info['title']}"
+            prompt_tokens = completion_tokens = 0
+            if usage:
+                prompt_tokens = usage.prompt_tokens
+                completion_tokens = usage.completion_tokens
+                OPENAI_TOKENS_TOTAL.inc(prompt_tokens, type='prompt')
+                OPENAI_TOKENS_TOTAL.inc(completion_tokens, type='completion')
+            
+            summary = content.strip()
+            logger.debug("Summary generated", extra={'chars': len(summary)})
+            status = 'ok'
+            return summary, prompt_tokens, completion_tokens
+
+        except CircuitOpenError as e:
+            status = 'rejected'
+            logger.warning("OpenAI unavailable, skipping summary", extra={'title': paper_info['title'][:50], 'retry_in': round(e.retry_in)})
+            return None, 0, 0
+        except Exception:
+            logger.exception("Error generating summary", extra={'title': paper_info['title'][:50]})
+            return None, 0, 0
+        finally:
+            OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - started, status=status)
+
+    @staticmethod
+    def _consume_stream(stream, on_delta: Callable[[str], None], started: float) -> Tuple[str, Any]:
+        """ストリームを最後まで読み、(本文, 使用量) を返す（使用量は最後のチャンクで届く）"""
+        parts = []
+        usage = None
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if not parts:
+                OPENAI_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+            parts.append(delta)
+            on_delta(''.join(parts))
+        return ''.join(parts), usage
+
+    def create_prompt(self, paper_info: Dict[str, Any], mode: str = 'full') -> str:
+        """要約の種類に応じたプロンプトを作成"""
+        if mode == 'short':
+            return self._create_short_summary_prompt(paper_info)
+        return self._create_summary_prompt(paper_info)
+
+    def _create_short_summary_prompt(self, paper_info: Dict[str, Any]) -> str:
+        """トークン予算が少ないときの短い要約用のプロンプトを作成（アブストラクトのみを使用）"""
+        return f"""以下の論文のアブストラクトを、日本語で3行程度に要約してください。
+
+        タイトル: {paper_info['title']}
+        
+        アブストラクト:
+        {paper_info['abstract']}
+
+        以下の形式で出力してください：
+
+        📌 *研究の要点*
+        • 目的：
+        • 提案手法：
+        • 主な結果：
+        """
 
     def _create_summary_prompt(self, paper_info: Dict[str, Any]) -> str:
         """要約生成用のプロンプトを作成"""
@@ -1,21 +1,26 @@
 # paper_harvester/services/paper_processor.py
 
-import arxiv
+import logging
 import PyPDF2
 import io
 import requests
-from urllib.parse import urlparse
 from typing import Dict, Any, Optional
-from config import PDF_DOWNLOAD_TIMEOUT, PDF_MAX_PAGES, DEFAULT_DAYS_BACK, DEFAULT_MAX_RESULTS
+from config import PDF_MAX_PAGES, DEFAULT_DAYS_BACK, DEFAULT_MAX_RESULTS
 import time
 from models.database import Channel, Keyword, ChannelConfig
+from utils.metrics import registry
+from services.run_tracer import trace_span
+from utils.keyword_query import canonicalize
 
-class PaperProcessor:
-    @staticmethod
-    def is_arxiv_paper(url: str) -> bool:
-        """URLがarXivのものかチェック"""
-        return 'arxiv.org' in url.lower()
+PAPER_CONTENT_SECONDS = registry.histogram(
+    'paper_harvester_paper_content_seconds',
+    '論文本文の取得（メタデータ取得・PDFダウンロード・テキスト抽出）の所要時間',
+    ['source']
+)
 
+logger = logging.getLogger(__name__)
+
+class PaperProcessor:
     @staticmethod
     def check_paper_accessibility(url: str) -> bool:
         """論文のアクセス可能性をチェック"""
@@ -23,7 +28,7 @@ class PaperProcessor:
             response = requests.head(url, timeout=5)
             return response.status_code == 200
         except Exception as e:
-            print(f"Error checking accessibility for {url}: {e}")
+            logger.warning("Error checking accessibility", extra={'url': url, 'error': str(e)})
             return False
 
     @staticmethod
@@ -35,7 +40,7 @@ class PaperProcessor:
             # ページ数制限の確認
             num_pages = len(reader.pages)
             if num_pages > PDF_MAX_PAGES:
-                print(f"Warning: PDF has {num_pages} pages, limiting to {PDF_MAX_PAGES}")
+                logger.warning("PDF page limit exceeded", extra={'pages': num_pages, 'limit': PDF_MAX_PAGES})
                 num_pages = PDF_MAX_PAGES
             
             # テキスト抽出
@@ -47,87 +52,32 @@ class PaperProcessor:
                     if text.strip():  # 空のページをスキップ
                         full_text.append(text)
                 except Exception as e:
-                    print(f"Error extracting text from page {i}: {e}")
+                    logger.warning("Error extracting text from page", extra={'page': i, 'error': str(e)})
                     continue
             
             return "\n".join(full_text) if full_text else None
             
-        except Exception as e:
-            print(f"Error processing PDF: {e}")
+        except Exception:
+            logger.exception("Error processing PDF")
             return None
 
     @classmethod
-    def get_paper_content(cls, arxiv_id: str) -> Optional[Dict[str, Any]]:
-        """論文の内容を取得（arXivの論文のみ）"""
+    def get_paper_content(cls, paper_id: str, source: str = 'arxiv') -> Optional[Dict[str, Any]]:
+        """論文の内容を取得（取得方法は論文ソースのアダプターに任せる）"""
+        from services.paper_sources import get_source
+
+        started = time.perf_counter()
+        content = None
         try:
-            print(f"Fetching paper content for arXiv ID: {arxiv_id}")
-            
-            # arXivから論文情報を取得
-            client = arxiv.Client()
-            search = arxiv.Search(id_list=[arxiv_id])
-            paper = next(client.results(search))
-            
-            # arXivの論文かチェック
-            if not cls.is_arxiv_paper(paper.pdf_url):
-                print(f"Skipping non-arXiv paper: {paper.title}")
-                return None
-            
-            # アクセス可能性をチェック
-            if not cls.check_paper_accessibility(paper.pdf_url):
-                print(f"Paper is not accessible: {paper.title}")
-                return {
-                    'title': paper.title,
-                    'authors': [author.name for author in paper.authors],
-                    'abstract': paper.summary,
-                    'full_text': None,
-                    'pdf_url': paper.pdf_url,
-                    'source': 'arxiv_abstract_only'
-                }
-            
-            try:
-                # PDFをダウンロード
-                print("Downloading PDF...")
-                response = requests.get(paper.pdf_url, timeout=PDF_DOWNLOAD_TIMEOUT)
-                if response.status_code != 200:
-                    raise Exception(f"Failed to download PDF: {response.status_code}")
-                
-                # テキスト抽出
-                print("Extracting text from PDF...")
-                full_text = cls.extract_text_from_pdf(response.content)
-                
-                if full_text:
-                    print("Successfully extracted text from PDF")
-                    source_type = 'arxiv_full_text'
-                else:
-                    print("Failed to extract text from PDF, using abstract only")
-                    full_text = paper.summary
-                    source_type = 'arxiv_abstract_only'
-                
-                return {
-                    'title': paper.title,
-                    'authors': [author.name for author in paper.authors],
-                    'abstract': paper.summary,
-                    'full_text': full_text,
-                    'pdf_url': paper.pdf_url,
-                    'source': source_type
-                }
-                
-            except Exception as e:
-                print(f"Error processing PDF for {paper.title}: {e}")
-                return {
-                    'title': paper.title,
-                    'authors': [author.name for author in paper.authors],
-                    'abstract': paper.summary,
-                    'full_text': paper.summary,
-                    'pdf_url': paper.pdf_url,
-                    'source': 'arxiv_abstract_only'
-                }
-                
-        except Exception as e:
-            print(f"Error accessing paper: {e}")
-            import traceback
-            print(traceback.format_exc())
+            with trace_span('paper_content', source=source, paper_id=paper_id):
+                logger.debug("Fetching paper content", extra={'source': source, 'paper_id': paper_id})
+                content = get_source(source).fetch_full_text(paper_id)
+            return content
+        except Exception:
+            logger.exception("Error accessing paper", extra={'source': source, 'paper_id': paper_id})
             return None
+        finally:
+            PAPER_CONTENT_SECONDS.observe(time.perf_counter() - started, source=content['source'] if content else 'error')
 
     @staticmethod
     def clean_text(text: str) -> str:
@@ -141,43 +91,50 @@ class PaperProcessor:
         
         return text.strip()
 
+    @staticmethod
+    def get_or_create_channel(db, channel_id):
+        """チャンネルの取得または作成"""
+        channel = db.query(Channel).filter_by(slack_channel_id=channel_id).first()
+        if not channel:
+            logger.info("Creating new channel", extra={'channel_id': channel_id})
+            channel = Channel(
+                slack_channel_id=channel_id,
+                name=channel_id
+            )
+            db.add(channel)
+            channel.config = ChannelConfig(
+                days_back=DEFAULT_DAYS_BACK,
+                max_results=DEFAULT_MAX_RESULTS
+            )
+            db.commit()
+        return channel
+
     @staticmethod
     def setup_keywords(db, channel_id, keyword_text):
         """キーワードを設定"""
         try:
-            # チャンネルの取得または作成
-            channel = db.query(Channel).filter_by(slack_channel_id=channel_id).first()
-            if not channel:
-                print(f"Creating new channel: {channel_id}")
-                channel = Channel(
-                    slack_channel_id=channel_id,
-                    name=channel_id
-                )
-                db.add(channel)
-                channel.config = ChannelConfig(
-                    days_back=DEFAULT_DAYS_BACK,
-                    max_results=DEFAULT_MAX_RESULTS
-                )
-                db.commit()
+            channel = PaperProcessor.get_or_create_channel(db, channel_id)
             
-            # キーワードの取得または作成
-            keyword = db.query(Keyword).filter_by(word=keyword_text).first()
+            # キーワードの取得または作成（正規形が同じキーワードは同じものとして扱う）
+            canonical = canonicalize(keyword_text)
+            keyword = db.query(Keyword).filter(
+                (Keyword.canonical == canonical) | (Keyword.word == keyword_text)
+            ).first()
             if not keyword:
-                print(f"Creating new keyword: {keyword_text}")
-                keyword = Keyword(word=keyword_text)
+                logger.info("Creating new keyword", extra={'keyword': keyword_text, 'canonical': canonical})
+                keyword = Keyword(word=keyword_text, canonical=canonical)
                 db.add(keyword)
             
             # キーワードをチャンネルに関連付け
             if keyword not in channel.keywords:
                 channel.keywords.append(keyword)
-                print(f"Adding keyword '{keyword_text}' to channel")
+                logger.info("Adding keyword to channel", extra={'channel_id': channel_id, 'keyword': keyword_text})
             
             db.commit()
-            print("Changes committed successfully")
+            if keyword.word != keyword_text:
+                return f"キーワード「{keyword_text}」を登録しました（「{keyword.word}」と同じ条件として扱います）。"
             return f"キーワード「{keyword_text}」を登録しました。"
             
-        except Exception as e:
-            print(f"Error in setup_keywords: {e}")
-            import traceback
-            print(traceback.format_exc())
+        except Exception:
+            logger.exception("Error in setup_keywords", extra={'channel_id': channel_id, 'keyword': keyword_text})
             return None
\ No newline at end of file
@@ -0,0 +1,355 @@
+# paper_harvester/services/paper_sources.py
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+import arxiv
+import requests
+from config import PAPER_SOURCES, PAPER_SOURCE_DELAYS, PDF_DOWNLOAD_TIMEOUT
+from services.arxiv_client import get_arxiv_client, is_retryable as arxiv_retryable
+from utils.arxiv_id import parse_arxiv_id, format_arxiv_id
+from utils.keyword_query import keyword_query, to_arxiv_query
+from utils.metrics import registry
+from utils.paper_keys import normalize_doi, title_key
+from utils.resilience import service_policy, CircuitOpenError
+
+SOURCE_SEARCH_SECONDS = registry.histogram(
+    'paper_harvester_source_search_seconds',
+    'ソースごとの検索（結果の取得を含む）の所要時間',
+    ['source', 'status']
+)
+SOURCE_RESULTS_TOTAL = registry.counter(
+    'paper_harvester_source_results_total',
+    'ソースごとの検索結果の件数（duplicate: 先に取得したソースの論文とDOIまたはタイトルが一致）',
+    ['source', 'outcome']
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 検索結果を後段の処理に渡すまで溜めておく件数の上限（ソースのスレッドはこれを超えると待つ）
+_STREAM_BUFFER = 200
+
+@dataclass(frozen=True, slots=True)
+class PaperRecord:
+    """ソースから取得した論文（papers テーブルに保存する前の、変更できない軽量な表現）
+
+    arXiv以外のソースでは arxiv_id・base_id に "<ソース名>:<ソース内のID>" を入れる。
+    """
+    arxiv_id: str
+    base_id: str
+    version: Optional[int]
+    title: str
+    authors: Tuple[str, ...]
+    abstract: str
+    url: str
+    published_date: datetime
+    categories: str = ''
+    doi: Optional[str] = None
+    source: str = 'arxiv'
+
+    def row(self) -> Dict[str, Any]:
+        """papers テーブルの列の辞書（著者はここで初めて連結する）"""
+        return {
+            'arxiv_id': self.arxiv_id,
+            'base_id': self.base_id,
+            'version': self.version,
+            'title': self.title,
+            'authors': ', '.join(self.authors),
+            'abstract': self.abstract,
+            'url': self.url,
+            'published_date': self.published_date,
+            'categories': self.categories,
+            'doi': self.doi,
+            'source': self.source
+        }
+
+class PaperSource:
+    """論文ソースのアダプター（検索・メタデータ取得・本文取得）
+
+    検索結果とメタデータは PaperRecord で返す。検索はページ単位で取得しながら1件ずつ返すジェネレーターにする。
+    リクエストは request() を通し、ソースごとの間隔（PAPER_SOURCE_DELAYS）とサーキットブレーカーに従う。
+    接続先はソースごとの設定で変えられるので、記録したレスポンスを返すローカルのスタブに向けて動作を確認できる。
+    """
+
+    name = ''
+    default_delay_seconds = 1.0
+
+    def __init__(self):
+        self.delay_seconds = PAPER_SOURCE_DELAYS.get(self.name, self.default_delay_seconds)
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+
+    def search(self, keyword: str, max_results: int,
+               start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Iterator[PaperRecord]:
+        """キーワードに一致する論文を新しい順に返す（start_date を指定した場合はその期間だけ）"""
+        raise NotImplementedError
+
+    def fetch_metadata(self, paper_id: str) -> Optional[PaperRecord]:
+        """IDを指定して論文のメタデータを取得（見つからない場合は None）"""
+        raise NotImplementedError
+
+    def fetch_full_text(self, paper_id: str) -> Optional[Dict[str, Any]]:
+        """論文のメタデータとPDFの本文を取得（PDFを読めない場合はアブストラクトで代用する）"""
+        from services.paper_processor import PaperProcessor
+
+        metadata = self.fetch_metadata(paper_id)
+        if metadata is None:
+            return None
+        content = {
+            'title': metadata.title,
+            'authors': list(metadata.authors),
+            'abstract': metadata.abstract,
+            'full_text': None,
+            'pdf_url': metadata.url,
+            'source': f"{self.name}_abstract_only"
+        }
+        if not PaperProcessor.check_paper_accessibility(metadata.url):
+            logger.warning("Paper is not accessible", extra={'source': self.name, 'paper_id': paper_id, 'pdf_url': metadata.url})
+            return content
+
+        try:
+            logger.debug("Downloading PDF", extra={'source': self.name, 'paper_id': paper_id})
+            response = self.request(lambda: requests.get(metadata.url, timeout=PDF_DOWNLOAD_TIMEOUT))
+            if response.status_code != 200:
+                raise Exception(f"Failed to download PDF: {response.status_code}")
+            full_text = PaperProcessor.extract_text_from_pdf(response.content)
+        except Exception:
+            logger.exception("Error processing PDF", extra={'source': self.name, 'paper_id': paper_id})
+            full_text = None
+
+        if full_text:
+            logger.debug("Extracted text from PDF", extra={'source': self.name, 'paper_id': paper_id, 'chars': len(full_text)})
+            content.update(full_text=full_text, source=f"{self.name}_full_text")
+        else:
+            logger.warning("Failed to extract text from PDF, using abstract only", extra={'source': self.name, 'paper_id': paper_id})
+            content['full_text'] = metadata.abstract
+        return content
+
+    def is_retryable(self, error: Exception) -> bool:
+        """一時的な障害か（4xx は 429 以外は再試行しない）"""
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return True
+
+    def request(self, func: Callable[[], T]) -> T:
+        """ソースのリクエスト間隔を空けてから、サービスの方針（service_policy）に従って呼び出す"""
+        def paced():
+            with self._lock:
+                wait = self._last_request + self.delay_seconds - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._last_request = time.monotonic()
+            return func()
+        return service_policy(self.name).call(paced, retryable=self.is_retryable)
+
+class ArxivSource(PaperSource):
+    """arXiv API（リクエスト間隔は共通のarXivクライアントが ARXIV_DELAY_SECONDS で守る）"""
+
+    name = 'arxiv'
+    default_delay_seconds = 0.0
+
+    def search(self, keyword: str, max_results: int,
+               start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Iterator[PaperRecord]:
+        # キーワードの構文木からarXivの検索式を生成（等価なキーワードは同じ検索式になる）
+        search_query = to_arxiv_query(keyword_query(keyword))
+        if start_date is not None:
+            search_query = (f"({search_query}) AND submittedDate:"
+                            f"[{start_date:%Y%m%d%H%M} TO {end_date:%Y%m%d%H%M}]")
+        logger.debug("Searching arXiv", extra={'keyword': keyword, 'query': search_query})
+        client = get_arxiv_client()
+        search = arxiv.Search(
+            query=search_query,
+            max_results=max_results,
+            sort_by=arxiv.SortCriterion.SubmittedDate,
+            sort_order=arxiv.SortOrder.Descending
+        )
+        offset = 0
+        while offset < max_results:
+            # 1ページ分（1リクエスト）ずつ取得し、次のページは必要になってから取得する
+            page = self.request(
+                lambda: list(itertools.islice(client.results(search, offset=offset), client.page_size))
+            )
+            for result in page:
+                yield self.record(result)
+            offset += len(page)
+            if len(page) < client.page_size:
+                return
+
+    def fetch_metadata(self, paper_id: str) -> Optional[PaperRecord]:
+        search = arxiv.Search(id_list=[paper_id])
+        result = self.request(lambda: next(get_arxiv_client().results(search), None))
+        return self.record(result) if result is not None else None
+
+    def is_retryable(self, error: Exception) -> bool:
+        return arxiv_retryable(error)
+
+    @staticmethod
+    def record(result: arxiv.Result) -> PaperRecord:
+        """arXiv APIの検索結果を PaperRecord に変換"""
+        base_id, version = parse_arxiv_id(result.entry_id)
+        return PaperRecord(
+            arxiv_id=format_arxiv_id(base_id, version),
+            base_id=base_id,
+            version=version,
+            title=result.title,
+            authors=tuple(author.name for author in result.authors),
+            abstract=result.summary,
+            url=result.pdf_url,
+            published_date=result.published,
+            categories=' '.join(result.categories),
+            doi=normalize_doi(result.doi),
+            source='arxiv'
+        )
+
+# ソース名 → アダプター（bioRxiv・ACL Anthology・Semantic Scholar などはここに追加する）
+SOURCE_TYPES: Dict[str, type] = {
+    'arxiv': ArxivSource,
+}
+
+_sources: Dict[str, PaperSource] = {}
+_sources_lock = threading.Lock()
+
+def get_source(name: str) -> PaperSource:
+    """プロセス内で共有されるアダプター（リクエスト間隔はソースごとに共有される）"""
+    with _sources_lock:
+        if name not in _sources:
+            if name not in SOURCE_TYPES:
+                raise ValueError(f"unknown paper source: {name}")
+            _sources[name] = SOURCE_TYPES[name]()
+        return _sources[name]
+
+def enabled_sources() -> List[PaperSource]:
+    """PAPER_SOURCES に書いた順の有効なソース（未知のソース名は警告して無視する）"""
+    sources = []
+    for name in PAPER_SOURCES:
+        if name in SOURCE_TYPES:
+            sources.append(get_source(name))
+        else:
+            logger.warning("Unknown paper source, ignoring", extra={'source': name})
+    return sources
+
+class Deduplicator:
+    """DOI・ID、または別のソースで出た正規化したタイトルが既に出た論文かを判定する（キーだけを保持する）
+
+    同じソースの中ではタイトルが同じでも別の論文として扱い、IDかDOIが一致する場合だけ重複とみなす。
+    """
+
+    def __init__(self):
+        self._dois: Set[str] = set()
+        self._ids: Set[str] = set()
+        self._titles: Dict[str, Set[str]] = {}
+
+    def seen(self, record: PaperRecord) -> bool:
+        """既出なら True、初出ならキーを記録して False"""
+        key = title_key(record.title)
+        sources = self._titles.get(key, ()) if key else ()
+        if (record.doi and record.doi in self._dois) or record.base_id in self._ids \
+                or any(source != record.source for source in sources):
+            return True
+        if record.doi:
+            self._dois.add(record.doi)
+        self._ids.add(record.base_id)
+        if key:
+            self._titles.setdefault(key, set()).add(record.source)
+        return False
+
+class SourceStream:
+    """有効なソースの検索結果を、届いた順に重複を除いて返すイテレーター
+
+    ソースごとのスレッドがページを取得してキュー（上限 _STREAM_BUFFER 件）に入れ、呼び出し側は
+    取得を待たずに届いた論文から処理できる。DOI・ID、または別のソースの論文とタイトルが一致する論文は先に届いたものを残す。
+    途中で読むのをやめる場合は close() で残りの取得を止める。failed は読み終えた後に失敗したソース名を持つ。
+    """
+
+    _DONE = object()
+
+    def __init__(self, sources: List[PaperSource], keyword: str, max_results: int,
+                 start_date: Optional[datetime], end_date: Optional[datetime]):
+        self.sources = sources
+        self.failed: List[str] = []
+        self._queue: queue.Queue = queue.Queue(maxsize=_STREAM_BUFFER)
+        self._stopped = threading.Event()
+        self._threads = [
+            threading.Thread(
+                target=self._produce,
+                args=(source, keyword, max_results, start_date, end_date),
+                name=f"paper-source-{source.name}",
+                daemon=True
+            )
+            for source in sources
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, source: PaperSource, keyword: str, max_results: int,
+                 start_date: Optional[datetime], end_date: Optional[datetime]):
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            for record in source.search(keyword, max_results, start_date, end_date):
+                if not self._put(record):
+                    status = 'closed'
+                    return
+            status = 'ok'
+        except CircuitOpenError as e:
+            status = 'rejected'
+            logger.warning("Paper source unavailable, skipping search", extra={
+                'source': source.name,
+                'keyword': keyword,
+                'retry_in': round(e.retry_in)
+            })
+        except Exception:
+            logger.exception("Error searching paper source", extra={'source': source.name, 'keyword': keyword})
+        finally:
+            if status in ('rejected', 'error'):
+                self.failed.append(source.name)
+            SOURCE_SEARCH_SECONDS.observe(time.perf_counter() - started, source=source.name, status=status)
+            self._put(self._DONE)
+
+    def __iter__(self) -> Iterator[PaperRecord]:
+        dedup = Deduplicator()
+        remaining = len(self._threads)
+        try:
+            while remaining:
+                item = self._queue.get()
+                if item is self._DONE:
+                    remaining -= 1
+                    continue
+                if dedup.seen(item):
+                    SOURCE_RESULTS_TOTAL.inc(source=item.source, outcome='duplicate')
+                    continue
+                SOURCE_RESULTS_TOTAL.inc(source=item.source, outcome='unique')
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """残りの取得を止める（取得中のページは捨てる）"""
+        self._stopped.set()
+
+class SourceFanout:
+    """有効なすべてのソースを並列に検索し、DOIとタイトルで重複を除いた1つのストリームにまとめる"""
+
+    def __init__(self, sources: Optional[List[PaperSource]] = None):
+        self.sources = sources if sources is not None else enabled_sources()
+
+    def search(self, keyword: str, max_results: int,
+               start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> SourceStream:
+        """検索を始め、結果を届いた順に返すストリームを返す"""
+        return SourceStream(self.sources, keyword, max_results, start_date, end_date)
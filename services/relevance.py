@@ -0,0 +1,159 @@
+# paper_harvester/services/relevance.py
+
+import re
+from typing import List, Dict, Any, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+from config import RELEVANCE_TITLE_WEIGHT, RELEVANCE_LENGTH_NORM
+
+# 英数字と非ASCII以外のバイトを空白に変換し、同時に小文字化するテーブル
+_NORMALIZE_TABLE = bytes(
+    c if (chr(c).isalnum() or c >= 128) else 32 for c in range(256)
+).lower()
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+
+class RelevanceScorer:
+    """タイトル・アブストラクトのTF-IDFによる関連度スコアリング
+
+    語彙をチャンネルのキーワードに含まれる語とフレーズに限定し、
+    候補論文全体を1つの連結バイト列として一度だけ単語に区切って疎行列を構築する。
+    スコアは 文書×語 の行列と キーワード×語 の行列の積で一度に計算する。
+    """
+
+    @staticmethod
+    def _keyword_terms(keywords: Sequence[str]) -> Tuple[List[bytes], List[List[bytes]]]:
+        """キーワードを単語列に分解し、検索対象の語彙を作成"""
+        keyword_words = []
+        for keyword in keywords:
+            words = [w.encode('utf-8') for w in _WORD_PATTERN.findall(keyword.lower())]
+            keyword_words.append(words)
+        vocabulary = sorted({w for words in keyword_words for w in words})
+        return vocabulary, keyword_words
+
+    @staticmethod
+    def _count_matrix(texts: Sequence[str], vocabulary: List[bytes],
+                      phrases: List[List[bytes]]) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """各文書の語・フレーズ出現回数を疎行列で返す（列は語彙の後にフレーズ）
+
+        連結したバイト列を一度だけ単語に区切り、語彙の語と一致する単語（複数形の s・es は許容）を数える。
+        """
+        texts = [' ' + (t or '') + ' ' for t in texts]
+        joined = ''.join(texts)
+        blob = joined.encode('utf-8')
+        if len(blob) == len(joined):
+            # ASCIIのみなら文字数とバイト数が一致するので個別エンコードを省略
+            lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        else:
+            lengths = np.fromiter((len(t.encode('utf-8')) for t in texts), dtype=np.int64, count=len(texts))
+        bounds = np.cumsum(lengths)
+        # 末尾の空白は複数形の照合で単語の後ろ2バイトを読むための余白
+        buffer = np.frombuffer(blob.translate(_NORMALIZE_TABLE) + b' ', dtype=np.uint8)
+
+        # 前後が空白なので、空白との境目は単語の先頭と末尾が交互に並ぶ
+        space = buffer == 32
+        edges = np.flatnonzero(space[:-1] != space[1:]) + 1
+        starts = edges[0::2]
+        sizes = edges[1::2] - starts
+        # 先頭のバイトで単語を並べておき、語彙の語ごとに同じ先頭の単語だけを照合する
+        first = buffer[starts]
+        order = np.argsort(first, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(first, minlength=256))))
+
+        positions = []
+        columns = []
+        word_hits = {}
+        for j, word in enumerate(vocabulary):
+            hits = order[offsets[word[0]]:offsets[word[0] + 1]]
+            hit_sizes = sizes[hits]
+            hits = hits[(hit_sizes >= len(word)) & (hit_sizes <= len(word) + 2)]
+            for k in range(1, len(word)):
+                hits = hits[buffer[starts[hits] + k] == word[k]]
+            suffix = starts[hits] + len(word)
+            hit_sizes = sizes[hits] - len(word)
+            hits = hits[(hit_sizes == 0)
+                        | ((hit_sizes == 1) & (buffer[suffix] == ord('s')))
+                        | ((hit_sizes == 2) & (buffer[suffix] == ord('e')) & (buffer[suffix + 1] == ord('s')))]
+            word_hits[word] = hits
+            if len(hits):
+                positions.append(starts[hits])
+                columns.append(np.full(len(hits), j, dtype=np.int64))
+
+        # フレーズは先頭語の出現から続く単語を照合する（文書の境目をまたぐ並びは除く）
+        for k, words in enumerate(phrases):
+            hits = word_hits[words[0]]
+            for offset, word in enumerate(words[1:], 1):
+                hits = hits[np.isin(hits + offset, word_hits[word])]
+            last = hits + len(words) - 1
+            hits = hits[np.searchsorted(bounds, starts[hits], side='right')
+                        == np.searchsorted(bounds, starts[last], side='right')]
+            if len(hits):
+                positions.append(starts[hits])
+                columns.append(np.full(len(hits), len(vocabulary) + k, dtype=np.int64))
+
+        shape = (len(texts), len(vocabulary) + len(phrases))
+        if not positions:
+            return sparse.csr_matrix(shape, dtype=np.float64), lengths
+
+        rows = np.searchsorted(bounds, np.concatenate(positions), side='right')
+        cols = np.concatenate(columns)
+        counts = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=shape
+        )
+        counts.sum_duplicates()
+        return counts, lengths
+
+    @classmethod
+    def score(cls, papers: Sequence[Dict[str, Any]], keywords: Sequence[str]) -> np.ndarray:
+        """各論文のキーワード集合に対する関連度スコアを計算"""
+        if not papers or not keywords:
+            return np.zeros(len(papers), dtype=np.float64)
+
+        vocabulary, keyword_words = cls._keyword_terms(keywords)
+        phrases = sorted({tuple(words) for words in keyword_words if len(words) > 1})
+        phrase_index = {p: len(vocabulary) + k for k, p in enumerate(phrases)}
+        word_index = {w: j for j, w in enumerate(vocabulary)}
+
+        title_counts, _ = cls._count_matrix([p.get('title') for p in papers], vocabulary, list(map(list, phrases)))
+        abstract_counts, lengths = cls._count_matrix([p.get('abstract') for p in papers], vocabulary, list(map(list, phrases)))
+
+        # タイトルの出現を重み付けして合算し、TFを対数スケールに
+        tf = (RELEVANCE_TITLE_WEIGHT * title_counts + abstract_counts).tocsr()
+        np.log1p(tf.data, out=tf.data)
+
+        # 候補集合内の文書頻度からIDFを計算
+        num_docs = tf.shape[0]
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log((1.0 + num_docs) / (1.0 + df)) + 1.0
+
+        # キーワード×語 のクエリ行列（フレーズは語数分の重み）
+        q_rows, q_cols, q_vals = [], [], []
+        for i, words in enumerate(keyword_words):
+            for w in words:
+                q_rows.append(i)
+                q_cols.append(word_index[w])
+                q_vals.append(1.0)
+            if len(words) > 1:
+                q_rows.append(i)
+                q_cols.append(phrase_index[tuple(words)])
+                q_vals.append(float(len(words)))
+        query = sparse.csr_matrix(
+            (q_vals, (q_rows, q_cols)),
+            shape=(len(keyword_words), tf.shape[1])
+        )
+
+        # 文書×キーワード のスコアを一度の行列積で計算し、キーワード方向に合算
+        scores = np.asarray((tf @ sparse.diags(idf) @ query.T).sum(axis=1)).ravel()
+
+        # 長いアブストラクトが有利にならないよう文書長で正規化
+        length_norm = 1.0 - RELEVANCE_LENGTH_NORM + RELEVANCE_LENGTH_NORM * lengths / lengths.mean()
+        return scores / length_norm
+
+    @classmethod
+    def rank(cls, papers: Sequence[Dict[str, Any]], keywords: Sequence[str]) -> List[Dict[str, Any]]:
+        """関連度の高い順に論文を並べ替え（同点の場合は元の順序を維持）"""
+        if len(papers) < 2:
+            return list(papers)
+        scores = cls.score(papers, keywords)
+        order = np.argsort(-scores, kind='stable')
+        return [papers[i] for i in order]
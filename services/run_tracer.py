@@ -0,0 +1,182 @@
+# paper_harvester/services/run_tracer.py
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import pytz
+from sqlalchemy import insert
+from config import SessionLocal
+from models.database import Run, RunSpan
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+class Span:
+    """実行中のスパン（outcome は処理側で上書きできる）"""
+    __slots__ = ('sequence', 'parent_sequence', 'stage', 'attrs', 'started_at', 'duration_ms', 'outcome')
+
+    def __init__(self, sequence: int, parent_sequence: Optional[int], stage: str, attrs: Dict[str, Any]):
+        self.sequence = sequence
+        self.parent_sequence = parent_sequence
+        self.stage = stage
+        self.attrs = attrs
+        self.started_at = datetime.now(pytz.UTC)
+        self.duration_ms = 0.0
+        self.outcome = 'ok'
+
+class RunTracer:
+    """1回のチェック実行をスパン単位で記録し、runs/run_spans テーブルに保存する
+
+    スパンはメモリ上に溜めておき、実行終了時にまとめて書き込む。
+    """
+
+    def __init__(self, trigger: str, slack_channel_id: Optional[str] = None):
+        self.trigger = trigger
+        self.slack_channel_id = slack_channel_id
+        self.started_at = datetime.now(pytz.UTC)
+        self._started = time.perf_counter()
+        self._spans: List[Span] = []
+        self._stack: List[Span] = []
+
+    @staticmethod
+    def current() -> Optional['RunTracer']:
+        """現在のスレッドで有効なトレーサーを取得"""
+        return getattr(_local, 'tracer', None)
+
+    @contextmanager
+    def activate(self) -> Iterator['RunTracer']:
+        """このスレッドのトレーサーとして登録"""
+        previous = getattr(_local, 'tracer', None)
+        _local.tracer = self
+        try:
+            yield self
+        finally:
+            _local.tracer = previous
+
+    @contextmanager
+    def span(self, stage: str, **attrs) -> Iterator[Span]:
+        """処理区間を計測（親スパンの属性を引き継ぐ）"""
+        parent = self._stack[-1] if self._stack else None
+        if parent:
+            attrs = {**parent.attrs, **attrs}
+        span = Span(len(self._spans), parent.sequence if parent else None, stage, attrs)
+        self._spans.append(span)
+        self._stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception:
+            span.outcome = 'error'
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            self._stack.pop()
+
+    def finish(self, status: str):
+        """実行結果とスパンをデータベースに保存"""
+        db = SessionLocal()
+        try:
+            run = Run(
+                trigger=self.trigger,
+                slack_channel_id=self.slack_channel_id,
+                status=status,
+                started_at=self.started_at,
+                finished_at=datetime.now(pytz.UTC),
+                duration_ms=(time.perf_counter() - self._started) * 1000
+            )
+            db.add(run)
+            db.flush()
+            if self._spans:
+                db.execute(insert(RunSpan), [
+                    {
+                        'run_id': run.id,
+                        'sequence': s.sequence,
+                        'parent_sequence': s.parent_sequence,
+                        'stage': s.stage,
+                        'slack_channel_id': s.attrs.get('slack_channel_id'),
+                        'keyword': s.attrs.get('keyword'),
+                        'arxiv_id': s.attrs.get('arxiv_id'),
+                        'started_at': s.started_at,
+                        'duration_ms': s.duration_ms,
+                        'outcome': s.outcome
+                    }
+                    for s in self._spans
+                ])
+            db.commit()
+            logger.debug("Recorded run", extra={'run_id': run.id, 'trigger': self.trigger, 'spans': len(self._spans)})
+        except Exception:
+            db.rollback()
+            logger.exception("Error saving run trace", extra={'trigger': self.trigger})
+        finally:
+            db.close()
+
+    @staticmethod
+    def stage_stats(db, last_runs: int = 20, top_keywords: int = 5) -> Dict[str, Any]:
+        """直近の実行におけるステージ別のp50/p95と遅いキーワードを集計"""
+        run_rows = db.query(Run.id, Run.duration_ms)\
+            .filter(Run.finished_at.isnot(None))\
+            .order_by(Run.started_at.desc())\
+            .limit(last_runs)\
+            .all()
+        run_ids = [run_id for run_id, _ in run_rows]
+        if not run_ids:
+            return {'runs': 0, 'run_durations': [], 'stages': {}, 'slowest_keywords': []}
+
+        spans = db.query(RunSpan.stage, RunSpan.keyword, RunSpan.duration_ms)\
+            .filter(RunSpan.run_id.in_(run_ids))\
+            .all()
+
+        durations_by_stage = defaultdict(list)
+        keyword_durations = defaultdict(list)
+        for stage, keyword, duration_ms in spans:
+            durations_by_stage[stage].append(duration_ms)
+            if stage == 'keyword' and keyword:
+                keyword_durations[keyword].append(duration_ms)
+
+        stages = {
+            stage: {
+                'count': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'total': sum(values)
+            }
+            for stage, values in durations_by_stage.items()
+        }
+        slowest_keywords = sorted(
+            (
+                {'keyword': keyword, 'p50': percentile(values, 50), 'max': max(values), 'count': len(values)}
+                for keyword, values in keyword_durations.items()
+            ),
+            key=lambda k: k['p50'],
+            reverse=True
+        )[:top_keywords]
+
+        return {
+            'runs': len(run_ids),
+            'run_durations': [d for _, d in run_rows if d is not None],
+            'stages': stages,
+            'slowest_keywords': slowest_keywords
+        }
+
+@contextmanager
+def trace_span(stage: str, **attrs) -> Iterator[Optional[Span]]:
+    """現在のトレーサーがあればスパンを記録（なければ何もしない）"""
+    tracer = RunTracer.current()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(stage, **attrs) as span:
+        yield span
+
+def percentile(values: List[float], q: float) -> float:
+    """最近傍順位法によるパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
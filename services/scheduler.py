@@ -1,14 +1,93 @@
 # paper_harvester/services/scheduler.py
 
-import schedule
+import logging
 import time
 import threading
 import pytz
-from datetime import datetime
-from typing import Optional
-from config import SessionLocal, TIMEZONE, SCHEDULE_TIMES
-from models.database import Channel
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from config import (
+    SessionLocal,
+    TIMEZONE,
+    SCHEDULE_TIMES,
+    SCHEDULE_JITTER_SECONDS,
+    CANDIDATE_REFRESH_MINUTES,
+    HARVEST_MODE,
+    LEASE_TTL_SECONDS,
+    SLOT_GRACE_SECONDS,
+    CIRCUIT_RESET_SECONDS
+)
+from models.database import Channel, PaperDelivery, HarvestCheckpoint, RunItem, as_utc
 from services.arxiv import ArxivService
+from services.author_index import AuthorIndex, AuthorMatch
+from services.coordination import LeaseManager, shard_of
+from services.keyword_matcher import KeywordMatcher
+from services.oai_harvester import OAIHarvester
+from services.run_tracer import RunTracer, trace_span
+from services.summary_budget import SummaryPool, SummaryQueue
+from utils.metrics import registry
+from utils.resilience import service_policy, unavailable_services, CircuitOpenError
+from utils.schedule_times import normalize_times, next_fire_time, previous_fire_time, jitter
+from utils.timer_heap import TimerHeap
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_RUN_SECONDS = registry.histogram(
+    'paper_harvester_scheduler_run_seconds',
+    '定期チェック1回分（実行時刻が来たチャンネル）の所要時間',
+    ['status'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+)
+SCHEDULER_PAPERS_TOTAL = registry.counter(
+    'paper_harvester_scheduler_papers_total',
+    '定期チェックで処理した新着論文の件数',
+    ['outcome']
+)
+SCHEDULER_LAST_RUN_TIMESTAMP = registry.gauge(
+    'paper_harvester_scheduler_last_run_timestamp_seconds',
+    '最後に完了した定期チェックの時刻（UNIX時間）'
+)
+SCHEDULER_FIRES_TOTAL = registry.counter(
+    'paper_harvester_scheduler_fires_total',
+    'チャンネルの実行時刻ごとの結果（ran: 処理, other_node: 他のノードが処理済み, '
+    'expired: 完了を待ちきれず見送り, coalesced: 前の実行が長引いて次の実行にまとめた, '
+    'deferred: 外部サービスの障害で後に回した）',
+    ['outcome']
+)
+SCHEDULER_LAG_SECONDS = registry.histogram(
+    'paper_harvester_scheduler_lag_seconds',
+    '予定時刻（分散のための遅延を含む）から処理を始めるまでの遅れ',
+    buckets=(0.1, 1, 5, 15, 60, 300, 900, 3600)
+)
+
+# 他のノードの担当分やリーダーの一括取得の完了を確認する間隔（秒）
+_POLL_SECONDS = min(LEASE_TTL_SECONDS / 3, 5.0)
+# チャンネルの追加や実行時刻の変更をデータベースから読み直す間隔（秒）
+_SYNC_SECONDS = 60.0
+# チャンネルごとに処理済みの実行時刻を記録するチェックポイント
+_CHANNEL_CHECKPOINT = 'schedule:channel:'
+# チャンネル・キーワードごとに検索済みの実行時刻を記録するチェックポイント（中断後の再開で検索を省く）
+_KEYWORD_CHECKPOINT = 'schedule:keyword:'
+# チャンネルごとに候補キュー（未配信の作業項目）を最後に更新した時刻を記録するチェックポイント
+_CANDIDATE_CHECKPOINT = 'candidates:'
+# 配信が済んでいない作業項目の状態
+_PENDING_STATES = ('fetched', 'summarized', 'posting')
+# 送信に失敗し続けた論文を諦めるまでの回数
+_MAX_POST_ATTEMPTS = 3
+# 送信中の作業項目を、停止して残ったものとみなすまでの時間（/paper_check_now が送信中の論文は次の実行で確認する）
+_POSTING_TIMEOUT = timedelta(minutes=1)
+# 配信済み・失敗した作業項目を残しておく期間
+_ITEM_RETENTION = timedelta(days=7)
+
+@dataclass
+class _ChannelJob:
+    slack_channel_id: str
+    fire: datetime  # 予定の実行時刻（UTC、分散のための遅延を含まない）。処理済みの記録に使う
+    schedule: Tuple[Tuple[str, ...], str]  # (実行時刻, タイムゾーン)
+    deadline: Optional[datetime] = None  # 他のノードの処理を待つ期限
 
 class SchedulerService:
     def __init__(self, slack_service):
@@ -18,122 +97,751 @@ class SchedulerService:
         self._running = False
         self._thread: Optional[threading.Thread] = None
         self._lock = threading.Lock()
+        self._dispatch_lock = threading.Lock()
+        self._timers = TimerHeap()
+        self._next_sync = 0.0
+        self._next_refresh = 0.0
+        self.leases = LeaseManager()
+
+    @staticmethod
+    def channel_schedule(channel) -> Tuple[Tuple[str, ...], str]:
+        """チャンネルの実行時刻とタイムゾーン（未設定なら全体の設定）"""
+        config = channel.config
+        times = config.schedule_times.split(',') if config and config.schedule_times else SCHEDULE_TIMES
+        timezone = config.timezone if config and config.timezone else TIMEZONE
+        return tuple(normalize_times(times)), timezone
+
+    @classmethod
+    def next_run(cls, channel, now: Optional[datetime] = None) -> datetime:
+        """チャンネルの次の実行予定（分散のための遅延を含む）"""
+        now = now or datetime.now(pytz.UTC)
+        times, timezone = cls.channel_schedule(channel)
+        fire = next_fire_time(times, timezone, now)
+        return fire + jitter(channel.slack_channel_id, fire, SCHEDULE_JITTER_SECONDS)
 
     def check_new_papers(self):
-        """全チャンネルの新着論文をチェック"""
-        current_time = datetime.now(self.timezone)
-        print(f"\n=== Starting paper check at {current_time.strftime('%Y-%m-%d %H:%M:%S %Z')} ===")
-        
+        """直近の実行時刻の処理が済んでいないチャンネルを全て処理（他のノードの担当分は完了か期限まで待つ）"""
         db = SessionLocal()
         try:
-            # チャンネル取得
-            channels = db.query(Channel).all()
-            print(f"Found {len(channels)} channels to check")
+            with self._dispatch_lock:
+                self._sync_jobs(db, catch_up=True)
+        finally:
+            db.close()
+        
+        while self._running:
+            self.run_pending()
+            now = datetime.now(pytz.UTC)
+            if not any(job.fire <= now for _, _, job in self._timers.items()):
+                return
+            self._timers.wait(_POLL_SECONDS)
+
+    def refresh_candidates(self):
+        """担当シャードのチャンネルの候補キューをすぐに更新"""
+        with self._dispatch_lock:
+            db = SessionLocal()
+            try:
+                self.leases.rebalance()
+                self._refresh_candidates(db)
+            finally:
+                db.close()
+
+    def run_pending(self):
+        """実行時刻が来たチャンネルを処理（チャンネルの追加や実行時刻の変更も定期的に反映）"""
+        with self._dispatch_lock:
+            db = SessionLocal()
+            try:
+                if time.monotonic() >= self._next_sync:
+                    self._sync_jobs(db)
+                due = self._timers.pop_due(datetime.now(pytz.UTC))
+                if due:
+                    self._dispatch(db, due)
+                elif CANDIDATE_REFRESH_MINUTES >= 0 and time.monotonic() >= self._next_refresh:
+                    self._refresh_candidates(db)
+            finally:
+                db.close()
+
+    def _sync_jobs(self, db, catch_up: bool = False):
+        """チャンネルごとの次の実行時刻をタイマーに登録
+
+        catch_up の場合は、直近の実行時刻の処理がどのノードでも済んでいないチャンネルをすぐに実行する。
+        """
+        now = datetime.now(pytz.UTC)
+        channels = db.query(Channel).options(joinedload(Channel.config)).all()
+        cursors = self._checkpoint_cursors(db, _CHANNEL_CHECKPOINT) if catch_up else {}
+        
+        for channel in channels:
+            key = channel.slack_channel_id
+            schedule = self.channel_schedule(channel)
+            current = self._timers.get(key)
+            if catch_up and not (current and current[1].fire <= now):
+                fire = previous_fire_time(*schedule, now)
+                if cursors.get(key, '') < fire.isoformat():
+                    self._timers.push(key, now, _ChannelJob(key, fire, schedule))
+                    continue
+            if current is None or current[1].schedule != schedule:
+                self._push_next(key, schedule, now)
+        
+        # 削除されたチャンネル
+        keys = {channel.slack_channel_id for channel in channels}
+        for key, _, _ in self._timers.items():
+            if key not in keys:
+                self._timers.remove(key)
+        self._next_sync = time.monotonic() + _SYNC_SECONDS
+
+    def _push_next(self, key: str, schedule: Tuple[Tuple[str, ...], str], after: datetime):
+        """after より後の実行時刻に、チャンネルごとに決まった遅延を加えて登録"""
+        fire = next_fire_time(*schedule, after)
+        self._timers.push(key, fire + jitter(key, fire, SCHEDULE_JITTER_SECONDS), _ChannelJob(key, fire, schedule))
+
+    def _reschedule(self, job: _ChannelJob, after: datetime):
+        """次の実行時刻を登録（処理中に過ぎた実行時刻は重ねて実行せず、次にまとめる）"""
+        times, timezone = job.schedule
+        fire = next_fire_time(times, timezone, job.fire)
+        while fire <= after:
+            SCHEDULER_FIRES_TOTAL.inc(outcome='coalesced')
+            logger.warning("Skipped fire time overlapping previous run", extra={
+                'channel_id': job.slack_channel_id,
+                'fire': fire.isoformat()
+            })
+            fire = next_fire_time(times, timezone, fire)
+        self._push_next(job.slack_channel_id, job.schedule, after)
+
+    def _dispatch(self, db, due: List[Tuple[str, datetime, _ChannelJob]]):
+        """担当シャードのチャンネルを処理し、他のノードの担当分は完了するまで待つ
+
+        担当ノードが止まった場合は、リースの期限切れ後にシャードを引き継いで処理する。
+        """
+        now = datetime.now(pytz.UTC)
+        cursors = self._checkpoint_cursors(db, _CHANNEL_CHECKPOINT)
+        owned = self.leases.rebalance()
+        
+        jobs = []
+        for key, due_at, job in due:
+            if cursors.get(key, '') >= job.fire.isoformat():
+                SCHEDULER_FIRES_TOTAL.inc(outcome='other_node')
+                self._reschedule(job, now)
+            elif shard_of(key) in owned:
+                SCHEDULER_LAG_SECONDS.observe((now - due_at).total_seconds())
+                jobs.append(job)
+            else:
+                job.deadline = job.deadline or now + timedelta(seconds=SLOT_GRACE_SECONDS)
+                if now < job.deadline:
+                    self._timers.push(key, now + timedelta(seconds=_POLL_SECONDS), job)
+                else:
+                    logger.warning("Channel left unchecked by other nodes", extra={
+                        'channel_id': key,
+                        'fire': job.fire.isoformat()
+                    })
+                    SCHEDULER_FIRES_TOTAL.inc(outcome='expired')
+                    self._reschedule(job, now)
+        
+        if not jobs:
+            return
+        started = time.perf_counter()
+        status = 'error'
+        tracer = RunTracer('scheduled')
+        try:
+            with tracer.activate():
+                status = self._check_new_papers(db, jobs)
+        finally:
+            SCHEDULER_RUN_SECONDS.observe(time.perf_counter() - started, status=status)
+            SCHEDULER_LAST_RUN_TIMESTAMP.set(time.time())
+            tracer.finish(status)
+        
+        finished = datetime.now(pytz.UTC)
+        for job in jobs:
+            if status == 'deferred' and self._defer(job, finished):
+                continue
+            SCHEDULER_FIRES_TOTAL.inc(outcome='ran')
+            self._reschedule(job, finished)
+
+    def _defer(self, job: _ChannelJob, now: datetime) -> bool:
+        """障害中のサービスの再開を待って同じ実行時刻の処理をやり直す（次の実行時刻を過ぎる場合は False）"""
+        retry_in = max(unavailable_services().values(), default=0.0) or CIRCUIT_RESET_SECONDS
+        retry_at = now + timedelta(seconds=retry_in)
+        if retry_at >= next_fire_time(*job.schedule, job.fire):
+            return False
+        SCHEDULER_FIRES_TOTAL.inc(outcome='deferred')
+        logger.warning("Deferring paper check until dependencies recover", extra={
+            'channel_id': job.slack_channel_id,
+            'fire': job.fire.isoformat(),
+            'retry_at': retry_at.isoformat()
+        })
+        self._timers.push(job.slack_channel_id, retry_at, job)
+        return True
+
+    def _check_new_papers(self, db, jobs: List[_ChannelJob]) -> str:
+        """実行時刻が来たチャンネルの新着論文を通知し、実行結果を返す
+
+        見つかった論文は (チャンネル, 論文) ごとの作業項目（run_items）として保存してから要約・投稿し、
+        状態を fetched → summarized → posting → posted と進めるたびにコミットする。
+        途中で停止しても、再開時は検索済みのキーワードを飛ばし、残った作業項目を続きの状態から処理する。
+        """
+        fires = {job.slack_channel_id: job.fire for job in jobs}
+        slot = max(fires.values()).isoformat()
+        logger.info("Starting paper check", extra={'channels': len(jobs), 'slot': slot, 'node_id': self.leases.node_id})
+        
+        try:
+            channels = db.query(Channel).filter(Channel.slack_channel_id.in_(list(fires))).all()
+            if HARVEST_MODE == 'oai':
+                self._harvest_once(db, slot)
+                status = self._match_harvested(db, channels, fires)
+            else:
+                # 同じ検索条件のキーワードはチャンネルをまたいで1回だけ検索する
+                with ArxivService.shared_search():
+                    status = self._check_channels(db, channels, fires)
             
-            for channel in channels:
-                print(f"\nChecking channel: {channel.name} (ID: {channel.slack_channel_id})")
-                
-                if not channel.keywords:
-                    print("No keywords set for this channel, skipping...")
+            # 中断や障害で前回までに配信できなかった論文も合わせて配信する
+            if status in ('ok', 'deferred'):
+                self._match_followed_authors(db, channels, fires)
+                delivered = self._deliver(db, channels)
+                status = status if delivered == 'ok' else delivered
+            if status == 'ok' and HARVEST_MODE == 'oai' and service_policy('arxiv').breaker.is_open:
+                # 保存済みの論文は配信したが、新着一覧は取得できていない
+                status = 'deferred'
+            
+            if status == 'ok':
+                # 最後までリースを保持できたチャンネルだけを処理済みとして記録（配信し終えた候補キューも更新済みになる）
+                held = [c for c in channels if self.leases.holds(f"shard:{shard_of(c.slack_channel_id)}")]
+                self._set_checkpoints(db, {
+                    f"{prefix}{c.slack_channel_id}": fires[c.slack_channel_id].isoformat()
+                    for c in held for prefix in (_CHANNEL_CHECKPOINT, _CANDIDATE_CHECKPOINT)
+                }, self._fence(db, held))
+                self._prune_items(db)
+                logger.info("Completed paper check", extra={'slot': slot, 'finished_at': datetime.now(self.timezone).isoformat()})
+            return status
+        
+        except Exception:
+            db.rollback()
+            logger.exception("Error in scheduled check")
+            return 'error'
+
+    def _refresh_candidates(self, db):
+        """担当チャンネルの候補キューを更新する（検索・照合・要約まで済ませ、投稿は定期チェックと /paper_check_now に任せる）
+
+        更新の時刻は refresh_slot に揃え、全ノードで同じ一括取得のリーダー・検索済みの記録を使う。
+        実行時刻に揃う更新は定期チェックに任せる。
+        """
+        interval = CANDIDATE_REFRESH_MINUTES * 60
+        self._next_refresh = time.monotonic() + (min(interval, _SYNC_SECONDS) if interval > 0 else _SYNC_SECONDS)
+        now = datetime.now(pytz.UTC)
+        refreshed = self._checkpoint_cursors(db, _CANDIDATE_CHECKPOINT)
+        channels, fires = [], {}
+        for channel in db.query(Channel).options(joinedload(Channel.config)).all():
+            slot, scheduled = self.refresh_slot(channel, now)
+            if not scheduled and refreshed.get(channel.slack_channel_id, '') < slot.isoformat() \
+                    and self.leases.holds(f"shard:{shard_of(channel.slack_channel_id)}"):
+                channels.append(channel)
+                fires[channel.slack_channel_id] = slot
+        if not channels:
+            return
+        
+        logger.info("Refreshing candidate queues", extra={'channels': len(channels), 'slot': max(fires.values()).isoformat()})
+        status = 'error'
+        tracer = RunTracer('prepare')
+        try:
+            with tracer.activate():
+                status = self._prepare_candidates(db, channels, fires)
+        finally:
+            tracer.finish(status)
+
+    def _prepare_candidates(self, db, channels, fires: Dict[str, datetime]) -> str:
+        """新着論文を作業項目として保存して要約し、更新できたチャンネルの候補キューの時刻を記録"""
+        try:
+            if HARVEST_MODE == 'oai':
+                self._harvest_once(db, max(fires.values()).isoformat())
+                status = self._match_harvested(db, channels, fires)
+            else:
+                with ArxivService.shared_search():
+                    status = self._check_channels(db, channels, fires)
+            if status in ('ok', 'deferred'):
+                self._match_followed_authors(db, channels, fires)
+                self._summarize_items(db, channels)
+            if status == 'ok':
+                held = [c for c in channels if self.leases.holds(f"shard:{shard_of(c.slack_channel_id)}")]
+                self._set_checkpoints(db, {
+                    f"{_CANDIDATE_CHECKPOINT}{c.slack_channel_id}": fires[c.slack_channel_id].isoformat()
+                    for c in held
+                }, self._fence(db, held))
+            return status
+        except Exception:
+            db.rollback()
+            logger.exception("Error refreshing candidate queues")
+            return 'error'
+
+    def _summarize_items(self, db, channels):
+        """未要約の作業項目をチャンネルの優先度・関連度の高い順にトークン予算の範囲で要約（投稿はしない）"""
+        queue, items = self._pending_items(db, channels)
+        with SummaryPool(queue, self._summary_target(items)) as pool:
+            for (channel, paper, _), pending in pool:
+                if not self._running:
+                    return
+                if pending is None:
                     continue
-                
-                print(f"Keywords for this channel: {[k.word for k in channel.keywords]}")
-                
+                if self._wait_summary(db, paper, pending):
+                    self.advance_item(db, items[(channel.id, paper.id)], ('fetched',), 'summarized')
+                elif service_policy('openai').breaker.is_open:
+                    return
+
+    def _summary_target(self, items: Dict[Tuple[int, int], RunItem]):
+        """SummaryPool で要約する論文（担当しているチャンネルの未要約の作業項目）"""
+        def target(entry):
+            channel, paper, _ = entry
+            if self._owns(channel) and items[(channel.id, paper.id)].state == 'fetched':
+                return channel.slack_channel_id, paper.id
+            return None
+        return target
+
+    @staticmethod
+    def _wait_summary(db, paper, pending) -> Optional[str]:
+        """ワーカーの要約を待ち、保存された要約を読み直す（待った時間を summarize のスパンとして記録）"""
+        with trace_span('summarize', arxiv_id=paper.arxiv_id) as span:
+            summary = pending.result()
+            if span and summary is None:
+                span.outcome = 'error'
+        db.refresh(paper)
+        return summary
+
+    @classmethod
+    def refresh_slot(cls, channel, now: datetime) -> Tuple[datetime, bool]:
+        """候補キューを now までに更新しておく時刻と、それが定期チェックの実行時刻か
+
+        CANDIDATE_REFRESH_MINUTES が正ならその間隔の区切り、0 ならチャンネルの実行時刻と、次の実行時刻との中間。
+        負なら実行時刻だけ。
+        """
+        if CANDIDATE_REFRESH_MINUTES > 0:
+            interval = CANDIDATE_REFRESH_MINUTES * 60
+            return datetime.fromtimestamp(now.timestamp() // interval * interval, pytz.UTC), False
+        times, timezone = cls.channel_schedule(channel)
+        fire = previous_fire_time(times, timezone, now)
+        midpoint = fire + (next_fire_time(times, timezone, fire) - fire) / 2
+        return (midpoint, False) if CANDIDATE_REFRESH_MINUTES == 0 and now >= midpoint else (fire, True)
+
+    @staticmethod
+    def candidates_refreshed_at(db, channel) -> Optional[datetime]:
+        """チャンネルの候補キューを最後に更新した時刻（未更新なら None）"""
+        cursor = SchedulerService._checkpoint_cursor(db, f"{_CANDIDATE_CHECKPOINT}{channel.slack_channel_id}")
+        return datetime.fromisoformat(cursor) if cursor else None
+
+    @staticmethod
+    def mark_candidates_refreshed(db, channel, at: datetime):
+        """その場の検索で新着論文を配信し終えたチャンネルの候補キューを更新済みとして記録"""
+        SchedulerService._set_checkpoints(db, {f"{_CANDIDATE_CHECKPOINT}{channel.slack_channel_id}": at.isoformat()})
+
+    @staticmethod
+    def advance_item(db, item: RunItem, from_states: Tuple[str, ...], state: str,
+                     fenced: Optional[Callable[[], bool]] = None) -> bool:
+        """作業項目が from_states のいずれかのときだけ state に進めてコミット（他の処理が先に進めていれば False）
+
+        定期チェック・候補キューの更新・/paper_check_now が同じ作業項目を同時に扱っても、投稿するのは1回だけにする。
+        fenced が False を返した場合（担当のリースが引き継がれた）も進めずに False を返す。
+        """
+        updated = db.query(RunItem)\
+            .filter(RunItem.id == item.id, RunItem.state.in_(from_states))\
+            .update({'state': state, 'updated_at': datetime.now(pytz.UTC)}, synchronize_session=False)
+        if updated and fenced is not None and not fenced():
+            db.rollback()
+            return False
+        db.commit()
+        return updated == 1
+
+    def _fence(self, db, channels) -> Callable[[], bool]:
+        """channels のシャードのリースを取得したときのまま保持しているかを、書き込みのコミット直前に確かめる関数"""
+        return lambda: self.leases.fence(db, {f"shard:{shard_of(c.slack_channel_id)}" for c in channels})
+
+    def _harvest_once(self, db, slot: str):
+        """実行時刻ごとにリーダーになった1ノードだけがカテゴリの新着一覧を取得し、他のノードは完了を待つ"""
+        leader = f"leader:{slot}"
+        deadline = time.monotonic() + SLOT_GRACE_SECONDS
+        while (self._checkpoint_cursor(db, 'schedule:harvest') or '') < slot:
+            if self.leases.try_acquire(leader):
+                try:
+                    with trace_span('harvest'):
+                        OAIHarvester().harvest(db)
+                    self._set_checkpoints(db, {'schedule:harvest': slot}, lambda: self.leases.fence(db, [leader]))
+                except CircuitOpenError as e:
+                    db.rollback()
+                    logger.warning("arXiv unavailable, skipping OAI-PMH harvest", extra={'retry_in': round(e.retry_in)})
+                except Exception:
+                    # 取得に失敗しても保存済みの論文は照合する（次に待っているノードが取得を再試行する）
+                    db.rollback()
+                    logger.exception("Error harvesting OAI-PMH listings")
+                finally:
+                    self.leases.release(leader)
+                self.leases.prune('leader')
+                return
+            if time.monotonic() >= deadline or not self._running:
+                logger.warning("Gave up waiting for slot leader harvest", extra={'slot': slot})
+                return
+            time.sleep(_POLL_SECONDS)
+
+    def _owns(self, channel) -> bool:
+        """チャンネルのシャードのリースを保持中か（失っていれば他のノードに任せる）"""
+        if self.leases.holds(f"shard:{shard_of(channel.slack_channel_id)}"):
+            return True
+        logger.warning("Shard lease lost, leaving channel to another node", extra={'channel_id': channel.slack_channel_id})
+        return False
+
+    @staticmethod
+    def _checkpoint_cursor(db, name: str) -> Optional[str]:
+        db.commit()  # 他のノードの更新を読むためにトランザクションを区切る
+        return db.query(HarvestCheckpoint.cursor).filter_by(name=name).scalar()
+
+    @staticmethod
+    def _checkpoint_cursors(db, prefix: str) -> Dict[str, str]:
+        """名前が prefix で始まるチェックポイント（prefix を除いた名前 → 位置）"""
+        db.commit()
+        rows = db.query(HarvestCheckpoint.name, HarvestCheckpoint.cursor).filter(HarvestCheckpoint.name.like(f"{prefix}%"))
+        return {name[len(prefix):]: cursor or '' for name, cursor in rows}
+
+    @staticmethod
+    def _set_checkpoints(db, cursors: Dict[str, str], fenced: Optional[Callable[[], bool]] = None):
+        """チェックポイントを進めてコミット（既に先まで進んでいるものはそのまま）
+
+        fenced が False を返した場合（担当のリースが引き継がれた）は、同じトランザクションの書き込みごと捨てる。
+        """
+        if not cursors:
+            return
+        existing = {c.name: c for c in db.query(HarvestCheckpoint).filter(HarvestCheckpoint.name.in_(list(cursors)))}
+        for name, cursor in cursors.items():
+            checkpoint = existing.get(name)
+            if checkpoint is None:
+                checkpoint = HarvestCheckpoint(name=name)
+                db.add(checkpoint)
+            if (checkpoint.cursor or '') < cursor:
+                checkpoint.cursor = cursor
+        try:
+            if fenced is not None and not fenced():
+                db.rollback()
+                return
+            db.commit()
+        except IntegrityError:
+            # シャードを引き継いだ直後に前の担当ノードも記録した
+            db.rollback()
+            logger.warning("Checkpoint written concurrently", extra={'checkpoints': ','.join(cursors)})
+
+    def _check_channels(self, db, channels, fires: Dict[str, datetime]) -> str:
+        """各チャンネルのキーワードを順に検索し、見つかった論文を作業項目として保存
+
+        キーワードごとに、新しい論文・作業項目・検索済みの記録を1トランザクションで保存する。
+        arXivのサーキットが開いた場合は残りのキーワードを検索せず、見つかった分だけ配信して後に回す。
+        """
+        status = 'ok'
+        searched = self._checkpoint_cursors(db, _KEYWORD_CHECKPOINT)
+        for channel in channels:
+            log_fields = {'channel_id': channel.slack_channel_id, 'channel_name': channel.name}
+            if not self._owns(channel):
+                continue
+            if not channel.keywords:
+                logger.info("No keywords set for channel, skipping", extra=log_fields)
+                continue
+            
+            logger.info("Checking channel", extra={**log_fields, 'keywords': len(channel.keywords)})
+            fire = fires[channel.slack_channel_id].isoformat()
+            
+            with trace_span('channel', slack_channel_id=channel.slack_channel_id):
                 for keyword in channel.keywords:
                     if not self._running:
-                        print("Scheduler stopping, interrupting paper check")
-                        return
+                        logger.warning("Scheduler stopping, interrupting paper check")
+                        return 'interrupted'
                     
-                    print(f"\nSearching papers for keyword: {keyword.word}")
-                    try:
-                        papers = ArxivService.fetch_and_process_papers(
-                            db,
-                            keyword.word,
-                            channel.slack_channel_id
-                        )
-                        
-                        if papers:
-                            print(f"Found {len(papers)} new papers for keyword '{keyword.word}'")
-                            for paper in papers:
-                                try:
-                                    print(f"Sending notification for paper: {paper.title}")
-                                    with self._lock:
-                                        self.slack_service.send_paper_message(
-                                            channel.slack_channel_id,
-                                            paper,
-                                            keyword.word
-                                        )
-                                    print("Notification sent successfully")
-                                except Exception as e:
-                                    print(f"Error sending notification for paper {paper.title}: {e}")
-                                    continue
-                        else:
-                            print(f"No new papers found for keyword '{keyword.word}'")
+                    if service_policy('arxiv').breaker.is_open:
+                        status = 'deferred'
+                        break
                     
-                    except Exception as e:
-                        print(f"Error processing keyword {keyword.word}: {e}")
+                    checkpoint = f"{channel.slack_channel_id}:{keyword.id}"
+                    if searched.get(checkpoint, '') >= fire:
+                        # 中断前の実行で検索済み（見つかった論文は作業項目に残っている）
                         continue
+                    
+                    with trace_span('keyword', keyword=keyword.word) as span:
+                        papers = self._process_keyword(db, channel, keyword, span)
+                    self.add_items(db, channel, [(paper, keyword) for paper in papers], fire)
+                    self._set_checkpoints(db, {f"{_KEYWORD_CHECKPOINT}{checkpoint}": fire}, self._fence(db, [channel]))
+            if status == 'deferred':
+                logger.warning("arXiv unavailable, deferring remaining keywords", extra={'channel_id': channel.slack_channel_id})
+                break
+        return status
+
+    def _match_harvested(self, db, channels, fires: Dict[str, datetime]) -> str:
+        """保存済みの論文とチャンネルのキーワードをローカルで照合し、一致した論文を作業項目として保存"""
+        if not channels:
+            return 'ok'
+        with trace_span('match'):
+            pending = KeywordMatcher.pending_papers(db, channels)
+        
+        for channel in channels:
+            if self._owns(channel):
+                self.add_items(db, channel, pending.get(channel.id, []), fires[channel.slack_channel_id].isoformat())
+        db.commit()
+        return 'ok'
+
+    def _match_followed_authors(self, db, channels, fires: Dict[str, datetime]):
+        """保存済みの論文のうちフォロー中の著者の論文を作業項目として保存（arXivへの問い合わせはしない）"""
+        with trace_span('match_authors'):
+            pending = AuthorIndex.pending_papers(db, channels)
+        for channel in channels:
+            if channel.id in pending and self._owns(channel):
+                self.add_items(db, channel, pending[channel.id], fires[channel.slack_channel_id].isoformat())
+        db.commit()
+
+    @staticmethod
+    def add_items(db, channel, items, slot: str):
+        """(論文, キーワードまたはフォロー中の著者) を作業項目に追加（作業項目が既にある論文は除く。コミットは呼び出し側で行う）"""
+        paper_ids = [paper.id for paper, _ in items]
+        if not paper_ids:
+            return
+        existing = {
+            paper_id for (paper_id,) in db.query(RunItem.paper_id)
+            .filter(RunItem.channel_id == channel.id, RunItem.paper_id.in_(paper_ids))
+        }
+        for paper, keyword in items:
+            if paper.id in existing:
+                continue
+            existing.add(paper.id)
+            author_id = keyword.author_id if isinstance(keyword, AuthorMatch) else None
+            db.add(RunItem(slot=slot, channel_id=channel.id, paper_id=paper.id, keyword_id=keyword.id,
+                           author_id=author_id, state='fetched'))
+
+    def _pending_items(self, db, channels) -> Tuple[SummaryQueue, Dict[Tuple[int, int], RunItem]]:
+        """配信が済んでいない作業項目をキューに入れる（送信中に停止した論文は投稿済みか確認する）"""
+        queue = SummaryQueue()
+        by_key = {}
+        owned = {channel.id: channel for channel in channels if self._owns(channel)}
+        if not owned:
+            return queue, by_key
+        items = db.query(RunItem)\
+            .filter(RunItem.channel_id.in_(list(owned)), RunItem.state.in_(_PENDING_STATES))\
+            .order_by(RunItem.id)\
+            .all()
+        
+        matches = self.item_matches(db, owned, items)
+        posting_cutoff = datetime.now(pytz.UTC) - _POSTING_TIMEOUT
+        entries = {channel_id: [] for channel_id in owned}
+        for item in items:
+            channel = owned[item.channel_id]
+            keyword = matches[item.id]
+            if keyword is None:
+                # 購読が解除されたキーワード・フォローが解除された著者の論文は配信しない
+                db.delete(item)
+                continue
+            if item.state == 'posting':
+                if as_utc(item.updated_at) > posting_cutoff or not self._resume_posting(db, channel, item):
+                    continue
+            by_key[(item.channel_id, item.paper_id)] = item
+            entries[item.channel_id].append((item.paper, keyword))
+        db.commit()
+        
+        for channel_id, channel_entries in entries.items():
+            queue.extend(owned[channel_id], channel_entries)
+        if by_key:
+            logger.info("Pending papers", extra={
+                'papers': len(by_key),
+                'summarized': sum(1 for item in by_key.values() if item.state == 'summarized')
+            })
+        return queue, by_key
+
+    @staticmethod
+    def item_matches(db, channels: Dict[int, Channel], items: List[RunItem]) -> Dict[int, object]:
+        """作業項目ID → 一致したキーワードまたはフォロー中の著者（購読・フォローが解除されていれば None）"""
+        followed = {
+            (follow.channel_id, follow.author_id): AuthorMatch.of(follow.author)
+            for follow in AuthorIndex.follows(db, list(channels))
+        }
+        matches = {}
+        for item in items:
+            if item.author_id is not None:
+                matches[item.id] = followed.get((item.channel_id, item.author_id))
+            else:
+                keywords = channels[item.channel_id].keywords
+                matches[item.id] = next((k for k in keywords if k.id == item.keyword_id), None)
+        return matches
+
+    def _resume_posting(self, db, channel, item: RunItem) -> bool:
+        """送信中に停止した論文を送り直すか（投稿済みなら配信済みとして記録して False）"""
+        found = self.slack_service.find_paper_message(channel.slack_channel_id, item.paper, as_utc(item.updated_at))
+        if found is False:
+            item.state = 'summarized'
+            return True
+        if found is None:
+            # 確認できない場合は重複投稿を避けて送信済みとみなす
+            logger.warning("Could not verify interrupted post, assuming it was sent", extra={
+                'channel_id': channel.slack_channel_id,
+                'arxiv_id': item.paper.arxiv_id
+            })
+        self._mark_posted(db, channel, item)
+        return False
+
+    @staticmethod
+    def _mark_posted(db, channel, item: RunItem, message_ts: Optional[str] = None):
+        exists = db.query(PaperDelivery.id).filter_by(channel_id=channel.id, paper_id=item.paper_id).first()
+        if not exists:
+            db.add(PaperDelivery(channel_id=channel.id, paper_id=item.paper_id, keyword_id=item.keyword_id,
+                                 message_ts=message_ts))
+        item.state = 'posted'
+
+    @staticmethod
+    def _prune_items(db):
+        """配信済み・失敗した古い作業項目を削除"""
+        cutoff = datetime.now(pytz.UTC) - _ITEM_RETENTION
+        db.query(RunItem)\
+            .filter(RunItem.state.in_(('posted', 'failed')), RunItem.updated_at < cutoff)\
+            .delete(synchronize_session=False)
+        db.commit()
+
+    def _deliver(self, db, channels) -> str:
+        """配信が済んでいない論文を、チャンネルの優先度・関連度の高い順にトークン予算の範囲で要約して通知
+
+        要約は SummaryPool で先の論文の分を並行して生成し、投稿は優先度の順に行う。
+        要約を保存したら summarized、送信の直前に posting、送信できたら posted に進める。
+        OpenAIやSlackのサーキットが開いた場合は、残りの論文を作業項目のまま次の実行に回す。
+        """
+        queue, items = self._pending_items(db, channels)
+        if not len(queue):
+            return 'ok'
+        logger.info("Delivering papers", extra={'papers': len(queue)})
+        with SummaryPool(queue, self._summary_target(items)) as pool:
+            for (channel, paper, keyword), pending in pool:
+                if not self._running:
+                    logger.warning("Scheduler stopping, interrupting paper check")
+                    return 'interrupted'
+                if not self._owns(channel):
+                    continue
+                
+                item = items[(channel.id, paper.id)]
+                if pending is not None:
+                    if not self._wait_summary(db, paper, pending) and service_policy('openai').breaker.is_open:
+                        return self._defer_remaining(1 + pool.close(), 'openai')
+                    # 要約は論文に保存済みなので、再開時にもう一度生成することはない
+                    if not self.advance_item(db, item, ('fetched',), 'summarized'):
+                        continue  # /paper_check_now が先に投稿した
+                if not self._post_paper(db, channel, paper, keyword, item) and service_policy('slack').breaker.is_open:
+                    return self._defer_remaining(1 + pool.close(), 'slack')
+        return 'ok'
+
+    @staticmethod
+    def _defer_remaining(count: int, service: str) -> str:
+        logger.warning("Service unavailable, deferring delivery", extra={'service': service, 'papers': count})
+        return 'deferred'
+
+    def _process_keyword(self, db, channel, keyword, span) -> List:
+        """1つのキーワードについて新着論文を取得"""
+        log_fields = {'channel_id': channel.slack_channel_id, 'keyword': keyword.word}
+        logger.debug("Searching papers for keyword", extra=log_fields)
+        try:
+            papers = ArxivService.fetch_and_process_papers(
+                db,
+                keyword.word,
+                channel.slack_channel_id,
+                commit=False  # 作業項目・検索済みの記録と合わせてコミットする
+            )
+            
+            if not papers:
+                logger.info("No new papers found", extra=log_fields)
+                if span:
+                    span.outcome = 'empty'
+                return []
             
-            print(f"\n=== Completed paper check at {datetime.now(self.timezone).strftime('%Y-%m-%d %H:%M:%S %Z')} ===\n")
+            logger.info("Found new papers", extra={**log_fields, 'papers': len(papers)})
+            return papers
         
-        except Exception as e:
-            print(f"Error in scheduled check: {e}")
-            import traceback
-            print(traceback.format_exc())
-        finally:
-            db.close()
+        except Exception:
+            if span:
+                span.outcome = 'error'
+            logger.exception("Error processing keyword", extra=log_fields)
+            return []
+
+    def _post_paper(self, db, channel, paper, keyword, item: RunItem) -> bool:
+        """論文を通知し、送信できたら配信済みとして記録"""
+        log_fields = {'channel_id': channel.slack_channel_id, 'keyword': keyword.word, 'arxiv_id': paper.arxiv_id}
+        with trace_span('slack_post', arxiv_id=paper.arxiv_id) as post_span:
+            try:
+                # 送信中に停止した場合に、再開時に投稿済みかを確認できるようにする
+                # （担当のリースが引き継がれていれば投稿しない。送信した後の配信済みの記録は引き継がれていても残す）
+                if not self.advance_item(db, item, ('fetched', 'summarized'), 'posting', self._fence(db, [channel])):
+                    logger.debug("Paper already taken by another delivery", extra=log_fields)
+                    return True
+                
+                logger.debug("Sending notification", extra=log_fields)
+                with self._lock:
+                    message_ts = self.slack_service.send_paper_message(
+                        channel.slack_channel_id,
+                        paper,
+                        keyword.word
+                    )
+                sent = message_ts is not None
+                SCHEDULER_PAPERS_TOTAL.inc(outcome='posted' if sent else 'failed')
+                if sent:
+                    self._mark_posted(db, channel, item, message_ts)
+                else:
+                    item.attempts += 1
+                    item.state = 'failed' if item.attempts >= _MAX_POST_ATTEMPTS else 'summarized'
+                    if post_span:
+                        post_span.outcome = 'failed'
+                db.commit()
+                logger.debug("Notification sent", extra={**log_fields, 'sent': sent})
+                return sent
+            except Exception:
+                db.rollback()
+                SCHEDULER_PAPERS_TOTAL.inc(outcome='failed')
+                if post_span:
+                    post_span.outcome = 'error'
+                logger.exception("Error sending notification", extra=log_fields)
+                return False
 
     def start(self):
         """スケジューラーの開始"""
         if self._running:
-            print("Scheduler is already running")
+            logger.info("Scheduler is already running")
             return
         
-        print("\n=== Initializing Scheduler ===")
+        logger.info("Initializing scheduler")
         self._running = True
+        self.leases.start()
         
-        # 設定された全ての時刻でスケジュール実行を設定
-        for schedule_time in SCHEDULE_TIMES:
-            schedule.every().day.at(schedule_time).do(self.check_new_papers)
-            print(f"📅 Scheduled paper check at {schedule_time} {TIMEZONE}")
+        # 直近の実行時刻の処理が済んでいないチャンネルは起動後すぐに実行する
+        db = SessionLocal()
+        try:
+            with self._dispatch_lock:
+                self._sync_jobs(db, catch_up=True)
+        finally:
+            db.close()
         
-        # 次回の実行時刻を表示
-        next_run = schedule.next_run()
-        if next_run:
-            next_run_local = pytz.utc.localize(next_run).astimezone(self.timezone)
-            print(f"Next check scheduled for: {next_run_local.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        next_due = self._timers.next_due()
+        logger.info("📅 Scheduled paper checks", extra={
+            'channels': len(self._timers),
+            'next_run': next_due.astimezone(self.timezone).isoformat() if next_due else None,
+            'jitter_seconds': SCHEDULE_JITTER_SECONDS
+        })
         
         def run_scheduler():
-            """スケジューラーのメインループ"""
+            """スケジューラーのメインループ（次の実行時刻まで眠る）"""
             while self._running:
                 try:
-                    schedule.run_pending()
-                    time.sleep(1)
-                except Exception as e:
-                    print(f"Error in scheduler loop: {e}")
+                    self.run_pending()
+                    self._timers.wait(_SYNC_SECONDS)
+                except Exception:
+                    logger.exception("Error in scheduler loop")
                     time.sleep(5)  # エラー時は少し長めに待機
         
         # 別スレッドでスケジューラーを実行
         self._thread = threading.Thread(target=run_scheduler, daemon=True)
         self._thread.start()
-        print("=== Scheduler thread started ===\n")
-        
-        # 初回の実行
-        print("\n=== Running initial paper check ===")
-        self.check_new_papers()
+        logger.info("Scheduler thread started")
 
     def stop(self):
         """スケジューラーの停止"""
-        print("\n=== Stopping Scheduler ===")
+        logger.info("Stopping scheduler")
         self._running = False
+        self._timers.wake()
         if self._thread:
             self._thread.join(timeout=30)  # 最大30秒待機
             if self._thread.is_alive():
-                print("Warning: Scheduler thread did not stop gracefully")
+                logger.warning("Scheduler thread did not stop gracefully")
             else:
-                print("Scheduler stopped successfully")
-        schedule.clear()
-        print("=== Scheduler shutdown complete ===\n")
+                logger.info("Scheduler stopped successfully")
+        self.leases.stop()
+        logger.info("Scheduler shutdown complete")
 
     @property
     def is_running(self) -> bool:
@@ -1,78 +1,141 @@
 # paper_harvester/services/slack_service.py
 
+import json
+import logging
+from datetime import datetime
 from slack_bolt import App
+from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
-from typing import Optional
-from config import SLACK_BOT_TOKEN
+from typing import Callable, Optional, TypeVar
+from urllib.error import URLError
+from config import SLACK_BOT_TOKEN, SLACK_API_URL, SLACK_STREAM_UPDATE_SECONDS, MAX_RETRIES
 from utils.message_builder import create_paper_message_blocks, create_summary_blocks
 import time
+from utils.metrics import registry
+from utils.resilience import service_policy, CircuitOpenError
+
+T = TypeVar('T')
+
+SLACK_SEND_SECONDS = registry.histogram(
+    'paper_harvester_slack_send_seconds',
+    '論文メッセージ（本文とスレッド）の送信にかかった時間（リトライ待機を含む）',
+    ['status']
+)
+SLACK_API_ERRORS_TOTAL = registry.counter(
+    'paper_harvester_slack_api_errors_total',
+    'Slack APIのエラー件数（ratelimited は429）',
+    ['error']
+)
+SLACK_STREAM_UPDATES_TOTAL = registry.counter(
+    'paper_harvester_slack_stream_updates_total',
+    '生成中の要約によるメッセージ更新（chat.update）の結果',
+    ['result']
+)
+
+logger = logging.getLogger(__name__)
+
+def _is_retryable(error: Exception) -> bool:
+    """レート制限・5xx・接続エラーは再試行する（channel_not_found などはそのまま失敗させる）"""
+    if isinstance(error, SlackApiError):
+        SLACK_API_ERRORS_TOTAL.inc(error=error.response['error'])
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (URLError, OSError))
+
+def _retry_after(error: Exception) -> Optional[float]:
+    if isinstance(error, SlackApiError) and error.response.status_code == 429:
+        return float(error.response.headers.get('Retry-After', 1))
+    return None
+
+def call_slack(func: Callable[[], T], max_retries: int = MAX_RETRIES) -> T:
+    """Slack APIの呼び出しを共通のサーキットブレーカーと再試行の方針で実行"""
+    return service_policy('slack').call(func, retryable=_is_retryable, retry_after=_retry_after, max_retries=max_retries)
 
 class SlackService:
     def __init__(self):
         """Slackサービスの初期化"""
-        print("\nInitializing Slack Service...")
-        self.app = App(token=SLACK_BOT_TOKEN)
+        logger.info("Initializing Slack service")
+        self.app = App(client=WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL))
         self.setup_handlers()
     
     def setup_handlers(self):
         """ハンドラーのセットアップ"""
-        print("Setting up command handlers...")
+        logger.debug("Setting up command handlers")
         from handlers.command_handlers import setup_command_handlers
         setup_command_handlers(self.app)
         
-        # アクションハンドラは一時的に無効化
-        # print("Setting up action handlers...")
-        # from handlers.action_handlers import setup_action_handlers
-        # setup_action_handlers(self.app)
+        logger.debug("Setting up action handlers")
+        from handlers.action_handlers import setup_action_handlers
+        setup_action_handlers(self.app)
     
-    def send_paper_message(self, channel_id: str, paper, keyword: Optional[str] = None, max_retries: int = 3):
-        """論文メッセージの送信"""
-        retry_count = 0
-        while retry_count < max_retries:
-            try:
-                print(f"\nSending message for paper: {paper.title}")
-                
-                # メインメッセージを送信
-                print("Posting main message...")
-                main_message = self.app.client.chat_postMessage(
-                    channel=channel_id,
-                    blocks=create_paper_message_blocks(paper, keyword),
-                    text=f"新着論文: {paper.title}"
-                )
-                
-                # スレッドに要約を送信
-                print("Posting summary in thread...")
-                thread_message = self.app.client.chat_postMessage(
-                    channel=channel_id,
-                    thread_ts=main_message['ts'],
-                    blocks=create_summary_blocks(paper),
-                    text=f"論文の要約とアブストラクト"
-                )
-                
-                print("Messages posted successfully")
-                return True
-                
-            except SlackApiError as e:
-                retry_count += 1
-                print(f"Slack API error (attempt {retry_count}): {e}")
-                if e.response['error'] == 'ratelimited':
-                    # レートリミットの場合、指定された時間待機
-                    retry_after = int(e.response.headers.get('Retry-After', 30))
-                    print(f"Rate limited. Waiting {retry_after} seconds...")
-                    time.sleep(retry_after)
-                else:
-                    # その他のエラーの場合は5秒待機
-                    time.sleep(5)
-                
-                if retry_count >= max_retries:
-                    print(f"Failed to send message after {max_retries} attempts")
-                    return False
-                
-            except Exception as e:
-                print(f"Error sending message: {e}")
-                import traceback
-                print(traceback.format_exc())
-                return False
+    def send_paper_message(self, channel_id: str, paper, keyword: Optional[str] = None,
+                           max_retries: int = MAX_RETRIES) -> Optional[str]:
+        """論文メッセージの送信（送信できたらメインメッセージの ts、できなければ None）"""
+        started = time.perf_counter()
+        ts = None
+        try:
+            ts = self._send_paper_message(channel_id, paper, keyword, max_retries)
+            return ts
+        finally:
+            SLACK_SEND_SECONDS.observe(time.perf_counter() - started, status='ok' if ts else 'failed')
+    
+    def _send_paper_message(self, channel_id: str, paper, keyword: Optional[str], max_retries: int) -> Optional[str]:
+        """論文メッセージとスレッドの要約を送信（それぞれ一時的な失敗は共通の方針で再試行）"""
+        log_fields = {'channel_id': channel_id, 'arxiv_id': paper.arxiv_id}
+        try:
+            # メインメッセージを送信
+            main_message = call_slack(lambda: self.app.client.chat_postMessage(
+                channel=channel_id,
+                blocks=create_paper_message_blocks(paper, keyword),
+                text=f"新着論文: {paper.title}"
+            ), max_retries)
+        except CircuitOpenError as e:
+            logger.warning("Slack unavailable, message not sent", extra={**log_fields, 'retry_in': round(e.retry_in)})
+            return None
+        except SlackApiError as e:
+            logger.error("Failed to send message", extra={**log_fields, 'error': e.response['error']})
+            return None
+        except Exception:
+            logger.exception("Error sending message", extra=log_fields)
+            return None
+        
+        ts = main_message['ts']
+        # スレッドに要約を送信（失敗してもメインメッセージは送信済みとして扱い、送り直さない）
+        try:
+            call_slack(lambda: self.app.client.chat_postMessage(
+                channel=channel_id,
+                thread_ts=ts,
+                blocks=create_summary_blocks(paper),
+                text=f"論文の要約とアブストラクト"
+            ), max_retries)
+        except CircuitOpenError as e:
+            logger.warning("Slack unavailable, summary reply not sent", extra={**log_fields, 'ts': ts, 'retry_in': round(e.retry_in)})
+        except SlackApiError as e:
+            logger.error("Failed to send summary reply", extra={**log_fields, 'ts': ts, 'error': e.response['error']})
+        except Exception:
+            logger.exception("Error sending summary reply", extra={**log_fields, 'ts': ts})
+        else:
+            logger.debug("Messages posted", extra={**log_fields, 'ts': ts})
+        return ts
+    
+    def find_paper_message(self, channel_id: str, paper, since: datetime) -> Optional[bool]:
+        """since 以降にチャンネルへ論文のメッセージを投稿済みか（確認できなかった場合は None）
+
+        送信中に停止した論文を、再開時に送り直すかどうかの判断に使う。
+        """
+        marker = f"arxiv.org/abs/{paper.base_id or paper.arxiv_id}"
+        try:
+            response = call_slack(lambda: self.app.client.conversations_history(
+                channel=channel_id,
+                oldest=f"{since.timestamp() - 60:.6f}",  # 時計のずれを見込む
+                limit=200
+            ))
+        except Exception as e:
+            logger.warning("Could not read channel history", extra={'channel_id': channel_id, 'error': str(e)})
+            return None
+        return any(
+            marker in message.get('text', '') or marker in json.dumps(message.get('blocks', []), ensure_ascii=False)
+            for message in response.get('messages', [])
+        )
     
     def update_message(self, channel_id: str, message_ts: str, blocks, text: str):
         """メッセージの更新"""
@@ -85,7 +148,7 @@ class SlackService:
             )
             return True
         except SlackApiError as e:
-            print(f"Error updating message: {e}")
+            logger.warning("Error updating message", extra={'channel_id': channel_id, 'ts': message_ts, 'error': e.response['error']})
             return False
     
     def delete_message(self, channel_id: str, message_ts: str):
@@ -97,7 +160,7 @@ class SlackService:
             )
             return True
         except SlackApiError as e:
-            print(f"Error deleting message: {e}")
+            logger.warning("Error deleting message", extra={'channel_id': channel_id, 'ts': message_ts, 'error': e.response['error']})
             return False
     
     def get_channel_info(self, channel_id: str):
@@ -106,5 +169,58 @@ class SlackService:
             response = self.app.client.conversations_info(channel=channel_id)
             return response['channel']
         except SlackApiError as e:
-            print(f"Error getting channel info: {e}")
-            return None
\ No newline at end of file
+            logger.warning("Error getting channel info", extra={'channel_id': channel_id, 'error': e.response['error']})
+            return None
+
+class ProgressiveMessage:
+    """生成中のテキストで投稿済みのメッセージを間引きながら更新する
+
+    chat.update は SLACK_STREAM_UPDATE_SECONDS に1回までに抑え、受信済みのテキストのうち
+    改行まで届いた行（要約のセクション単位）だけを表示する。レート制限を受けた場合は
+    Retry-After の間は更新を見送り、最後の更新だけは待ってでも送る。
+    """
+
+    def __init__(self, client: WebClient, channel_id: str, ts: str, interval: float = SLACK_STREAM_UPDATE_SECONDS):
+        self.client = client
+        self.channel_id = channel_id
+        self.ts = ts
+        self.interval = interval
+        self._shown = ''
+        self._next_update = time.monotonic() + interval  # 投稿直後の更新もレート制限に数えられる
+
+    def update(self, text: str):
+        """受信済みのテキスト全体を渡す（間隔が空いていれば完了した行までを表示）"""
+        now = time.monotonic()
+        if now < self._next_update:
+            return
+        visible = text[:text.rfind('\n') + 1].rstrip()
+        if not visible or visible == self._shown:
+            return
+        self._send(visible, f"{visible}\n…", now)
+
+    def finish(self, text: str, max_retries: int = 3) -> bool:
+        """最終的なテキストで更新（レート制限中は解除を待つ）"""
+        for _ in range(max_retries):
+            wait = self._next_update - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            if self._send(text, text, time.monotonic()):
+                return True
+        logger.error("Failed to finish streamed message", extra={'channel_id': self.channel_id, 'ts': self.ts})
+        return False
+
+    def _send(self, shown: str, text: str, now: float) -> bool:
+        try:
+            self.client.chat_update(channel=self.channel_id, ts=self.ts, text=text)
+            SLACK_STREAM_UPDATES_TOTAL.inc(result='ok')
+            self._shown = shown
+            self._next_update = now + self.interval
+            return True
+        except SlackApiError as e:
+            error = e.response['error']
+            SLACK_API_ERRORS_TOTAL.inc(error=error)
+            SLACK_STREAM_UPDATES_TOTAL.inc(result=error)
+            retry_after = int(e.response.headers.get('Retry-After', 1)) if error == 'ratelimited' else 0
+            self._next_update = now + max(self.interval, retry_after)
+            logger.debug("Streamed update failed", extra={'channel_id': self.channel_id, 'ts': self.ts, 'error': error})
+            return False
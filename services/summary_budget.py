@@ -0,0 +1,286 @@
+# paper_harvester/services/summary_budget.py
+
+import heapq
+import itertools
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import pytz
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from config import (
+    SessionLocal,
+    TIMEZONE,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_DAILY_TOKEN_BUDGET,
+    OPENAI_CHANNEL_DAILY_TOKEN_BUDGET,
+    SUMMARY_SHORT_PROMPT_RATIO,
+    SUMMARY_COMPLETION_TOKENS,
+    OPENAI_PRICE_PER_1M_TOKENS
+)
+from models.database import Paper, TokenUsage
+from services.openai_service import OpenAIService, MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+from services.relevance import RelevanceScorer
+from services.run_tracer import trace_span
+from utils.keyword_query import keyword_query, search_terms
+from utils.metrics import registry
+
+SUMMARIES_TOTAL = registry.counter(
+    'paper_harvester_summaries_total',
+    '要約の結果（full/short: 生成, cached: 保存済みの要約を再利用, abstract: 予算不足でアブストラクトのみ, failed: 生成失敗）',
+    ['mode']
+)
+OPENAI_BUDGET_REMAINING_TOKENS = registry.gauge(
+    'paper_harvester_openai_budget_remaining_tokens',
+    '本日の全チャンネル合計のトークン予算の残り'
+)
+OPENAI_COST_USD_TOTAL = registry.counter(
+    'paper_harvester_openai_cost_usd_total',
+    'OpenAI APIの推定利用料金（USD、OPENAI_PRICE_PER_1M_TOKENS で計算）'
+)
+
+logger = logging.getLogger(__name__)
+
+def token_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """トークン数から推定料金（USD）を計算"""
+    return (prompt_tokens * OPENAI_PRICE_PER_1M_TOKENS['prompt']
+            + completion_tokens * OPENAI_PRICE_PER_1M_TOKENS['completion']) / 1_000_000
+
+class SummaryBudget:
+    """日ごと・チャンネルごとのトークン使用量を token_usage テーブルで管理し、予算の範囲で要約する
+
+    残りに余裕があれば通常の要約、残りが予算の SUMMARY_SHORT_PROMPT_RATIO を切ったら短い要約、
+    短い要約の見込みの消費量にも足りなければ要約せずアブストラクトだけにする。
+    使用量は複数ノードで同じテーブルに加算する（同時に実行中のリクエストの分だけ予算を超えることがある）。
+    """
+
+    def __init__(self, openai_service: Optional[OpenAIService] = None):
+        self.openai_service = openai_service or OpenAIService()
+
+    @staticmethod
+    def today() -> str:
+        return datetime.now(pytz.timezone(TIMEZONE)).date().isoformat()
+
+    @classmethod
+    def usage(cls, db, day: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """チャンネルごとの使用量（requests, prompt_tokens, completion_tokens）"""
+        rows = db.query(
+            TokenUsage.slack_channel_id,
+            func.sum(TokenUsage.requests),
+            func.sum(TokenUsage.prompt_tokens),
+            func.sum(TokenUsage.completion_tokens)
+        ).filter_by(day=day or cls.today()).group_by(TokenUsage.slack_channel_id)
+        return {
+            channel_id: {'requests': requests or 0, 'prompt_tokens': prompt or 0, 'completion_tokens': completion or 0}
+            for channel_id, requests, prompt, completion in rows
+        }
+
+    @staticmethod
+    def total_tokens(usage: Dict[str, int]) -> int:
+        return usage.get('prompt_tokens', 0) + usage.get('completion_tokens', 0)
+
+    def estimate(self, paper_info: Dict[str, str], mode: str) -> int:
+        """要約1件の消費トークン数の見込み"""
+        prompt = self.openai_service.create_prompt(paper_info, mode)
+        return estimate_tokens(prompt) + MESSAGE_OVERHEAD_TOKENS + SUMMARY_COMPLETION_TOKENS[mode]
+
+    def choose_mode(self, db, slack_channel_id: str, paper_info: Dict[str, str]) -> str:
+        """予算の残りから要約の種類（'full', 'short' または 'abstract'）を選ぶ"""
+        usage = self.usage(db)
+        total_used = sum(self.total_tokens(u) for u in usage.values())
+        channel_used = self.total_tokens(usage.get(slack_channel_id, {}))
+
+        limits = []  # (残り, 予算)
+        if OPENAI_DAILY_TOKEN_BUDGET > 0:
+            remaining = max(OPENAI_DAILY_TOKEN_BUDGET - total_used, 0)
+            OPENAI_BUDGET_REMAINING_TOKENS.set(remaining)
+            limits.append((remaining, OPENAI_DAILY_TOKEN_BUDGET))
+        if OPENAI_CHANNEL_DAILY_TOKEN_BUDGET > 0:
+            limits.append((max(OPENAI_CHANNEL_DAILY_TOKEN_BUDGET - channel_used, 0), OPENAI_CHANNEL_DAILY_TOKEN_BUDGET))
+
+        full_cost = self.estimate(paper_info, 'full')
+        if all(remaining - full_cost >= budget * SUMMARY_SHORT_PROMPT_RATIO for remaining, budget in limits):
+            return 'full'
+        short_cost = self.estimate(paper_info, 'short')
+        if all(remaining >= short_cost for remaining, _ in limits):
+            return 'short'
+        return 'abstract'
+
+    def record(self, db, slack_channel_id: str, mode: str, prompt_tokens: int, completion_tokens: int):
+        """使用量を加算"""
+        day = self.today()
+        values = {
+            TokenUsage.requests: TokenUsage.requests + 1,
+            TokenUsage.prompt_tokens: TokenUsage.prompt_tokens + prompt_tokens,
+            TokenUsage.completion_tokens: TokenUsage.completion_tokens + completion_tokens,
+        }
+        query = db.query(TokenUsage).filter_by(day=day, slack_channel_id=slack_channel_id, mode=mode)
+        if not query.update(values, synchronize_session=False):
+            db.add(TokenUsage(
+                day=day,
+                slack_channel_id=slack_channel_id,
+                mode=mode,
+                requests=1,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens
+            ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # 同じ日・チャンネルの行を他のノードが先に作成した
+            db.rollback()
+            query.update(values, synchronize_session=False)
+            db.commit()
+        OPENAI_COST_USD_TOTAL.inc(token_cost(prompt_tokens, completion_tokens))
+
+    def summarize(self, db, channel, paper, on_delta: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """予算の範囲で論文の要約を生成して保存（保存済みの要約は再利用し、予算不足や失敗の場合は None）
+
+        on_delta を指定した場合はストリーミングで生成し、受信済みのテキストを受信のたびに渡す。
+        """
+        if paper.summary:
+            SUMMARIES_TOTAL.inc(mode='cached')
+            return paper.summary
+
+        paper_info = {
+            'title': paper.title,
+            'authors': paper.authors,
+            'abstract': paper.abstract or ''
+        }
+        log_fields = {'channel_id': channel.slack_channel_id, 'arxiv_id': paper.arxiv_id}
+        mode = self.choose_mode(db, channel.slack_channel_id, paper_info)
+        if mode == 'abstract':
+            SUMMARIES_TOTAL.inc(mode='abstract')
+            logger.info("Token budget exhausted, posting abstract only", extra=log_fields)
+            return None
+
+        with trace_span('summarize', arxiv_id=paper.arxiv_id) as span:
+            summary, prompt_tokens, completion_tokens = self.openai_service.summarize(paper_info, mode, on_delta)
+            if span and summary is None:
+                span.outcome = 'error'
+        if prompt_tokens or completion_tokens:
+            self.record(db, channel.slack_channel_id, mode, prompt_tokens, completion_tokens)
+        if summary is None:
+            SUMMARIES_TOTAL.inc(mode='failed')
+            return None
+
+        SUMMARIES_TOTAL.inc(mode=mode)
+        logger.debug("Summary stored", extra={**log_fields, 'mode': mode, 'tokens': prompt_tokens + completion_tokens})
+        # 同じ論文を他のチャンネルへ配信するときは保存済みの要約を使う
+        paper.summary = summary
+        db.commit()
+        return summary
+
+class SummaryQueue:
+    """要約・投稿待ちの論文をチャンネルの優先度、関連度の順に取り出すキュー
+
+    予算が尽きる前に、優先度の高いチャンネルの関連度の高い論文から要約されるようにする。
+    関連度はチャンネルのキーワードに対するスコアで、優先度が同じチャンネルの間ではそのまま比較する。
+    """
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._queued = set()  # (チャンネルID, 論文ID)
+
+    def extend(self, channel, items: Sequence[Tuple[object, object]]):
+        """チャンネルの (論文, キーワード) を追加（同じチャンネルに追加済みの論文は除く）"""
+        items = [(paper, keyword) for paper, keyword in items if (channel.id, paper.id) not in self._queued]
+        if not items:
+            return
+        self._queued.update((channel.id, paper.id) for paper, _ in items)
+        words = [k.word for k in channel.keywords] or [keyword.word for _, keyword in items]
+        terms = [term for word in words for term in search_terms(keyword_query(word))]
+        scores = RelevanceScorer.score([{'title': p.title, 'abstract': p.abstract} for p, _ in items], terms)
+        priority = (channel.config.priority or 0) if channel.config else 0
+        for (paper, keyword), score in zip(items, scores):
+            heapq.heappush(self._heap, (-priority, -float(score), next(self._counter), channel, paper, keyword))
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[Tuple[object, object, object]]:
+        """(チャンネル, 論文, キーワード) を優先度順に取り出す"""
+        while self._heap:
+            _, _, _, channel, paper, keyword = heapq.heappop(self._heap)
+            yield channel, paper, keyword
+
+class SummaryPool:
+    """entries を順に返しながら、先の論文の要約を最大 workers 件まで並行して生成するイテレーター
+
+    target(entry) が (SlackチャンネルID, 論文ID) を返すエントリーだけを要約し（None なら要約しない）、
+    (エントリー, 要約の Future または None) を entries の順に返す。複数のチャンネルに配信する論文は1回だけ要約し、
+    後のエントリーは同じ Future で待つ（使用量は最初のチャンネルの分として記録する）。各ワーカーは自分のセッションで論文を読み直して
+    SummaryBudget.summarize を呼ぶので、呼び出し側は Future の完了後に論文を読み直す。
+    送信の間隔とトークン数は OpenAIService の rate_limiter が調整する。
+    途中で読むのをやめる場合は close() で先読みした要約を取り消す（with 文でも閉じる）。
+    """
+
+    def __init__(self, entries: Iterable[Any], target: Callable[[Any], Optional[Tuple[str, int]]],
+                 budget: Optional[SummaryBudget] = None, workers: int = OPENAI_MAX_CONCURRENCY):
+        self.budget = budget or SummaryBudget()
+        self.workers = max(1, workers)
+        self._entries = iter(entries)
+        self._target = target
+        self._ahead: deque = deque()  # (エントリー, Future または None)
+        self._by_paper: Dict[int, Future] = {}  # 論文ID → 要約の Future
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='summary')
+        self._closed = False
+
+    def _summarize(self, slack_channel_id: str, paper_id: int) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            paper = db.get(Paper, paper_id)
+            if paper is None:
+                return None
+            return self.budget.summarize(db, SimpleNamespace(slack_channel_id=slack_channel_id), paper)
+        except Exception:
+            db.rollback()
+            logger.exception("Error summarizing paper", extra={'channel_id': slack_channel_id, 'paper_id': paper_id})
+            return None
+        finally:
+            db.close()
+
+    def _fill(self):
+        """先読みした要約が workers の2倍になるまで先のエントリーを読む（投稿の間もワーカーを空けない）"""
+        while len({future for _, future in self._ahead if future is not None}) < self.workers * 2:
+            entry = next(self._entries, None)
+            if entry is None:
+                return
+            target = self._target(entry)
+            future = None
+            if target:
+                slack_channel_id, paper_id = target
+                future = self._by_paper.get(paper_id)
+                if future is None:
+                    future = self._by_paper[paper_id] = self._executor.submit(self._summarize, slack_channel_id, paper_id)
+            self._ahead.append((entry, future))
+
+    def __iter__(self) -> Iterator[Tuple[Any, Optional[Future]]]:
+        while not self._closed:
+            self._fill()
+            if not self._ahead:
+                return
+            yield self._ahead.popleft()
+
+    def close(self) -> int:
+        """先読みした要約のうち始まっていないものを取り消し、返していないエントリーの件数を返す"""
+        if self._closed:
+            return 0
+        self._closed = True
+        for _, future in self._ahead:
+            if future is not None:
+                future.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        remaining = len(self._ahead) + sum(1 for _ in self._entries)
+        self._ahead.clear()
+        return remaining
+
+    def __enter__(self) -> 'SummaryPool':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
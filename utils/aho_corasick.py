@@ -0,0 +1,64 @@
+# paper_harvester/utils/aho_corasick.py
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+class AhoCorasick:
+    """Aho–Corasick法による複数パターンの同時検索
+
+    パターン数によらず、テキストを1回走査するだけで全ての出現を検出する。
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Hashable]]):
+        # ノードごとの遷移・失敗リンク・出力（一致したパターンのキー）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Hashable]] = [[]]
+
+        for pattern, key in patterns:
+            if pattern:
+                self._add(pattern, key)
+        self._build()
+
+    def _add(self, pattern: str, key: Hashable):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(key)
+
+    def _build(self):
+        """幅優先で失敗リンクを張り、失敗先の出力を引き継ぐ"""
+        # 深さ1のノードの失敗リンクはルート
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> Set[Hashable]:
+        """テキスト中に出現したパターンのキーを返す"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+    def __len__(self) -> int:
+        return len(self._goto) - 1
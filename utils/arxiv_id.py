@@ -0,0 +1,31 @@
+# paper_harvester/utils/arxiv_id.py
+
+import re
+from typing import Optional, Tuple
+
+# 新形式（2401.01234v2）と旧形式（hep-th/9901001v1）の両方に対応
+_ARXIV_ID_PATTERN = re.compile(
+    r'(?P<base>(?:\d{4}\.\d{4,5})|(?:[a-z\-]+(?:\.[A-Z]{2})?/\d{7}))(?:v(?P<version>\d+))?$'
+)
+
+def parse_arxiv_id(entry_id: str) -> Tuple[str, Optional[int]]:
+    """arXivのIDまたはURLをベースIDとバージョンに分解"""
+    text = entry_id.strip()
+    if '/abs/' in text:
+        text = text.split('/abs/', 1)[1]
+    elif '/pdf/' in text:
+        text = text.split('/pdf/', 1)[1]
+        if text.endswith('.pdf'):
+            text = text[:-4]
+    
+    match = _ARXIV_ID_PATTERN.search(text)
+    if not match:
+        # 想定外の形式はそのままベースIDとして扱う
+        return text, None
+    
+    version = match.group('version')
+    return match.group('base'), int(version) if version else None
+
+def format_arxiv_id(base_id: str, version: Optional[int] = None) -> str:
+    """ベースIDとバージョンからarXiv IDを組み立て"""
+    return f"{base_id}v{version}" if version else base_id
@@ -0,0 +1,328 @@
+# paper_harvester/utils/keyword_query.py
+"""購読キーワードのクエリ言語
+
+    large language model              隣接する語は1つのフレーズ
+    "diffusion model" AND cat:cs.CV   フレーズとカテゴリの組み合わせ
+    (LLM OR "language model") NOT survey
+
+演算子は大文字の AND / OR / NOT（優先順位は NOT > AND > OR）。
+フレーズ・カテゴリ・括弧が並んだ場合は AND とみなす。
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple, Union
+from config import KEYWORD_SYNONYMS
+
+class KeywordQueryError(ValueError):
+    """キーワードの構文エラー"""
+
+@dataclass(frozen=True)
+class Term:
+    text: str
+
+@dataclass(frozen=True)
+class Category:
+    name: str
+
+@dataclass(frozen=True)
+class Not:
+    child: 'Node'
+
+@dataclass(frozen=True)
+class And:
+    children: Tuple['Node', ...]
+
+@dataclass(frozen=True)
+class Or:
+    children: Tuple['Node', ...]
+
+Node = Union[Term, Category, Not, And, Or]
+
+_OPERATORS = ('AND', 'OR', 'NOT')
+_TOKEN_PATTERN = re.compile(r'\s*(?:"(?P<phrase>[^"]*)"|(?P<paren>[()])|(?P<word>[^\s()"]+))')
+_CATEGORY_PATTERN = re.compile(r'^[a-z][a-z\-]*(?:\.[a-z][a-z\-]*)?$', re.IGNORECASE)
+_PLAIN_TERM_PATTERN = re.compile(r'^[^\s()":]+$')
+
+def normalize_term(text: str) -> str:
+    """語句を正規化（NFKC・小文字化・空白の統一）し、同義語を代表表記に置き換え"""
+    text = ' '.join(unicodedata.normalize('NFKC', text).lower().replace('"', ' ').split())
+    return _synonym_index().get(text, text)
+
+def normalize_category(name: str) -> str:
+    """arXivカテゴリ表記を正規化（cs.cv → cs.CV、physics.optics はそのまま）"""
+    archive, _, subject = name.partition('.')
+    archive = archive.lower()
+    if not subject:
+        return archive
+    subject = subject.upper() if len(subject) <= 2 else subject.lower()
+    return f"{archive}.{subject}"
+
+_synonyms_cache: Dict[str, str] = {}
+
+def _synonym_index() -> Dict[str, str]:
+    """表記ゆれ → 代表表記 の対応表"""
+    if not _synonyms_cache and KEYWORD_SYNONYMS:
+        for canonical, variants in KEYWORD_SYNONYMS.items():
+            key = ' '.join(unicodedata.normalize('NFKC', canonical).lower().split())
+            for variant in variants:
+                _synonyms_cache[' '.join(unicodedata.normalize('NFKC', variant).lower().split())] = key
+    return _synonyms_cache
+
+def _variants(term: Term) -> List[str]:
+    """代表表記とその同義語（検索時にORで展開する表記）"""
+    return [term.text] + sorted(v for v, c in _synonym_index().items() if c == term.text and v != term.text)
+
+class _Parser:
+    """再帰下降パーサー"""
+
+    def __init__(self, text: str):
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> List[Tuple[str, str]]:
+        tokens = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            match = _TOKEN_PATTERN.match(text, pos)
+            if not match or match.end() == pos:
+                raise KeywordQueryError('閉じられていない引用符があります')
+            pos = match.end()
+            if match.group('phrase') is not None:
+                tokens.append(('phrase', match.group('phrase')))
+            elif match.group('paren'):
+                tokens.append((match.group('paren'), match.group('paren')))
+            else:
+                word = match.group('word')
+                if word in _OPERATORS:
+                    tokens.append((word, word))
+                elif word.lower().startswith('cat:'):
+                    tokens.append(('cat', word[4:]))
+                else:
+                    tokens.append(('word', word))
+        return tokens
+
+    def _peek(self) -> str:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else 'end'
+
+    def _take(self) -> Tuple[str, str]:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise KeywordQueryError('キーワードが空です')
+        node = self._or()
+        if self._peek() != 'end':
+            raise KeywordQueryError(f"予期しない `{self.tokens[self.pos][1]}` があります")
+        return node
+
+    def _or(self) -> Node:
+        children = [self._and()]
+        while self._peek() == 'OR':
+            self._take()
+            children.append(self._and())
+        return Or(tuple(children)) if len(children) > 1 else children[0]
+
+    def _and(self) -> Node:
+        children = [self._unary()]
+        while self._peek() in ('AND', 'NOT', 'phrase', 'word', 'cat', '('):
+            if self._peek() == 'AND':
+                self._take()
+            children.append(self._unary())
+        return And(tuple(children)) if len(children) > 1 else children[0]
+
+    def _unary(self) -> Node:
+        if self._peek() == 'NOT':
+            self._take()
+            return Not(self._unary())
+        return self._primary()
+
+    def _primary(self) -> Node:
+        kind = self._peek()
+        if kind == '(':
+            self._take()
+            node = self._or()
+            if self._peek() != ')':
+                raise KeywordQueryError('閉じ括弧 `)` が足りません')
+            self._take()
+            return node
+        if kind == 'phrase':
+            text = normalize_term(self._take()[1])
+            if not text:
+                raise KeywordQueryError('空のフレーズ `""` は指定できません')
+            return Term(text)
+        if kind == 'cat':
+            name = self._take()[1]
+            if not _CATEGORY_PATTERN.match(name):
+                raise KeywordQueryError(f"カテゴリ `cat:{name}` の形式が正しくありません（例: `cat:cs.CV`）")
+            return Category(normalize_category(name))
+        if kind == 'word':
+            # 引用符なしで隣接する語は1つのフレーズにまとめる
+            words = [self._take()[1]]
+            while self._peek() == 'word':
+                words.append(self._take()[1])
+            return Term(normalize_term(' '.join(words)))
+        if kind == 'end':
+            raise KeywordQueryError('演算子の後に語句がありません')
+        raise KeywordQueryError(f"予期しない `{self.tokens[self.pos][1]}` があります")
+
+def _simplify(node: Node) -> Node:
+    """入れ子の平坦化・重複除去・並べ替えで等価な式を同じ形にする"""
+    if isinstance(node, Not):
+        child = _simplify(node.child)
+        return child.child if isinstance(child, Not) else Not(child)
+    if isinstance(node, (And, Or)):
+        kind = type(node)
+        flat = {}
+        for child in map(_simplify, node.children):
+            for item in (child.children if isinstance(child, kind) else (child,)):
+                flat[canonical_form(item)] = item
+        if len(flat) == 1:
+            return next(iter(flat.values()))
+        return kind(tuple(flat[key] for key in sorted(flat)))
+    return node
+
+def _validate(node: Node, negatable: bool = False):
+    """arXiv APIで表現できない否定（AND の中以外での NOT）を検出"""
+    if isinstance(node, Not):
+        if not negatable:
+            raise KeywordQueryError('NOT は AND で他の条件と組み合わせてください（例: `diffusion NOT survey`）')
+        _validate(node.child)
+    elif isinstance(node, And):
+        if all(isinstance(child, Not) for child in node.children):
+            raise KeywordQueryError('NOT だけの条件は指定できません')
+        for child in node.children:
+            _validate(child, negatable=True)
+    elif isinstance(node, Or):
+        for child in node.children:
+            _validate(child)
+
+def parse_keyword(text: str) -> Node:
+    """キーワード文字列を正規化済みの構文木に変換"""
+    node = _simplify(_Parser(text).parse())
+    _validate(node)
+    return node
+
+def keyword_query(text: str) -> Node:
+    """保存済みキーワードを構文木に変換（構文エラーの場合は全体を1つのフレーズとして扱う）"""
+    try:
+        return parse_keyword(text)
+    except KeywordQueryError:
+        return Term(normalize_term(text))
+
+def canonical_form(node: Node) -> str:
+    """構文木の正規形（再度パースすると同じ構文木になる文字列）"""
+    if isinstance(node, Term):
+        if _PLAIN_TERM_PATTERN.match(node.text) and node.text.upper() not in _OPERATORS:
+            return node.text
+        return f'"{node.text}"'
+    if isinstance(node, Category):
+        return f"cat:{node.name}"
+    if isinstance(node, Not):
+        return f"NOT {_wrap(node.child)}"
+    separator = ' AND ' if isinstance(node, And) else ' OR '
+    return separator.join(_wrap(child) for child in node.children)
+
+def canonicalize(text: str) -> str:
+    """キーワード文字列の正規形（購読の重複判定に使用）"""
+    return canonical_form(parse_keyword(text))
+
+def _wrap(node: Node) -> str:
+    return f"({canonical_form(node)})" if isinstance(node, (And, Or)) else canonical_form(node)
+
+def to_arxiv_query(node: Node) -> str:
+    """arXiv APIの search_query 文字列に変換"""
+    if isinstance(node, Term):
+        variants = [f'all:"{v}"' for v in _variants(node)]
+        return variants[0] if len(variants) == 1 else '(' + ' OR '.join(variants) + ')'
+    if isinstance(node, Category):
+        return f"cat:{node.name}"
+    if isinstance(node, Or):
+        return ' OR '.join(_wrap_arxiv(child) for child in node.children)
+    if isinstance(node, And):
+        # arXiv APIの否定は二項演算子 ANDNOT のみ
+        positives = [_wrap_arxiv(c) for c in node.children if not isinstance(c, Not)]
+        negatives = [_wrap_arxiv(c.child) for c in node.children if isinstance(c, Not)]
+        return ' AND '.join(positives) + ''.join(f" ANDNOT {n}" for n in negatives)
+    raise KeywordQueryError('NOT 単独の条件はarXivの検索式に変換できません')
+
+def _wrap_arxiv(node: Node) -> str:
+    query = to_arxiv_query(node)
+    return f"({query})" if isinstance(node, (And, Or)) else query
+
+def search_terms(node: Node) -> List[str]:
+    """関連度計算に使う肯定側の語句（同義語を含む）"""
+    if isinstance(node, Term):
+        return _variants(node)
+    if isinstance(node, (And, Or)):
+        return [term for child in node.children for term in search_terms(child)]
+    return []
+
+def to_fts_query(node: Node) -> Optional[str]:
+    """全文検索（FTS5）で候補を絞り込む式に変換（絞り込めない場合は None）
+
+    カテゴリと否定は全文検索では扱わず、候補に対する照合で評価する。
+    語句は末尾の語を前方一致にして、ローカル照合と同じく複数形なども候補に含める。
+    """
+    if isinstance(node, Term):
+        variants = [f'"{v}" *' for v in _variants(node) if any(c.isalnum() for c in v)]
+        if not variants:
+            return None
+        return variants[0] if len(variants) == 1 else '(' + ' OR '.join(variants) + ')'
+    if isinstance(node, And):
+        positives = [q for q in (to_fts_query(c) for c in node.children if not isinstance(c, Not)) if q]
+        return ' AND '.join(f"({q})" for q in positives) if positives else None
+    if isinstance(node, Or):
+        children = [to_fts_query(child) for child in node.children]
+        if not all(children):
+            return None
+        return ' OR '.join(f"({q})" for q in children)
+    return None
+
+def required_categories(node: Node) -> Optional[Set[str]]:
+    """一致する論文が必ず属するカテゴリの候補（カテゴリで限定されない場合は None）"""
+    if isinstance(node, Category):
+        return {node.name}
+    if isinstance(node, And):
+        restricted = [c for c in map(required_categories, node.children) if c is not None]
+        return min(restricted, key=len) if restricted else None
+    if isinstance(node, Or):
+        children = [required_categories(child) for child in node.children]
+        if any(c is None for c in children):
+            return None
+        return set().union(*children)
+    return None
+
+_MATCH_TABLE = {i: ' ' for i in range(128) if not chr(i).isalnum()}
+
+def normalize_match_text(text: str) -> str:
+    """照合用にテキストを正規化（英数字以外を空白にし、先頭に空白を付ける）"""
+    return ' ' + ' '.join(unicodedata.normalize('NFKC', text or '').lower().translate(_MATCH_TABLE).split()) + ' '
+
+def match_patterns(node: Node) -> List[str]:
+    """ローカル照合で検索する語句（同義語を含む、否定側も含む）"""
+    if isinstance(node, Term):
+        return _variants(node)
+    if isinstance(node, Not):
+        return match_patterns(node.child)
+    if isinstance(node, (And, Or)):
+        return [term for child in node.children for term in match_patterns(child)]
+    return []
+
+def evaluate(node: Node, found_terms: Set[str], categories: Set[str]) -> bool:
+    """構文木を評価（found_terms はテキスト中に出現した語句、categories は論文のカテゴリ）"""
+    if isinstance(node, Term):
+        return any(v in found_terms for v in _variants(node))
+    if isinstance(node, Category):
+        # cat:cs のようなアーカイブ指定は cs.CL などにも一致させる
+        return node.name in categories or any(c.startswith(node.name + '.') for c in categories)
+    if isinstance(node, Not):
+        return not evaluate(node.child, found_terms, categories)
+    if isinstance(node, And):
+        return all(evaluate(child, found_terms, categories) for child in node.children)
+    return any(evaluate(child, found_terms, categories) for child in node.children)
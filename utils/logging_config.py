@@ -0,0 +1,101 @@
+# paper_harvester/utils/logging_config.py
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from config import LOG_FORMAT, LOG_LEVEL, LOG_JSON
+
+# LogRecord が標準で持つ属性（これ以外は extra で渡された構造化フィールド）
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[QueueListener] = None
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED_ATTRS and not k.startswith('_')}
+
+def _logfmt_value(value) -> str:
+    text = str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+class _StructuredQueueHandler(QueueHandler):
+    """extra のフィールドと例外情報を保ったままキューに積む"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # トレースバックはワーカースレッド側で文字列化しておく
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class StructuredFormatter(logging.Formatter):
+    """LOG_FORMAT の後ろに extra のフィールドを key=value 形式で付加する"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        exc_text, record.exc_text = record.exc_text, None
+        message = super().format(record)
+        record.exc_text = exc_text
+        
+        fields = _fields(record)
+        if fields:
+            message += ' ' + ' '.join(f"{k}={_logfmt_value(v)}" for k, v in fields.items())
+        if exc_text:
+            message += '\n' + exc_text
+        return message
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを1行のJSONとして出力する"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({k: v if isinstance(v, (int, float, bool)) or v is None else str(v)
+                      for k, v in _fields(record).items()})
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+def setup_logging(level: Optional[str] = None, stream=None) -> QueueListener:
+    """ルートロガーを QueueHandler 経由の非同期出力に設定
+
+    ワーカースレッドはキューに積むだけで、書き込みは QueueListener のスレッドで行う。
+    """
+    global _listener
+    if _listener is not None:
+        stop_logging()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if LOG_JSON else StructuredFormatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_StructuredQueueHandler(log_queue))
+    root.setLevel(level or LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """キューに残っているログを書き出してリスナーを停止"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
@@ -2,9 +2,15 @@
 
 from typing import List, Dict, Any, Optional
 
+ABSTRACT_BLOCK_ID = 'abstract'
+ABSTRACT_SHOW_TEXT = "📖 アブストラクトを表示"
+ABSTRACT_HIDE_TEXT = "📖 アブストラクトを隠す"
+# section ブロックのテキストの上限
+_SECTION_TEXT_LIMIT = 3000
+
 def create_paper_message_blocks(paper, keyword: Optional[str] = None) -> List[Dict[str, Any]]:
     """論文情報のメッセージブロックを作成"""
-    arxiv_url = f"https://arxiv.org/abs/{paper.arxiv_id}"  # arXiv URLを生成
+    arxiv_url = f"https://arxiv.org/abs/{paper.base_id or paper.arxiv_id}"  # 最新版のarXiv URLを生成
     
     blocks = [
         {
@@ -16,8 +22,90 @@ def create_paper_message_blocks(paper, keyword: Optional[str] = None) -> List[Di
                         f"Keywords: `{keyword}`\n"
                         f"Source: <{arxiv_url}|arXiv>"  # URLを追加
             }
+        },
+        {
+            "type": "actions",
+            "block_id": "paper_actions",
+            "elements": [
+                {
+                    "type": "button",
+                    "action_id": "paper_read",
+                    "text": {"type": "plain_text", "text": "📄 論文を読む"},
+                    "url": arxiv_url
+                },
+                {
+                    "type": "button",
+                    "action_id": "paper_interest",
+                    "text": {"type": "plain_text", "text": "👍 興味あり"},
+                    "value": paper.arxiv_id
+                },
+                {
+                    "type": "button",
+                    "action_id": "paper_read_later",
+                    "text": {"type": "plain_text", "text": "📌 後で読む"},
+                    "value": paper.arxiv_id
+                }
+            ]
         }
     ]
+    if paper.abstract:
+        # アブストラクトはボタンに持たせず、押されたときに arXiv ID から取得する
+        blocks.append({
+            "type": "actions",
+            "block_id": ABSTRACT_BLOCK_ID,
+            "elements": [{
+                "type": "button",
+                "action_id": "toggle_abstract",
+                "text": {"type": "plain_text", "text": ABSTRACT_SHOW_TEXT},
+                "value": paper.arxiv_id
+            }]
+        })
+    return blocks
+
+def create_abstract_block(block_id: str, abstract: str) -> Dict[str, Any]:
+    """表示切り替えで挿入するアブストラクトのブロックを生成"""
+    text = "*アブストラクト*\n" + _escape_text(abstract)
+    if len(text) > _SECTION_TEXT_LIMIT:
+        text = text[:_SECTION_TEXT_LIMIT - 1] + "…"
+    return {
+        "type": "section",
+        "block_id": block_id,
+        "text": {"type": "mrkdwn", "text": text}
+    }
+
+READING_LIST_TITLES = {
+    'read_later': '📌 後で読むリスト',
+    'interest': '👍 興味ありの論文',
+}
+
+def create_reading_list_blocks(entries, action: str, next_cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+    """保存した論文の一覧（1ページ分）のブロックを生成"""
+    blocks = [{
+        "type": "section",
+        "text": {"type": "mrkdwn", "text": f"*{READING_LIST_TITLES[action]}*"}
+    }]
+    for entry in entries:
+        paper = entry.paper
+        arxiv_url = f"https://arxiv.org/abs/{paper.base_id or paper.arxiv_id}"
+        blocks.append({
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"<{arxiv_url}|{_escape_text(paper.title)}>\n"
+                        f"{_escape_text(paper.authors)}\n"
+                        f"保存日: {entry.created_at:%Y-%m-%d}"
+            }
+        })
+    if next_cursor:
+        blocks.append({
+            "type": "actions",
+            "elements": [{
+                "type": "button",
+                "action_id": "reading_list_next",
+                "text": {"type": "plain_text", "text": "次のページ ▶"},
+                "value": f"{action}|{next_cursor}"
+            }]
+        })
     return blocks
 
 def create_summary_blocks(paper) -> List[Dict[str, Any]]:
@@ -0,0 +1,25 @@
+# paper_harvester/utils/paper_keys.py
+
+import re
+import unicodedata
+from typing import Optional
+
+_DOI_PREFIX = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:)', re.IGNORECASE)
+_NON_WORD = re.compile(r'[\W_]+')
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """DOIを比較用の形に揃える（URL・"doi:" の接頭辞を除いて小文字にする。空なら None）"""
+    if not doi:
+        return None
+    doi = _DOI_PREFIX.sub('', doi.strip()).strip().lower()
+    return doi or None
+
+def title_key(title: str) -> str:
+    """タイトルを比較用の形に揃える（Unicode正規化・小文字化し、記号と空白を除く）"""
+    return _NON_WORD.sub('', unicodedata.normalize('NFKC', title or '').lower())
+
+def author_key(name: str) -> str:
+    """著者名を比較用の形に揃える（アクセント記号・記号を除いて小文字にし、空白を1つにまとめる）"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(_NON_WORD.sub(' ', stripped.lower()).split())
@@ -0,0 +1,130 @@
+# paper_harvester/utils/rate_limiter.py
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITER_WAIT_SECONDS = registry.histogram(
+    'paper_harvester_rate_limiter_wait_seconds',
+    'リクエスト数・トークン数・同時実行数の上限で送信を待った時間',
+    ['service'],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 15, 30, 60)
+)
+RATE_LIMITER_IN_FLIGHT = registry.gauge(
+    'paper_harvester_rate_limiter_in_flight',
+    '送信中のリクエスト数',
+    ['service']
+)
+
+# 送信した時刻とサービス側で受け付けた時刻のずれを見込んで、記録を窓より少し長く残す
+_SAFETY_SECONDS = 1.0
+
+class _Entry:
+    __slots__ = ('admitted_at', 'tokens', 'expired')
+
+    def __init__(self, admitted_at: float, tokens: int):
+        self.admitted_at = admitted_at
+        self.tokens = tokens
+        self.expired = False
+
+class Reservation:
+    """送信枠の予約（settle で見込みのトークン数を実際の使用量に置き換える）"""
+
+    def __init__(self, limiter: 'RateLimiter', entry: _Entry):
+        self._limiter = limiter
+        self._entry = entry
+
+    @property
+    def tokens(self) -> int:
+        return self._entry.tokens
+
+    def settle(self, tokens: Optional[int]):
+        """応答の使用量で見込みを置き換える（使用量が分からなければ見込みのまま残す）"""
+        if tokens is not None:
+            self._limiter._settle(self._entry, tokens)
+
+class RateLimiter:
+    """1分あたりのリクエスト数（rpm）・トークン数（tpm）と同時実行数の上限を守って送信を許可する（プロセス内で共有）
+
+    直近 window 秒に送信したリクエストを送信時刻とトークン数の記録で持ち、新しいリクエストは
+    記録の合計に見込みのトークン数を足しても上限に収まり、同時実行数に空きがあるまで待たせる。
+    見込みは応答の使用量で置き換え、見込みより少なかった分はすぐに次のリクエストに回す。
+    0 の上限は無制限。429 を受けた場合は pause で Retry-After の間すべての送信を止める。
+    """
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0, max_concurrency: int = 0, window: float = 60.0):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.window = window
+        self._entries = deque()
+        self._tokens = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _expire(self, now: float):
+        while self._entries and now - self._entries[0].admitted_at >= self.window + _SAFETY_SECONDS:
+            entry = self._entries.popleft()
+            entry.expired = True
+            self._tokens -= entry.tokens
+
+    def _wait_seconds(self, now: float, tokens: int) -> Optional[float]:
+        """送信できるなら None、そうでなければ次に確認するまでの秒数"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.max_concurrency > 0 and self._in_flight >= self.max_concurrency:
+            return self.window
+        over_requests = self.rpm > 0 and len(self._entries) >= self.rpm
+        # 1件で上限を超える見込みのリクエストは、窓が空になれば送る
+        over_tokens = self.tpm > 0 and self._entries and self._tokens + tokens > self.tpm
+        if not over_requests and not over_tokens:
+            return None
+        # 最も古い記録が窓から外れるまで待つ（見込みより少ない使用量が分かったときにも起こされる）
+        return max(self._entries[0].admitted_at + self.window + _SAFETY_SECONDS - now, 0.01)
+
+    @contextmanager
+    def reserve(self, tokens: int) -> Iterator[Reservation]:
+        """tokens の見込みで送信枠を確保し、ブロックを抜けるまで同時実行数に数える"""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                wait = self._wait_seconds(now, tokens)
+                if wait is None:
+                    break
+                self._cond.wait(wait)
+            entry = _Entry(now, tokens)
+            self._entries.append(entry)
+            self._tokens += tokens
+            self._in_flight += 1
+            RATE_LIMITER_IN_FLIGHT.set(self._in_flight, service=self.name)
+        RATE_LIMITER_WAIT_SECONDS.observe(time.monotonic() - started, service=self.name)
+        try:
+            yield Reservation(self, entry)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                RATE_LIMITER_IN_FLIGHT.set(self._in_flight, service=self.name)
+                self._cond.notify_all()
+
+    def _settle(self, entry: _Entry, tokens: int):
+        with self._cond:
+            if not entry.expired:
+                self._tokens += tokens - entry.tokens
+            entry.tokens = tokens
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """seconds 秒の間、新しい送信を止める（サービスの 429 に従う）"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.info("Rate limited by service, pausing requests", extra={'service': self.name, 'seconds': round(seconds, 2)})
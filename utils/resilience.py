@@ -0,0 +1,233 @@
+# paper_harvester/utils/resilience.py
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+from config import (
+    MAX_RETRIES,
+    RETRY_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_BUDGET_RATIO,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS
+)
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+CIRCUIT_STATE = registry.gauge(
+    'paper_harvester_circuit_state',
+    'サービスごとのサーキットブレーカーの状態（0: closed, 1: half_open, 2: open）',
+    ['service']
+)
+CIRCUIT_TRANSITIONS_TOTAL = registry.counter(
+    'paper_harvester_circuit_transitions_total',
+    'サーキットブレーカーの状態遷移の回数',
+    ['service', 'state']
+)
+SERVICE_CALLS_TOTAL = registry.counter(
+    'paper_harvester_service_calls_total',
+    '外部サービスの呼び出し結果（ok, failure: 一時的な障害, throttled: Retry-After つきの応答, error: 再試行しないエラー, '
+    'retry: 再試行, rejected: サーキットが開いていて呼び出さず, retry_budget_exhausted: 再試行の予算切れ）',
+    ['service', 'result']
+)
+
+class CircuitOpenError(Exception):
+    """サーキットが開いているため呼び出しを行わなかった"""
+
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"{service} circuit is open (retry in {retry_in:.0f}s)")
+        self.service = service
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """連続した失敗でサービスへの呼び出しを止めるサーキットブレーカー
+
+    closed: 通常どおり呼び出す。一時的な障害が failure_threshold 回続くと open にする。
+    open: reset_seconds の間は呼び出さずにすぐ失敗させる。経過後は half_open にする。
+    half_open: 1件だけ試しに呼び出し、成功すれば closed、失敗すれば再び open にする。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(0, service=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def retry_in(self) -> float:
+        """呼び出しを再開するまでの秒数（open でなければ0）"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(self._opened_at + self.reset_seconds - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """呼び出してよいか（half_open では試しの1件だけを許可する）"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def _transition(self, state: str):
+        self._state = state
+        CIRCUIT_STATE.set(self._STATE_VALUES[state], service=self.name)
+        CIRCUIT_TRANSITIONS_TOTAL.inc(service=self.name, state=state)
+        log = logger.warning if state == self.OPEN else logger.info
+        log("Circuit state changed", extra={'service': self.name, 'state': state, 'failures': self._failures})
+
+class RetryBudget:
+    """再試行の回数を、直近のリクエスト数の ratio 倍程度に抑えるトークンバケット
+
+    リクエストごとに ratio 分を積み立て、障害による再試行ごとに1を消費する（Retry-After に従う再試行は除く）。
+    障害時に全ての呼び出しが再試行して負荷を何倍にもすることを防ぐ。少ないリクエストでも再試行できるよう min_balance を持つ。
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_balance: float = 3.0, max_balance: float = 20.0):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self._balance = min_balance
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._balance = min(self._balance + self.ratio, self.max_balance)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._balance < 1.0:
+                return False
+            self._balance -= 1.0
+            return True
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """attempt 回目（0始まり）の再試行までの待機時間
+
+    RETRY_DELAY * 2^attempt（RETRY_MAX_DELAY まで）を上限とする一様乱数（フルジッタ）。
+    サービスから Retry-After が返された場合はそれに従う。
+    """
+    if retry_after is not None:
+        return max(retry_after, 0.0)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt))
+
+class ServicePolicy:
+    """1つの外部サービスに対するサーキットブレーカーと再試行の方針（プロセス内で共有）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.budget = RetryBudget()
+
+    def call(self, func: Callable[[], T],
+             retryable: Callable[[Exception], bool] = lambda e: True,
+             retry_after: Callable[[Exception], Optional[float]] = lambda e: None,
+             max_retries: int = MAX_RETRIES) -> T:
+        """func を呼び出し、一時的な障害なら間隔を空けて再試行する
+
+        retryable が False を返す例外はサービス自体は応答しているものとして、そのまま送出する。
+        retry_after が値を返す例外（429 や 503 の Retry-After）は待って再試行するが、障害には数えない。
+        サーキットが開いている場合や、Retry-After が RETRY_MAX_DELAY より長い場合は待たずに諦める。
+        """
+        self.budget.record_request()
+        for attempt in range(max_retries + 1):
+            if not self.breaker.allow():
+                SERVICE_CALLS_TOTAL.inc(service=self.name, result='rejected')
+                raise CircuitOpenError(self.name, self.breaker.retry_in())
+            try:
+                result = func()
+            except Exception as e:
+                if not retryable(e):
+                    self.breaker.record_success()
+                    SERVICE_CALLS_TOTAL.inc(service=self.name, result='error')
+                    raise
+                wait = retry_after(e)
+                if wait is None:
+                    self.breaker.record_failure()
+                    SERVICE_CALLS_TOTAL.inc(service=self.name, result='failure')
+                else:
+                    # Retry-After つきの応答は流量制御なので、サービスの障害としては数えない
+                    self.breaker.record_success()
+                    SERVICE_CALLS_TOTAL.inc(service=self.name, result='throttled')
+                if attempt >= max_retries or self.breaker.is_open:
+                    raise
+                delay = backoff_delay(attempt, wait)
+                if delay > RETRY_MAX_DELAY:
+                    logger.warning("Retry-After too long, giving up", extra={'service': self.name, 'retry_after': delay})
+                    raise
+                if wait is None and not self.budget.try_spend():
+                    SERVICE_CALLS_TOTAL.inc(service=self.name, result='retry_budget_exhausted')
+                    raise
+                SERVICE_CALLS_TOTAL.inc(service=self.name, result='retry')
+                logger.info("Retrying after transient failure", extra={
+                    'service': self.name,
+                    'attempt': attempt + 1,
+                    'delay': round(delay, 2),
+                    'error': str(e)[:200]
+                })
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                SERVICE_CALLS_TOTAL.inc(service=self.name, result='ok')
+                return result
+
+_policies: Dict[str, ServicePolicy] = {}
+_policies_lock = threading.Lock()
+
+def service_policy(name: str) -> ServicePolicy:
+    """サービス名（'arxiv', 'openai', 'slack'）ごとに共有される方針を取得"""
+    with _policies_lock:
+        if name not in _policies:
+            _policies[name] = ServicePolicy(name)
+        return _policies[name]
+
+def unavailable_services() -> Dict[str, float]:
+    """サーキットが開いているサービスと、呼び出しを再開するまでの秒数"""
+    with _policies_lock:
+        policies = list(_policies.values())
+    return {p.name: p.breaker.retry_in() for p in policies if p.breaker.is_open}
@@ -0,0 +1,76 @@
+# paper_harvester/utils/schedule_times.py
+
+import re
+import zlib
+from datetime import datetime, time, timedelta
+from typing import Iterable, List, Optional, Tuple
+import pytz
+
+class ScheduleError(ValueError):
+    """実行時刻・タイムゾーンの指定の誤り"""
+
+_TIME_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})$')
+
+def parse_time(value: str) -> str:
+    """'9:00' のような時刻を HH:MM 形式にそろえる"""
+    match = _TIME_PATTERN.match(value.strip())
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        raise ScheduleError(f"時刻は HH:MM 形式で指定してください: {value}")
+    return f"{int(match.group(1)):02d}:{match.group(2)}"
+
+def parse_timezone(name: str) -> str:
+    """タイムゾーン名を検証（'Asia/Tokyo' などのIANA名）"""
+    try:
+        return pytz.timezone(name.strip()).zone
+    except pytz.UnknownTimeZoneError:
+        raise ScheduleError(f"不明なタイムゾーンです: {name}")
+
+def normalize_times(values: Iterable[str]) -> List[str]:
+    """時刻をそろえて重複を除き、早い順に並べる"""
+    times = sorted({parse_time(value) for value in values if value.strip()})
+    if not times:
+        raise ScheduleError("実行時刻を1つ以上指定してください")
+    return times
+
+def parse_schedule(text: str) -> Tuple[List[str], Optional[str]]:
+    """'09:00 18:30 Asia/Tokyo' のような指定を実行時刻の一覧とタイムゾーンに分ける"""
+    times, timezone = [], None
+    for token in re.split(r'[\s,]+', text.strip()):
+        if not token:
+            continue
+        if _TIME_PATTERN.match(token):
+            times.append(token)
+        elif timezone is None:
+            timezone = parse_timezone(token)
+        else:
+            raise ScheduleError(f"タイムゾーンは1つだけ指定してください: {token}")
+    return normalize_times(times), timezone
+
+def _candidates(times: List[str], timezone: str, around: datetime, days: range) -> List[datetime]:
+    """around の前後の日付について、各実行時刻をUTCの日時に変換"""
+    tz = pytz.timezone(timezone)
+    local_date = around.astimezone(tz).date()
+    candidates = []
+    for offset in days:
+        day = local_date + timedelta(days=offset)
+        for value in times:
+            hour, minute = (int(part) for part in value.split(':'))
+            # 夏時間の切り替えで存在しない・重複する時刻は normalize で実在する時刻に寄せる
+            local = tz.normalize(tz.localize(datetime.combine(day, time(hour, minute))))
+            candidates.append(local.astimezone(pytz.UTC))
+    return candidates
+
+def next_fire_time(times: List[str], timezone: str, after: datetime) -> datetime:
+    """after より後で最初の実行時刻（UTC）"""
+    return min(c for c in _candidates(times, timezone, after, range(0, 3)) if c > after)
+
+def previous_fire_time(times: List[str], timezone: str, at: datetime) -> datetime:
+    """at 以前で最後の実行時刻（UTC）"""
+    return max(c for c in _candidates(times, timezone, at, range(-2, 1)) if c <= at)
+
+def jitter(key: str, fire: datetime, max_seconds: float) -> timedelta:
+    """キーと実行時刻から決まる 0〜max_seconds 秒の遅延（どのノードでも同じ値になる）"""
+    if max_seconds <= 0:
+        return timedelta(0)
+    digest = zlib.crc32(f"{key}@{fire.isoformat()}".encode('utf-8'))
+    return timedelta(seconds=max_seconds * digest / 0xFFFFFFFF)
@@ -0,0 +1,86 @@
+# paper_harvester/utils/timer_heap.py
+
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import pytz
+
+class TimerHeap:
+    """期限つきのジョブを期限順に保持し、次の期限まで眠って待つタイマーヒープ
+
+    ジョブはキーごとに1つで、登録し直すと前の期限は無効になる（ヒープからは取り出し時に捨てる）。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, Hashable]] = []
+        self._jobs: Dict[Hashable, Tuple[datetime, int, Any]] = {}  # キー → (期限, 登録番号, 内容)
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def push(self, key: Hashable, due: datetime, payload: Any = None):
+        """ジョブを登録（同じキーのジョブは置き換える）"""
+        with self._cond:
+            seq = next(self._counter)
+            self._jobs[key] = (due, seq, payload)
+            heapq.heappush(self._heap, (due, seq, key))
+            self._cond.notify_all()
+
+    def remove(self, key: Hashable):
+        with self._cond:
+            self._jobs.pop(key, None)
+
+    def get(self, key: Hashable) -> Optional[Tuple[datetime, Any]]:
+        """キーのジョブの (期限, 内容)"""
+        with self._cond:
+            job = self._jobs.get(key)
+        return (job[0], job[2]) if job else None
+
+    def items(self) -> List[Tuple[Hashable, datetime, Any]]:
+        with self._cond:
+            return [(key, due, payload) for key, (due, _, payload) in self._jobs.items()]
+
+    def _discard_stale(self):
+        while self._heap:
+            due, seq, key = self._heap[0]
+            job = self._jobs.get(key)
+            if job is not None and job[1] == seq:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[datetime]:
+        """最も早い期限"""
+        with self._cond:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[Tuple[Hashable, datetime, Any]]:
+        """期限が来たジョブを期限順に取り出す"""
+        due_jobs = []
+        with self._cond:
+            while True:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    return due_jobs
+                due, _, key = heapq.heappop(self._heap)
+                _, _, payload = self._jobs.pop(key)
+                due_jobs.append((key, due, payload))
+
+    def wait(self, timeout: float):
+        """次の期限まで（最長 timeout 秒）待つ。ジョブの登録や wake() で早めに起きる"""
+        with self._cond:
+            self._discard_stale()
+            if self._heap:
+                until_due = (self._heap[0][0] - datetime.now(pytz.UTC)).total_seconds()
+                timeout = min(timeout, until_due)
+            if timeout > 0:
+                self._cond.wait(timeout)
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._jobs)